@@ -3,6 +3,18 @@ import pandas as pd
 import random
 import sqlite3
 from firebase_config import db  # Import Firestore client
+from ranking import RANKINGS_PATH, get_home_rankings
+from session_cache import mark_drawn, moved_since_drawn, session_id
+import live_queries
+from shared_cache import cached
+from recommender import get_recommendations
+from ranking import summarize_recipe
+from macro_index import MACROS, get_shared_index
+from recipe_catalog import get_shared_catalog
+from typeahead import get_shared_typeahead
+from fuzzy_search import get_shared_fuzzy_index
+from facets import CALORIE_BUCKETS, PROTEIN_BUCKETS, get_shared_facets
+from recipe_replica import get_replica
 
 st.set_page_config(page_title="Leo's Food App", page_icon="🐱", layout="wide")
 
@@ -21,6 +33,7 @@ st.sidebar.page_link("pages/about_me.py", label="ℹ️ About Me")
 st.sidebar.page_link("pages/my_recipes.py", label="📊 My Recipes")
 st.sidebar.page_link("pages/chatbot.py", label="🤖 Chat Bot")
 st.sidebar.page_link("pages/post_meal.py", label="📝 Share Your Meal")
+st.sidebar.page_link("pages/meal_plan.py", label="🍽️ Meal Planner")
 
 # Check authentication and display appropriate sidebar options
 if st.session_state.authenticated:
@@ -36,18 +49,135 @@ else:
     st.sidebar.divider()
     st.sidebar.page_link("pages/auth.py", label="👤 Login/Register")
 
+# Function to get completions for the search box from the process-wide index
+def get_suggestions(text, k=5):
+    if not text:
+        return []
+    try:
+        suggestions = get_shared_typeahead().complete(text, k=k + 1)
+    except Exception:
+        return []
+    return [s for s in suggestions if s['text'].lower() != text.strip().lower()][:k]
+
+# Function to fill the search box with a picked suggestion
+def pick_suggestion(text):
+    st.session_state.search_box = text
+
+SUGGESTION_ICONS = {'recipe': "🍽️", 'ingredient': "🥕", 'tag': "#"}
+
+# Function to get the process-wide facet index (None if it can't be loaded)
+def load_facets():
+    try:
+        return get_shared_facets()
+    except Exception:
+        return None
+
+# Function to read the facet selection from the filter widgets' state. Counts
+# are needed before those widgets are drawn, so this reads session state.
+def facet_filters():
+    return {
+        'category': st.session_state.get('category_filter', "All"),
+        'tags': st.session_state.get('facet_tags', []),
+        'protein': None if st.session_state.get('facet_protein', "Any") == "Any" else st.session_state.facet_protein,
+        'calories': None if st.session_state.get('facet_calories', "Any") == "Any" else st.session_state.facet_calories,
+    }
+
+# Function to label a filter option with how many recipes it would match
+def with_count(counts, facet):
+    def label(option):
+        if counts is None or option in ("All", "Any"):
+            return option
+        return f"{option} ({counts[facet].get(option, 0)})"
+    return label
+
+facets = load_facets()
+facet_counts = facets.counts(facet_filters()) if facets else None
+
 # --- SEARCH AND FILTER SECTION ---
 with st.container():
     col1, col2, col3 = st.columns([3, 1, 1])
     
     with col1:
-        search_query = st.text_input("Search for recipes or ingredients:", placeholder="e.g., chicken, protein bowl, breakfast...")
+        search_query = st.text_input("Search for recipes or ingredients:", key="search_box",
+                                     placeholder="e.g., chicken, protein bowl, breakfast...")
+        suggestions = get_suggestions(search_query)
+        if suggestions:
+            suggestion_cols = st.columns(len(suggestions))
+            for i, suggestion in enumerate(suggestions):
+                with suggestion_cols[i]:
+                    st.button(f"{SUGGESTION_ICONS[suggestion['kind']]} {suggestion['text']}", key=f"suggest_{i}",
+                              on_click=pick_suggestion, args=(suggestion['text'],))
     
     with col2:
-        category = st.selectbox("Category", ["All", "Breakfast", "Lunch", "Dinner", "Snacks", "Desserts"])
+        category = st.selectbox("Category", ["All", "Breakfast", "Lunch", "Dinner", "Snacks", "Desserts"],
+                                key="category_filter", format_func=with_count(facet_counts, 'category'))
     
     with col3:
-        sort_by = st.selectbox("Sort by", ["Newest", "Most Popular", "Highest Protein", "Lowest Calories"])
+        sort_by = st.selectbox("Sort by", ["Trending", "Newest", "Most Popular", "Highest Protein", "Lowest Calories"])
+    
+    # Tag and macro range filters, each option showing its recipe count
+    if facet_counts is not None:
+        with st.expander("🏷️ Tags and macro ranges"):
+            tag_options = sorted(facet_counts['tags'], key=lambda tag: -facet_counts['tags'][tag])
+            tag_options += [tag for tag in st.session_state.get('facet_tags', []) if tag not in tag_options]
+            facet_cols = st.columns([2, 1, 1])
+            with facet_cols[0]:
+                st.multiselect("Tags", tag_options, key="facet_tags", format_func=with_count(facet_counts, 'tags'))
+            with facet_cols[1]:
+                st.selectbox("Protein", ["Any"] + list(PROTEIN_BUCKETS), key="facet_protein",
+                             format_func=with_count(facet_counts, 'protein'))
+            with facet_cols[2]:
+                st.selectbox("Calories", ["Any"] + list(CALORIE_BUCKETS), key="facet_calories",
+                             format_func=with_count(facet_counts, 'calories'))
+            st.caption(f"{facet_counts['total']} recipes match these filters")
+    facet_filter = facet_filters()
+    faceted = bool(facet_filter['tags'] or facet_filter['protein'] or facet_filter['calories'])
+
+    # Macro target search; leave a target at 0 to ignore that macro
+    with st.expander("🎯 Match my macros"):
+        macro_target, macro_caps, macro_weights = {}, {}, {}
+        macro_cols = st.columns(4)
+        for macro_col, macro in zip(macro_cols, MACROS):
+            unit = "" if macro == "calories" else " (g)"
+            with macro_col:
+                macro_target[macro] = st.number_input(f"Target {macro}{unit}", min_value=0, value=0, key=f"target_{macro}")
+                macro_caps[macro] = st.number_input(f"Max {macro}{unit}", min_value=0, value=0, key=f"cap_{macro}",
+                                                    help="0 means no limit") or None
+                macro_weights[macro] = st.slider(f"{macro.capitalize()} importance", 0.5, 3.0, 1.0, 0.5, key=f"weight_{macro}")
+        # Maximums alone are a search too: any meals within the limits
+        macro_search = any(macro_target.values()) or any(macro_caps.values())
+
+# Trending and featured meals are precomputed by ranking.py into one document.
+# A single listener per server process keeps it current for every session.
+# If the listener can't start or hasn't delivered anything, the document is
+# read through the shared cache instead.
+def subscribe_home_rankings():
+    try:
+        live = live_queries.document(db, RANKINGS_PATH, session_id())
+    except Exception:
+        return None
+    live.wait_ready(timeout=2.0)
+    return live
+
+def current_home_rankings():
+    if home_live is not None and home_live.data:
+        return home_live.data[0][1]
+    try:
+        return cached('home_rankings', 'home', get_home_rankings, ttl=60)
+    except Exception:
+        return {}
+
+home_live = subscribe_home_rankings()
+
+home_rankings = current_home_rankings()
+
+# Personalized picks are precomputed by recommender.py; serving is one lookup,
+# shared across server processes
+def load_recommendations(user_id):
+    try:
+        return cached('recommendations', user_id, lambda: get_recommendations(user_id), ttl=300)
+    except Exception:
+        return []
 
 # --- WELCOME BANNER ---
 if not search_query and category == "All":
@@ -55,6 +185,20 @@ if not search_query and category == "All":
     if st.session_state.authenticated:
         st.header(f"Welcome back to Leo's Food App, {st.session_state.username}! 🐱🍽️")
         st.write("Here are some recommendations based on your preferences.")
+        recommended = load_recommendations(st.session_state.user_id)
+        if recommended:
+            st.subheader("Recommended For You")
+            rec_cols = st.columns(4)
+            for i, rec in enumerate(recommended[:4]):
+                with rec_cols[i]:
+                    st.image(rec["image"], use_column_width=True)
+                    st.markdown(f"**{rec['name']}**")
+                    st.caption(f"{rec['protein']}g protein • {rec['calories']} calories")
+                    if st.button("View Recipe", key=f"rec_{rec['id']}"):
+                        st.session_state.current_recipe_id = rec["id"]
+                        st.switch_page("pages/recipie_detail.py")
+        else:
+            st.caption("Like and save a few recipes and we'll start tailoring picks for you.")
     else:
         st.header("Welcome to Leo's Food App! 🐱🍽️")
         st.write("Share your meals, track macros, and discover new recipes from the community.")
@@ -67,28 +211,25 @@ if not search_query and category == "All":
     
     # Featured meals carousel
     st.subheader("Featured Meals This Week")
+    featured_meals = home_rankings.get('featured') or [
+        {"id": None, "name": "Protein Pancakes", "image": "https://api.placeholder.com/640/480", "user": "@FitFoodie",
+         "rating": 4.8, "reviews": 124, "protein": 32, "carbs": 45, "fat": 12, "calories": 420},
+        {"id": None, "name": "Mediterranean Bowl", "image": "https://api.placeholder.com/640/480", "user": "@HealthyEats",
+         "rating": 4.7, "reviews": 98, "protein": 28, "carbs": 52, "fat": 15, "calories": 460},
+        {"id": None, "name": "Chocolate Protein Smoothie", "image": "https://api.placeholder.com/640/480", "user": "@SmoothieKing",
+         "rating": 4.9, "reviews": 156, "protein": 24, "carbs": 30, "fat": 8, "calories": 290},
+    ]
     featured_cols = st.columns(3)
     
-    with featured_cols[0]:
-        st.image("https://api.placeholder.com/640/480", use_column_width=True)
-        st.markdown("#### Protein Pancakes")
-        st.markdown("⭐ 4.8 (124 ratings) • By @FitFoodie")
-        st.markdown("**Macros:** 32g protein • 45g carbs • 12g fat • 420 calories")
-        st.button("View Recipe", key="featured1")
-    
-    with featured_cols[1]:
-        st.image("https://api.placeholder.com/640/480", use_column_width=True)
-        st.markdown("#### Mediterranean Bowl")
-        st.markdown("⭐ 4.7 (98 ratings) • By @HealthyEats")
-        st.markdown("**Macros:** 28g protein • 52g carbs • 15g fat • 460 calories")
-        st.button("View Recipe", key="featured2")
-    
-    with featured_cols[2]:
-        st.image("https://api.placeholder.com/640/480", use_column_width=True)
-        st.markdown("#### Chocolate Protein Smoothie")
-        st.markdown("⭐ 4.9 (156 ratings) • By @SmoothieKing")
-        st.markdown("**Macros:** 24g protein • 30g carbs • 8g fat • 290 calories")
-        st.button("View Recipe", key="featured3")
+    for i, featured in enumerate(featured_meals[:3]):
+        with featured_cols[i]:
+            st.image(featured["image"], use_column_width=True)
+            st.markdown(f"#### {featured['name']}")
+            st.markdown(f"⭐ {featured['rating']} ({featured['reviews']} ratings) • By {featured['user']}")
+            st.markdown(f"**Macros:** {featured['protein']}g protein • {featured['carbs']}g carbs • {featured['fat']}g fat • {featured['calories']} calories")
+            if st.button("View Recipe", key=f"featured{i+1}") and featured.get("id"):
+                st.session_state.current_recipe_id = featured["id"]
+                st.switch_page("pages/recipie_detail.py")
 
 # --- SEARCH RESULTS OR MAIN FEED ---
 st.divider()
@@ -152,49 +293,139 @@ def get_sample_meals(n=12):
         
     return meals
 
-# Display search results or feed
-meals = get_sample_meals()
+# Function to get the process-wide columnar catalog (None if it can't be loaded)
+def load_catalog():
+    try:
+        return get_shared_catalog()
+    except Exception:
+        return None
 
-if search_query:
-    st.subheader(f"Results for: {search_query}")
-    if not meals:
-        st.write("No meals found matching your search. Try a different keyword.")
-elif category != "All":
-    st.subheader(f"{category} Meals")
-else:
-    st.subheader("Trending Meals")
-
-# Pinterest-style masonry grid layout
-cols = st.columns(3)
-for i, meal in enumerate(meals):
-    with cols[i % 3]:
-        st.image(meal["image"], use_column_width=True)
-        st.markdown(f"#### {meal['name']}")
-        st.markdown(f"⭐ {meal['rating']} ({meal['reviews']} ratings) • {meal['user']}")
+# Fields a feed card needs
+CARD_FIELDS = ['name', 'image', 'username', 'user', 'rating', 'reviews', 'category', 'date_posted'] + list(MACROS)
+
+# Function to read the feed with SQL on the local recipe replica, for when the
+# in-memory catalog can't be loaded (None if the replica can't be opened either)
+def replica_feed(k=12):
+    ranges = {}
+    if facet_filter['protein']:
+        ranges['protein'] = PROTEIN_BUCKETS[facet_filter['protein']]
+    if facet_filter['calories']:
+        ranges['calories'] = CALORIE_BUCKETS[facet_filter['calories']]
+    try:
+        rows = get_replica().feed(CARD_FIELDS, category=category, sort=sort_by, k=k,
+                                  tags=facet_filter['tags'], ranges=ranges)
+    except Exception:
+        return None
+    return [summarize_recipe(recipe_id, recipe) for recipe_id, recipe in rows]
+
+# Function to search the catalog, tolerating typos. Results keep relevance
+# order unless a sort option other than "Trending" is picked. Returns None
+# when the indexes can't be loaded.
+def search_meals(catalog, within=None, k=12):
+    try:
+        matches = get_shared_fuzzy_index().search(search_query)
+    except Exception:
+        return None
+    ids = [recipe_id for recipe_id, _ in matches if within is None or recipe_id in within]
+    if sort_by != "Trending":
+        return catalog.query(category=category, sort=sort_by, k=k, within=ids)
+    allowed = set(catalog.top_ids(category, k=len(ids), within=ids))
+    return [catalog.card(recipe_id) for recipe_id in ids if recipe_id in allowed][:k]
+
+# Display search results or feed. "Trending" uses the precomputed trending
+# lists; the other sort orders filter and sort the shared recipe catalog with
+# vectorized operations, and searches go through the typo-tolerant index.
+# Without the catalog the feed is read from the local recipe replica, and
+# sample data fills in when neither is available.
+# Trending cards come from the shared listener's in-memory copy; when it moves,
+# the watcher below reruns the page.
+def render_feed():
+    if home_live is not None:
+        mark_drawn('home_rankings', home_live.version)
+    trending = current_home_rankings().get('trending', {}).get(category, [])
+    # Tag and macro range filters narrow everything below to the facet bitmap's recipes
+    within = set(facets.ids(facet_filter)) if faceted else None
+    if macro_search:
+        # One index per server process, kept current by post_meal.py change events
+        index = get_shared_index()
+        # Same category and tag/range filters as the rest of the feed
+        matches = index.nearest(macro_target, k=12, weights=macro_weights, caps=macro_caps,
+                                category=None if category == "All" else category, within=within)
+        meals = [summarize_recipe(recipe_id, index.get(recipe_id)) for recipe_id, _ in matches]
+    elif not search_query and sort_by == "Trending" and trending and not faceted:
+        meals = trending
+    elif (catalog := load_catalog()) and not search_query:
+        meals = catalog.query(category=category, sort=sort_by, k=12, within=within)
+    elif catalog and (found := search_meals(catalog, within)) is not None:
+        meals = found
+    elif not search_query and (local := replica_feed()) is not None:
+        meals = local
+    else:
+        meals = get_sample_meals()
+
+    if macro_search:
+        if any(macro_target.values()):
+            st.subheader("Closest Matches to Your Macros")
+        else:
+            st.subheader("Meals Within Your Limits")
+        if not meals:
+            st.write("No meals fit those limits. Try relaxing a maximum.")
+    elif search_query:
+        st.subheader(f"Results for: {search_query}")
+        if not meals:
+            st.write("No meals found matching your search. Try a different keyword.")
+    elif category != "All":
+        st.subheader(f"{category} Meals")
+    else:
+        st.subheader("Trending Meals")
+
+    # Pinterest-style masonry grid layout
+    cols = st.columns(3)
+    for i, meal in enumerate(meals):
+        with cols[i % 3]:
+            st.image(meal["image"], use_column_width=True)
+            st.markdown(f"#### {meal['name']}")
+            st.markdown(f"⭐ {meal['rating']} ({meal['reviews']} ratings) • {meal['user']}")
         
-        # Macro information in a clean format
-        macros_col1, macros_col2 = st.columns(2)
-        with macros_col1:
-            st.markdown(f"**Protein:** {meal['protein']}g")
-            st.markdown(f"**Carbs:** {meal['carbs']}g")
-        with macros_col2:
-            st.markdown(f"**Fat:** {meal['fat']}g")
-            st.markdown(f"**Calories:** {meal['calories']}")
+            # Macro information in a clean format
+            macros_col1, macros_col2 = st.columns(2)
+            with macros_col1:
+                st.markdown(f"**Protein:** {meal['protein']}g")
+                st.markdown(f"**Carbs:** {meal['carbs']}g")
+            with macros_col2:
+                st.markdown(f"**Fat:** {meal['fat']}g")
+                st.markdown(f"**Calories:** {meal['calories']}")
         
-        # Action buttons
-        button_col1, button_col2 = st.columns(2)
-        with button_col1:
-            st.button("View Recipe", key=f"recipe_{i}")
-        with button_col2:
-            # Different button text based on auth status
-            if st.session_state.authenticated:
-                st.button("Save", key=f"save_{i}")
-            else:
-                if st.button("Login to Save", key=f"login_save_{i}"):
-                    st.switch_page("pages/auth.py")
+            # Action buttons
+            button_col1, button_col2 = st.columns(2)
+            with button_col1:
+                st.button("View Recipe", key=f"recipe_{i}")
+            with button_col2:
+                # Different button text based on auth status
+                if st.session_state.authenticated:
+                    st.button("Save", key=f"save_{i}")
+                else:
+                    if st.button("Login to Save", key=f"login_save_{i}"):
+                        st.switch_page("pages/auth.py")
         
-        # Add some spacing between cards
-        st.markdown("<br>", unsafe_allow_html=True)
+            # Add some spacing between cards
+            st.markdown("<br>", unsafe_allow_html=True)
+
+render_feed()
+
+# Checks every few seconds whether the rankings moved since the feed was drawn,
+# and reruns the page only then. It draws nothing and never reads Firestore.
+@st.fragment(run_every=10)
+def watch_home_rankings():
+    try:
+        live = live_queries.document(db, RANKINGS_PATH, session_id())  # also keeps this session subscribed
+    except Exception:
+        return
+    if moved_since_drawn('home_rankings', live.version):
+        st.rerun()
+
+if home_live is not None:
+    watch_home_rankings()
 
 # --- FOOTER ---
 st.divider()
@@ -0,0 +1,216 @@
+# chat_client.py
+# One OpenAI client per server process for the chat bot, with a request queue.
+#
+# Sessions used to build their own client on every rerun and call it on the
+# script thread: a new TLS handshake per message, no limit on how many calls
+# run at once and nothing stopping a slow upstream from tying up every script
+# thread. Here a single AsyncOpenAI client with a pooled HTTP connection runs
+# on one event loop thread shared by every session.
+#
+#   * At most GLOBAL_LIMIT requests talk to OpenAI at once; the rest wait in
+#     order, up to MAX_WAITING of them. Past that, submit() refuses with Busy
+#     right away rather than letting the queue grow without bound.
+#   * Each user can have PER_USER_LIMIT requests in flight.
+#   * Connection, response-start and between-chunk timeouts. Failures before
+#     the first token (timeouts, dropped connections, 429s, 5xx) are retried with
+#     exponential backoff and full jitter. Once text has been shown the reply
+#     is not retried, since that would repeat it.
+#   * The page reads the reply through a thread-safe queue and can show the
+#     request's queue position while it waits. If the page goes away the
+#     request is cancelled.
+import asyncio
+import logging
+import queue
+import random
+import threading
+
+import httpx
+import openai
+
+logger = logging.getLogger(__name__)
+
+GLOBAL_LIMIT = 8  # concurrent upstream requests per server process
+PER_USER_LIMIT = 1
+MAX_WAITING = 32  # queued requests before new ones are refused
+QUEUE_TIMEOUT = 60.0  # seconds a request may wait for a slot
+CONNECT_TIMEOUT = 5.0
+RESPONSE_TIMEOUT = 20.0  # until the reply starts streaming
+CHUNK_TIMEOUT = 30.0  # longest gap between streamed chunks
+MAX_ATTEMPTS = 3
+BACKOFF_BASE = 0.5  # seconds; attempt n waits up to BACKOFF_BASE * 2**n
+BACKOFF_CAP = 8.0
+
+RETRYABLE = (openai.APITimeoutError, openai.APIConnectionError, openai.RateLimitError,
+             openai.InternalServerError, asyncio.TimeoutError)
+
+
+class Busy(Exception):
+    pass
+
+
+class ChatError(Exception):
+    pass
+
+
+# One chat completion on its way through the queue
+class ChatRequest:
+    def __init__(self, user):
+        self.user = user
+        self.state = 'queued'  # queued, running, retrying, done, failed, cancelled
+        self.attempts = 0
+        self.future = None
+        self._out = queue.Queue()
+        self._started = threading.Event()
+        self._finished = False
+
+    def _put(self, kind, value=None):
+        if kind != 'text':
+            self._started.set()
+        self._out.put((kind, value))
+
+    # Function to block up to timeout for the request to leave the queue
+    def wait_started(self, timeout):
+        return self._started.wait(timeout)
+
+    def cancel(self):
+        if self.future is not None and not self._finished:
+            self.future.cancel()
+
+    # Function to yield the reply's text as it streams in; raises ChatError
+    def text(self):
+        try:
+            while True:
+                try:
+                    kind, value = self._out.get(timeout=QUEUE_TIMEOUT + RESPONSE_TIMEOUT + CHUNK_TIMEOUT)
+                except queue.Empty:
+                    raise ChatError("The assistant stopped responding. Please try again.")
+                if kind == 'text':
+                    yield value
+                elif kind == 'done':
+                    self._finished = True
+                    return
+                else:
+                    self._finished = True
+                    raise value
+        finally:
+            # The page stopped reading (rerun, navigation): free the slot
+            self.cancel()
+
+
+class ChatPool:
+    def __init__(self, api_key, global_limit=GLOBAL_LIMIT, per_user_limit=PER_USER_LIMIT, max_waiting=MAX_WAITING):
+        self.global_limit = global_limit
+        self.per_user_limit = per_user_limit
+        self.max_waiting = max_waiting
+        self._lock = threading.Lock()
+        self._active = {}  # user -> requests queued or running
+        self._waiting = []  # queued requests, oldest first
+        self._loop = asyncio.new_event_loop()
+        threading.Thread(target=self._loop.run_forever, name="chat-client", daemon=True).start()
+        asyncio.run_coroutine_threadsafe(self._setup(api_key), self._loop).result()
+
+    async def _setup(self, api_key):
+        # Created on the loop so the pool's connections belong to it
+        self._slots = asyncio.Semaphore(self.global_limit)
+        http_client = httpx.AsyncClient(
+            timeout=httpx.Timeout(CHUNK_TIMEOUT, connect=CONNECT_TIMEOUT),
+            limits=httpx.Limits(max_connections=self.global_limit, max_keepalive_connections=self.global_limit))
+        self._client = openai.AsyncOpenAI(api_key=api_key, max_retries=0, http_client=http_client)
+
+    # Function to queue a chat completion; raises Busy if the user already has
+    # one in flight or the queue is full
+    def submit(self, user, model, messages):
+        request = ChatRequest(user)
+        with self._lock:
+            if self._active.get(user, 0) >= self.per_user_limit:
+                raise Busy("Your previous message is still being answered. Please wait for it to finish.")
+            # Running requests plus the queue behind them
+            if sum(self._active.values()) >= self.global_limit + self.max_waiting:
+                raise Busy("The assistant is very busy right now. Please try again in a minute.")
+            self._active[user] = self._active.get(user, 0) + 1
+            self._waiting.append(request)
+        request.future = asyncio.run_coroutine_threadsafe(self._run(request, model, messages), self._loop)
+        return request
+
+    # Function to return how many requests are ahead of this one (0 once running)
+    def position(self, request):
+        with self._lock:
+            try:
+                return self._waiting.index(request)
+            except ValueError:
+                return 0
+
+    def stats(self):
+        with self._lock:
+            return {'waiting': len(self._waiting), 'in_flight': sum(self._active.values())}
+
+    def _leave_queue(self, request):
+        with self._lock:
+            if request in self._waiting:
+                self._waiting.remove(request)
+
+    async def _run(self, request, model, messages):
+        try:
+            try:
+                await asyncio.wait_for(self._slots.acquire(), QUEUE_TIMEOUT)
+            except asyncio.TimeoutError:
+                raise ChatError("The assistant is very busy right now. Please try again in a minute.")
+            try:
+                self._leave_queue(request)
+                request.state = 'running'
+                request._started.set()
+                await self._stream(request, model, messages)
+            finally:
+                self._slots.release()
+            request.state = 'done'
+            request._put('done')
+        except asyncio.CancelledError:
+            request.state = 'cancelled'
+            raise
+        except ChatError as e:
+            request.state = 'failed'
+            request._put('error', e)
+        except Exception as e:
+            logger.warning("Chat completion for %s failed after %d attempts: %r", request.user, request.attempts, e)
+            request.state = 'failed'
+            request._put('error', ChatError("The assistant couldn't answer just now. Please try again."))
+        finally:
+            self._leave_queue(request)
+            with self._lock:
+                self._active[request.user] -= 1
+                if not self._active[request.user]:
+                    del self._active[request.user]
+
+    async def _stream(self, request, model, messages):
+        for attempt in range(MAX_ATTEMPTS):
+            request.attempts = attempt + 1
+            sent = False
+            try:
+                stream = await asyncio.wait_for(
+                    self._client.chat.completions.create(model=model, messages=messages, stream=True),
+                    RESPONSE_TIMEOUT)
+                async for chunk in stream:
+                    text = chunk.choices[0].delta.content if chunk.choices else None
+                    if text:
+                        sent = True
+                        request._put('text', text)
+                return
+            except RETRYABLE:
+                if sent or attempt == MAX_ATTEMPTS - 1:
+                    raise
+                request.state = 'retrying'
+                await asyncio.sleep(random.uniform(0, min(BACKOFF_CAP, BACKOFF_BASE * 2 ** attempt)))
+                request.state = 'running'
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+# Function to return the chat pool shared by every session in this process
+def get_pool(api_key):
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ChatPool(api_key)
+    return _pool
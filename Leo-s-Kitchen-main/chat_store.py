@@ -0,0 +1,107 @@
+# chat_store.py
+# Chat history persisted per user in a local SQLite database, data/chat.db
+# (not tracked by git).
+# The chatbot page only keeps the last WINDOW_SIZE messages in session state;
+# older messages are paged in from here on demand.
+#
+# Visitors who aren't logged in chat under "session:<id>", which nobody can
+# come back to once the browser session ends. Those histories are deleted
+# SESSION_TTL after their last message; add_message() runs the purge at most
+# once per PURGE_INTERVAL per process.
+import os
+import sqlite3
+import threading
+import time
+
+DB_PATH = os.environ.get("LEO_CHAT_DB_PATH", os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "chat.db"))
+WINDOW_SIZE = 20
+PAGE_SIZE = 20
+SESSION_PREFIX = "session:"
+SESSION_TTL = 24 * 3600  # seconds an anonymous history is kept after its last message
+PURGE_INTERVAL = 3600  # seconds between purges
+
+_last_purge = 0.0
+_purge_lock = threading.Lock()
+
+_local = threading.local()
+
+
+# One connection per thread; sqlite3 connections can't be shared across threads
+def _conn():
+    conn = getattr(_local, 'conn', None)
+    if conn is None:
+        os.makedirs(os.path.dirname(DB_PATH), exist_ok=True)
+        conn = sqlite3.connect(DB_PATH, timeout=5.0)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS chat_messages (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                user_id TEXT NOT NULL,
+                role TEXT NOT NULL,
+                content TEXT NOT NULL,
+                created_at REAL NOT NULL
+            )
+        """)
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_chat_messages_user ON chat_messages (user_id, id)")
+        conn.commit()
+        _local.conn = conn
+    return conn
+
+
+# Function to store one message and return its id
+def add_message(user_id, role, content):
+    conn = _conn()
+    cursor = conn.execute("INSERT INTO chat_messages (user_id, role, content, created_at) VALUES (?, ?, ?, ?)",
+                          (user_id, role, content, time.time()))
+    conn.commit()
+    _maybe_purge()
+    return cursor.lastrowid
+
+
+# Function to delete anonymous histories idle for longer than max_age;
+# returns how many messages were removed
+def purge_sessions(max_age=SESSION_TTL):
+    conn = _conn()
+    cursor = conn.execute(
+        "DELETE FROM chat_messages WHERE user_id IN ("
+        "SELECT user_id FROM chat_messages WHERE user_id LIKE ? GROUP BY user_id HAVING MAX(created_at) < ?)",
+        (SESSION_PREFIX + "%", time.time() - max_age))
+    conn.commit()
+    return cursor.rowcount
+
+
+def _maybe_purge():
+    global _last_purge
+    with _purge_lock:
+        if time.time() - _last_purge < PURGE_INTERVAL:
+            return
+        _last_purge = time.time()
+    purge_sessions()
+
+
+# Function to return up to `limit` messages older than `before_id` (or the
+# latest ones when before_id is None), oldest first
+def get_messages(user_id, limit=WINDOW_SIZE, before_id=None):
+    if before_id is None:
+        rows = _conn().execute(
+            "SELECT id, role, content FROM chat_messages WHERE user_id = ? ORDER BY id DESC LIMIT ?",
+            (user_id, limit)).fetchall()
+    else:
+        rows = _conn().execute(
+            "SELECT id, role, content FROM chat_messages WHERE user_id = ? AND id < ? ORDER BY id DESC LIMIT ?",
+            (user_id, before_id, limit)).fetchall()
+    return [{'id': row[0], 'role': row[1], 'content': row[2]} for row in reversed(rows)]
+
+
+# Function to tell whether there is anything older than a message id
+def has_older(user_id, before_id):
+    row = _conn().execute("SELECT 1 FROM chat_messages WHERE user_id = ? AND id < ? LIMIT 1",
+                          (user_id, before_id)).fetchone()
+    return row is not None
+
+
+# Function to delete a user's whole history
+def clear_history(user_id):
+    conn = _conn()
+    conn.execute("DELETE FROM chat_messages WHERE user_id = ?", (user_id,))
+    conn.commit()
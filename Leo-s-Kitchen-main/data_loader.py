@@ -0,0 +1,55 @@
+# data_loader.py
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+
+# One pool per server process, shared by every session. Firestore calls are
+# network bound so threads are enough to overlap the round trips.
+_executor = ThreadPoolExecutor(max_workers=16, thread_name_prefix="page-loader")
+
+DEFAULT_DEADLINE = 3.0  # seconds
+
+
+class LoadResult:
+    def __init__(self, value=None, error=None, timed_out=False):
+        self.value = value
+        self.error = error
+        self.timed_out = timed_out
+
+    @property
+    def ok(self):
+        return self.error is None and not self.timed_out
+
+
+# Fires independent reads for one page run and collects them by name.
+# Each task gets its own deadline, measured from when it was submitted, so a
+# slow query only affects the part of the page that renders it. Tasks run in
+# worker threads and must not call any st.* functions.
+class PageLoader:
+    def __init__(self):
+        self._tasks = {}
+
+    def submit(self, name, fn, *args, deadline=DEFAULT_DEADLINE, **kwargs):
+        future = _executor.submit(fn, *args, **kwargs)
+        self._tasks[name] = (future, time.monotonic() + deadline)
+        return future
+
+    def submit_after(self, name, parent, fn, deadline=DEFAULT_DEADLINE):
+        # Chain a read on the value of another task, e.g. similar recipes need
+        # the recipe's category. Runs as soon as the parent finishes.
+        parent_future, _ = self._tasks[parent]
+
+        def run():
+            return fn(parent_future.result())
+
+        return self.submit(name, run, deadline=deadline)
+
+    def result(self, name):
+        future, expires_at = self._tasks[name]
+        try:
+            value = future.result(timeout=max(0.0, expires_at - time.monotonic()))
+            return LoadResult(value=value)
+        except FutureTimeout:
+            # Leave the thread to finish on its own; the page moves on without it
+            return LoadResult(timed_out=True)
+        except Exception as e:
+            return LoadResult(error=e)
@@ -0,0 +1,189 @@
+# event_log.py
+# Append-only log of engagement events (view, like, save, comment, rating).
+#
+# Events are compact JSON lines appended to numbered segment files:
+#     data/events/segment-000001.ndjson, segment-000002.ndjson, ...
+# The active segment rotates once it passes SEGMENT_MAX_BYTES. Files are opened
+# with O_APPEND, so several server processes can log to the same directory.
+#
+# An offset is (segment number, byte position). `python event_log.py` folds
+# every event after the last checkpoint into counters and daily rollups in
+# aggregate.json, and `--rebuild` recomputes aggregate.json from the first
+# segment. `--from SEGMENT:POS [--out FILE]` replays the events after any
+# offset into a separate file (replay.json by default) and leaves the
+# checkpoint alone, since a partial replay doesn't hold the running totals.
+import json
+import os
+import threading
+import time
+from collections import defaultdict
+from datetime import datetime, timezone
+
+LOG_DIR = os.environ.get("LEO_EVENT_LOG_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "events"))
+SEGMENT_MAX_BYTES = 8 * 1024 * 1024
+AGGREGATE_FILE = "aggregate.json"
+REPLAY_FILE = "replay.json"
+
+EVENT_KINDS = ('view', 'like', 'save', 'comment', 'rating')
+
+_lock = threading.Lock()
+
+
+# Function to build a segment's file name from its number
+def segment_path(number, log_dir=None):
+    return os.path.join(log_dir or LOG_DIR, f"segment-{number:06d}.ndjson")
+
+
+# Function to list segment numbers present on disk, oldest first
+def list_segments(log_dir=None):
+    log_dir = log_dir or LOG_DIR
+    if not os.path.isdir(log_dir):
+        return []
+    numbers = []
+    for name in os.listdir(log_dir):
+        if name.startswith("segment-") and name.endswith(".ndjson"):
+            numbers.append(int(name[len("segment-"):-len(".ndjson")]))
+    return sorted(numbers)
+
+
+# Function to pick the segment to append to, rotating when it is full
+def _active_segment(log_dir):
+    segments = list_segments(log_dir)
+    if not segments:
+        return 1
+    latest = segments[-1]
+    if os.path.getsize(segment_path(latest, log_dir)) >= SEGMENT_MAX_BYTES:
+        return latest + 1
+    return latest
+
+
+# Function to append one event. Keys are kept short: t=time, k=kind,
+# r=recipe id, u=user id, v=optional value (e.g. stars for a rating).
+def emit(kind, recipe_id, user_id=None, value=None, log_dir=None):
+    if kind not in EVENT_KINDS:
+        raise ValueError(f"Unknown event kind: {kind}")
+    event = {'t': round(time.time(), 3), 'k': kind, 'r': recipe_id}
+    if user_id:
+        event['u'] = user_id
+    if value is not None:
+        event['v'] = value
+    line = (json.dumps(event, separators=(',', ':')) + "\n").encode()
+
+    log_dir = log_dir or LOG_DIR
+    with _lock:
+        os.makedirs(log_dir, exist_ok=True)
+        fd = os.open(segment_path(_active_segment(log_dir), log_dir), os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        try:
+            # A single write() of one line, so lines from different processes never interleave
+            os.write(fd, line)
+        finally:
+            os.close(fd)
+
+
+# Function to yield (offset_after_event, event) for every complete event from
+# `offset` onward. A partially written line at the end of the newest segment
+# is left for the next read. One at the end of an older segment will never be
+# finished (the segment has rotated), so it is skipped.
+def replay(offset=(0, 0), log_dir=None):
+    log_dir = log_dir or LOG_DIR
+    start_segment, start_pos = offset
+    segments = list_segments(log_dir)
+    for number in segments:
+        if number < start_segment:
+            continue
+        pos = start_pos if number == start_segment else 0
+        with open(segment_path(number, log_dir), 'rb') as f:
+            f.seek(pos)
+            for raw in f:
+                if not raw.endswith(b"\n"):
+                    if number == segments[-1]:
+                        return
+                    break
+                pos += len(raw)
+                try:
+                    event = json.loads(raw)
+                except ValueError:
+                    continue
+                yield (number, pos), event
+
+
+# Function to create an empty aggregate state
+def empty_aggregate():
+    return {
+        'offset': [0, 0],
+        'counters': {},  # recipe_id -> {kind: count}
+        'daily': {},  # "YYYY-MM-DD" -> {kind: count}
+        'rating_sum': {},  # recipe_id -> sum of stars
+    }
+
+
+# Function to fold events into the aggregate (mutates and returns it)
+def fold(aggregate, events):
+    counters = defaultdict(lambda: defaultdict(int), {r: defaultdict(int, c) for r, c in aggregate['counters'].items()})
+    daily = defaultdict(lambda: defaultdict(int), {d: defaultdict(int, c) for d, c in aggregate['daily'].items()})
+    rating_sum = defaultdict(float, aggregate['rating_sum'])
+    offset = aggregate['offset']
+    for offset, event in events:
+        kind, recipe_id = event['k'], event['r']
+        counters[recipe_id][kind] += 1
+        day = datetime.fromtimestamp(event['t'], timezone.utc).strftime("%Y-%m-%d")
+        daily[day][kind] += 1
+        if kind == 'rating' and event.get('v') is not None:
+            rating_sum[recipe_id] += event['v']
+    aggregate['offset'] = list(offset)
+    aggregate['counters'] = {r: dict(c) for r, c in counters.items()}
+    aggregate['daily'] = {d: dict(c) for d, c in daily.items()}
+    aggregate['rating_sum'] = dict(rating_sum)
+    return aggregate
+
+
+# Function to load the saved aggregate, or an empty one
+def load_aggregate(log_dir=None):
+    path = os.path.join(log_dir or LOG_DIR, AGGREGATE_FILE)
+    if not os.path.exists(path):
+        return empty_aggregate()
+    with open(path) as f:
+        return json.load(f)
+
+
+# Function to save the aggregate atomically (write then rename)
+def save_aggregate(aggregate, log_dir=None, name=AGGREGATE_FILE):
+    log_dir = log_dir or LOG_DIR
+    os.makedirs(log_dir, exist_ok=True)
+    path = os.path.join(log_dir, name)
+    tmp = path + ".tmp"
+    with open(tmp, 'w') as f:
+        json.dump(aggregate, f, separators=(',', ':'))
+    os.replace(tmp, path)
+
+
+# Function to run the batch aggregator: continue from the checkpoint, or with
+# rebuild=True recompute it from the first segment
+def aggregate(rebuild=False, log_dir=None):
+    state = empty_aggregate() if rebuild else load_aggregate(log_dir)
+    state = fold(state, replay(tuple(state['offset']), log_dir))
+    save_aggregate(state, log_dir)
+    return state
+
+
+# Function to fold only the events after from_offset into a fresh aggregate,
+# saved under `output` rather than over the checkpoint
+def replay_from(from_offset, output=REPLAY_FILE, log_dir=None):
+    state = empty_aggregate()
+    state['offset'] = list(from_offset)
+    state = fold(state, replay(from_offset, log_dir))
+    save_aggregate(state, log_dir, name=output)
+    return state
+
+
+if __name__ == "__main__":
+    import sys
+    if "--from" in sys.argv:
+        segment, pos = sys.argv[sys.argv.index("--from") + 1].split(":")
+        output = sys.argv[sys.argv.index("--out") + 1] if "--out" in sys.argv else REPLAY_FILE
+        state = replay_from((int(segment), int(pos)), output)
+        print(f"Replayed into {output}; ", end="")
+    else:
+        state = aggregate(rebuild="--rebuild" in sys.argv)
+    print(f"Aggregated up to segment {state['offset'][0]} byte {state['offset'][1]}; "
+          f"{len(state['counters'])} recipes with engagement")
@@ -0,0 +1,177 @@
+# facets.py
+# Recipe counts per category, tag and macro bucket for the home page filters.
+#
+# Each recipe gets a bit position; every facet value (a category, a tag, a
+# protein or calorie range) keeps a bitmap, stored as a Python int, of the
+# recipes that have it. The counts for any filter combination are bitmap ANDs
+# followed by a popcount, so nothing is scanned however many recipes there
+# are. Single-choice facets (category, macro ranges) are counted with their
+# own selection left out, so the other options show what picking them would
+# give. Tags combine with AND, so their counts narrow as tags are added.
+#
+# Creates, edits and deletes arrive as recipe change events and flip only the
+# bits of the recipe that changed.
+import threading
+from collections import defaultdict
+
+import numpy as np
+
+import recipe_events
+from recipe_replica import recipe_rows
+
+LOAD_FIELDS = ['category', 'tags', 'protein', 'calories']
+
+# Bucket label -> (low inclusive, high exclusive)
+PROTEIN_BUCKETS = {
+    "Under 15g": (0, 15),
+    "15-30g": (15, 30),
+    "30-45g": (30, 45),
+    "45g+": (45, float('inf')),
+}
+CALORIE_BUCKETS = {
+    "Under 300": (0, 300),
+    "300-500": (300, 500),
+    "500-700": (500, 700),
+    "700+": (700, float('inf')),
+}
+FACETS = ('category', 'tags', 'protein', 'calories')
+SINGLE_CHOICE = ('category', 'protein', 'calories')
+
+
+def bucket_of(value, buckets):
+    try:
+        value = float(value)
+    except (TypeError, ValueError):
+        return None
+    for label, (low, high) in buckets.items():
+        if low <= value < high:
+            return label
+    return None
+
+
+# Function to list the facet values of one recipe as {facet: set(values)}
+def facet_values(recipe):
+    values = {facet: set() for facet in FACETS}
+    if recipe.get('category'):
+        values['category'].add(recipe['category'])
+    values['tags'].update(str(tag) for tag in recipe.get('tags') or () if tag)
+    protein = bucket_of(recipe.get('protein'), PROTEIN_BUCKETS)
+    if protein:
+        values['protein'].add(protein)
+    calories = bucket_of(recipe.get('calories'), CALORIE_BUCKETS)
+    if calories:
+        values['calories'].add(calories)
+    return values
+
+
+class FacetIndex:
+    def __init__(self, recipes=()):
+        self._lock = threading.Lock()
+        self._bit = {}  # recipe id -> bit position
+        self._ids = []  # bit position -> recipe id (None when free)
+        self._free = []
+        self._all = 0
+        self._bitmaps = {facet: defaultdict(int) for facet in FACETS}
+        self._values = {}  # recipe id -> {facet: set(values)}
+        self._source = {}  # recipe id -> indexed fields, to merge partial edits
+        for recipe_id, recipe in recipes:
+            self._add(recipe_id, recipe)
+
+    def __len__(self):
+        return len(self._bit)
+
+    def _add(self, recipe_id, recipe):
+        if self._free:
+            bit = self._free.pop()
+            self._ids[bit] = recipe_id
+        else:
+            bit = len(self._ids)
+            self._ids.append(recipe_id)
+        self._bit[recipe_id] = bit
+        mask = 1 << bit
+        self._all |= mask
+        self._source[recipe_id] = {f: recipe.get(f) for f in LOAD_FIELDS}
+        values = self._values[recipe_id] = facet_values(recipe)
+        for facet, facet_values_ in values.items():
+            for value in facet_values_:
+                self._bitmaps[facet][value] |= mask
+
+    def _remove(self, recipe_id):
+        bit = self._bit.pop(recipe_id, None)
+        if bit is None:
+            return
+        mask = ~(1 << bit)
+        self._all &= mask
+        for facet, facet_values_ in self._values.pop(recipe_id).items():
+            bitmaps = self._bitmaps[facet]
+            for value in facet_values_:
+                bitmaps[value] &= mask
+                if not bitmaps[value]:
+                    del bitmaps[value]
+        self._source.pop(recipe_id, None)
+        self._ids[bit] = None
+        self._free.append(bit)
+
+    # Function to apply a recipe change; pass recipe=None for a delete.
+    # Signature matches recipe_events.subscribe callbacks.
+    def update(self, recipe_id, recipe, changed_fields=None):
+        with self._lock:
+            if recipe is not None:
+                recipe = {**self._source.get(recipe_id, {}), **recipe}
+            self._remove(recipe_id)
+            if recipe is not None:
+                self._add(recipe_id, recipe)
+
+    # Function to AND together the bitmaps for a filter selection.
+    #   filters: {'category': 'Lunch', 'tags': ['keto'], 'protein': '30-45g', ...};
+    #   empty values and "All" mean no filter. `skip` leaves one facet out.
+    def _selection(self, filters, skip=None):
+        bits = self._all
+        for facet, wanted in (filters or {}).items():
+            if facet == skip or not wanted or wanted == "All":
+                continue
+            for value in ([wanted] if isinstance(wanted, str) else wanted):
+                bits &= self._bitmaps[facet].get(value, 0)
+        return bits
+
+    # Function to return {facet: {value: count}} under the current filters
+    def counts(self, filters=None):
+        with self._lock:
+            result = {}
+            for facet in FACETS:
+                base = self._selection(filters, skip=facet if facet in SINGLE_CHOICE else None)
+                result[facet] = {value: (bitmap & base).bit_count()
+                                 for value, bitmap in self._bitmaps[facet].items()}
+            result['total'] = self._selection(filters).bit_count()
+            return result
+
+    # Function to list the recipe ids matching a filter selection
+    def ids(self, filters=None):
+        with self._lock:
+            bits = self._selection(filters)
+            if not bits:
+                return []
+            raw = np.frombuffer(bits.to_bytes((bits.bit_length() + 7) // 8, 'little'), dtype=np.uint8)
+            positions = np.flatnonzero(np.unpackbits(raw, bitorder='little'))
+            return [self._ids[i] for i in positions]
+
+
+# Function to load the faceted fields for every recipe
+def load_facet_index(db):
+    return FacetIndex(recipe_rows(db, LOAD_FIELDS))
+
+
+_shared_index = None
+_shared_lock = threading.Lock()
+
+
+# Function to return the process-wide facet index shared by every session.
+# It is loaded once and then kept current by recipe change events.
+def get_shared_facets():
+    global _shared_index
+    with _shared_lock:
+        if _shared_index is None:
+            from firebase_config import db
+            _shared_index = load_facet_index(db)
+            recipe_events.subscribe(_shared_index.update, fields=LOAD_FIELDS)
+    return _shared_index
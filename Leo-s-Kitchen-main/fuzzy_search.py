@@ -0,0 +1,187 @@
+# fuzzy_search.py
+# Typo-tolerant recipe search ("chiken", "protien bowl").
+#
+# Every word in recipe names and ingredient names goes into a vocabulary with
+# the recipes that use it. Words are indexed by their trigrams (padded, so
+# "oats" -> " oa", "oat", "ats", "ts "). A query word collects candidate words
+# from the posting lists of its own trigrams; since one edit changes at most
+# four trigrams (three, or four for a swap of neighbours), a word needs enough
+# shared trigrams to be within reach and everything else is never looked at.
+# Very short words share too few trigrams to survive a typo, so they also
+# look at vocabulary words with the same first letter and a similar length.
+# Candidates are then ranked by edit distance (adjacent transpositions count
+# as one edit), with a small penalty for matching only the start of a longer
+# word ("chick" -> "chicken").
+#
+# A recipe matches when every query word matches one of its words; results
+# are ordered by total distance. Posted, edited and deleted recipes update the
+# index through recipe change events.
+import re
+import threading
+from collections import Counter, defaultdict
+
+import recipe_events
+from recipe_replica import recipe_rows
+from typeahead import ingredient_name
+
+LOAD_FIELDS = ['name', 'ingredients']
+PREFIX_PENALTY = 0.5
+SHORT_WORD = 4
+STOPWORDS = {'a', 'an', 'and', 'the', 'of', 'with', 'in', 'on', 'or', 'to', 'for'}
+
+_WORD = re.compile(r"[a-z0-9]+")
+
+
+def words(text):
+    return [w for w in _WORD.findall(text.lower()) if len(w) > 1 and w not in STOPWORDS]
+
+
+def trigrams(word):
+    padded = f" {word} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+# Function to allow more typos in longer words: 1 edit up to 5 letters,
+# 2 up to 9, then 3
+def max_edits(word):
+    return 1 if len(word) <= 5 else (2 if len(word) <= 9 else 3)
+
+
+# Function to compute edit distance with adjacent transpositions, giving up
+# (returning limit + 1) as soon as the distance must exceed limit
+def edit_distance(a, b, limit):
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    previous2, previous = None, list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        current = [i] + [0] * len(b)
+        for j in range(1, len(b) + 1):
+            cost = 0 if a[i - 1] == b[j - 1] else 1
+            current[j] = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + cost)
+            if i > 1 and j > 1 and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]:
+                current[j] = min(current[j], previous2[j - 2] + 1)
+        if min(current) > limit:
+            return limit + 1
+        previous2, previous = previous, current
+    return previous[-1]
+
+
+# Function to list the searchable words of a recipe
+def recipe_words(recipe):
+    found = set(words(recipe.get('name') or ''))
+    for line in recipe.get('ingredients') or ():
+        found.update(words(ingredient_name(str(line))))
+    return found
+
+
+class FuzzyIndex:
+    def __init__(self, recipes=()):
+        self._lock = threading.Lock()
+        self._recipes_by_word = defaultdict(set)  # word -> recipe ids
+        self._words_by_gram = defaultdict(set)  # trigram -> words
+        self._words_by_shape = defaultdict(set)  # (first letter, length) -> words
+        self._words_by_recipe = {}  # recipe id -> words
+        self._source = {}  # recipe id -> indexed fields, to merge partial edits
+        for recipe_id, recipe in recipes:
+            self._add(recipe_id, recipe)
+
+    def __len__(self):
+        return len(self._words_by_recipe)
+
+    def _add(self, recipe_id, recipe):
+        self._source[recipe_id] = {f: recipe.get(f) for f in LOAD_FIELDS}
+        found = recipe_words(recipe)
+        self._words_by_recipe[recipe_id] = found
+        for word in found:
+            if not self._recipes_by_word[word]:
+                for gram in trigrams(word):
+                    self._words_by_gram[gram].add(word)
+                self._words_by_shape[(word[0], len(word))].add(word)
+            self._recipes_by_word[word].add(recipe_id)
+
+    def _remove(self, recipe_id):
+        self._source.pop(recipe_id, None)
+        for word in self._words_by_recipe.pop(recipe_id, ()):
+            holders = self._recipes_by_word[word]
+            holders.discard(recipe_id)
+            if not holders:
+                del self._recipes_by_word[word]
+                for gram in trigrams(word):
+                    self._words_by_gram[gram].discard(word)
+                    if not self._words_by_gram[gram]:
+                        del self._words_by_gram[gram]
+                self._words_by_shape[(word[0], len(word))].discard(word)
+
+    # Function to apply a recipe change; pass recipe=None for a delete.
+    # Signature matches recipe_events.subscribe callbacks.
+    def update(self, recipe_id, recipe, changed_fields=None):
+        with self._lock:
+            if recipe is not None:
+                recipe = {**self._source.get(recipe_id, {}), **recipe}
+            self._remove(recipe_id)
+            if recipe is not None:
+                self._add(recipe_id, recipe)
+
+    # Function to find vocabulary words close to one query word as {word: distance}
+    def similar_words(self, query_word):
+        limit = max_edits(query_word)
+        grams = trigrams(query_word)
+        counts = Counter()
+        for gram in grams:
+            counts.update(self._words_by_gram.get(gram, ()))
+        # Each edit breaks at most 4 of the query's trigrams
+        needed = max(1, len(grams) - 4 * limit)
+        candidates = {word for word, shared in counts.items() if shared >= needed}
+        if len(query_word) <= SHORT_WORD:
+            for length in range(len(query_word) - limit, len(query_word) + limit + 1):
+                candidates.update(self._words_by_shape.get((query_word[0], length), ()))
+        matches = {}
+        for word in candidates:
+            distance = edit_distance(query_word, word, limit)
+            if len(word) > len(query_word):
+                distance = min(distance, edit_distance(query_word, word[:len(query_word)], limit) + PREFIX_PENALTY)
+            if distance <= limit:
+                matches[word] = distance
+        return matches
+
+    # Function to search recipes; returns [(recipe_id, distance)] best first
+    def search(self, query, limit=200):
+        query_words = words(query)
+        if not query_words:
+            return []
+        with self._lock:
+            best = None  # recipe id -> summed distance over the query words so far
+            for query_word in query_words:
+                per_recipe = {}
+                for word, distance in self.similar_words(query_word).items():
+                    for recipe_id in self._recipes_by_word[word]:
+                        if distance < per_recipe.get(recipe_id, float('inf')):
+                            per_recipe[recipe_id] = distance
+                if best is None:
+                    best = per_recipe
+                else:
+                    best = {rid: best[rid] + d for rid, d in per_recipe.items() if rid in best}
+                if not best:
+                    return []
+        return sorted(best.items(), key=lambda item: (item[1], item[0]))[:limit]
+
+
+# Function to load names and ingredients for every recipe
+def load_fuzzy_index(db):
+    return FuzzyIndex(recipe_rows(db, LOAD_FIELDS))
+
+
+_shared_index = None
+_shared_lock = threading.Lock()
+
+
+# Function to return the process-wide search index shared by every session.
+# It is loaded once and then kept current by recipe change events.
+def get_shared_fuzzy_index():
+    global _shared_index
+    with _shared_lock:
+        if _shared_index is None:
+            from firebase_config import db
+            _shared_index = load_fuzzy_index(db)
+            recipe_events.subscribe(_shared_index.update, fields=LOAD_FIELDS)
+    return _shared_index
@@ -0,0 +1,171 @@
+# live_queries.py
+# One Firestore snapshot listener per query shape per server process.
+#
+# Every session that wants live data for the same query (e.g. the comments of
+# one recipe) shares a single LiveQuery: one on_snapshot listener, one read
+# stream, and an in-memory materialized result. A page polls `version` from a
+# small st.fragment(run_every=...) that draws nothing, and reruns only when
+# the version has moved past the one it last drew (see
+# session_cache.moved_since_drawn), so the polling costs no Firestore reads
+# and no re-renders. Server-side code can also register change callbacks.
+#
+# Sessions keep their subscription alive by calling subscribe() on each run;
+# a listener with no session seen for IDLE_TIMEOUT seconds is closed. A
+# listener whose snapshot handling failed, or whose stream has stopped, is
+# restarted by the next subscribe() (at most once per RESTART_DELAY); until
+# then sessions keep the last good result and can check `error`. Pages wait
+# for a first snapshot only briefly after a listener is created; past that, or
+# while it is failing, wait_ready() returns at once and they use a fallback.
+import logging
+import threading
+import time
+
+from firebase_admin import firestore
+
+logger = logging.getLogger(__name__)
+
+IDLE_TIMEOUT = 60  # seconds without any session before a listener is closed
+RESTART_DELAY = 5  # seconds between restarts of a failed listener
+
+_registry = {}
+_registry_lock = threading.Lock()
+
+
+class LiveQuery:
+    def __init__(self, key, start_watch):
+        self.key = key
+        self.data = None
+        self.version = 0
+        self.error = None
+        self._cond = threading.Condition()
+        self._sessions = {}  # session_id -> last seen (monotonic)
+        self._callbacks = []
+        self._start_watch = start_watch
+        self._created_at = self._started_at = time.monotonic()
+        self._watch = start_watch(self._on_snapshot)
+
+    def _on_snapshot(self, snapshots, changes, read_time):
+        try:
+            data = [(snap.id, snap.to_dict()) for snap in snapshots if snap.exists]
+        except Exception as e:
+            logger.exception("Live query %r failed to read its snapshot", self.key)
+            with self._cond:
+                self.error = e
+                self._cond.notify_all()
+            return
+        with self._cond:
+            self.error = None
+            self.data = data
+            self.version += 1
+            callbacks = list(self._callbacks)
+            self._cond.notify_all()
+        for callback in callbacks:
+            try:
+                callback(self.key, data, changes)
+            except Exception:
+                logger.exception("Live query callback %r failed", callback)
+
+    # Function to wait for the first snapshot; returns False on timeout. The
+    # timeout counts from when the listener was first subscribed, so only the
+    # runs right after that wait; a listener that failed, was restarted or
+    # never delivers doesn't hold up every rerun.
+    def wait_ready(self, timeout):
+        with self._cond:
+            if self.version > 0:
+                return True
+            remaining = self._created_at + timeout - time.monotonic()
+            if remaining <= 0 or not self.healthy():
+                return False
+            self._cond.wait_for(lambda: self.version > 0 or not self.healthy(), timeout=remaining)
+            return self.version > 0
+
+    def touch(self, session_id):
+        with self._cond:
+            self._sessions[session_id] = time.monotonic()
+
+    def add_callback(self, callback):
+        with self._cond:
+            self._callbacks.append(callback)
+
+    def is_idle(self, now):
+        with self._cond:
+            self._sessions = {sid: seen for sid, seen in self._sessions.items() if now - seen < IDLE_TIMEOUT}
+            return not self._sessions and not self._callbacks
+
+    # Function to tell whether the listener is still delivering snapshots
+    def healthy(self):
+        return self.error is None and getattr(self._watch, 'is_active', True)
+
+    # Function to replace a failed listener with a new one; the last good
+    # result stays available meanwhile. Returns False if it restarted too recently.
+    def restart(self):
+        now = time.monotonic()
+        if now - self._started_at < RESTART_DELAY:
+            return False
+        self._started_at = now
+        reason = self.error or "a stopped stream"
+        self.close()
+        try:
+            self._watch = self._start_watch(self._on_snapshot)
+        except Exception as e:
+            logger.exception("Failed to restart live query %r", self.key)
+            self.error = e
+            return False
+        logger.warning("Restarted live query %r after %r", self.key, reason)
+        return True
+
+    def close(self):
+        try:
+            self._watch.unsubscribe()
+        except Exception:
+            logger.exception("Failed to close live query %r", self.key)
+
+
+# Function to close listeners nobody has looked at recently
+def _reap_idle():
+    now = time.monotonic()
+    with _registry_lock:
+        idle = [key for key, live in _registry.items() if live.is_idle(now)]
+        closed = [_registry.pop(key) for key in idle]
+    for live in closed:
+        live.close()
+
+
+# Function to get (or start) the shared listener for a query shape and mark
+# the session as interested. start_watch(callback) must return the Watch
+# object from .on_snapshot(callback). A listener that has stopped is restarted.
+def subscribe(key, start_watch, session_id):
+    _reap_idle()
+    with _registry_lock:
+        live = _registry.get(key)
+        if live is None:
+            live = LiveQuery(key, start_watch)
+            _registry[key] = live
+        elif not live.healthy():
+            live.restart()
+    live.touch(session_id)
+    return live
+
+
+# Function for the number of open listeners (useful for monitoring)
+def open_listeners():
+    with _registry_lock:
+        return len(_registry)
+
+
+# --- Query shapes used by the pages ---
+
+# Function to subscribe to the latest comments on a recipe
+def recipe_comments(db, recipe_id, session_id, limit=10):
+    def start(callback):
+        query = (db.collection('comments').where('recipe_id', '==', recipe_id)
+                 .order_by('created_at', direction=firestore.Query.DESCENDING).limit(limit))
+        return query.on_snapshot(callback)
+    return subscribe(('comments', recipe_id, limit), start, session_id)
+
+
+# Function to subscribe to a single document, e.g. rankings/home
+def document(db, path, session_id):
+    def start(callback):
+        return db.document(path).on_snapshot(callback)
+    return subscribe(('document', path), start, session_id)
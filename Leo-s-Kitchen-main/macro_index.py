@@ -0,0 +1,222 @@
+# macro_index.py
+# "Match my macros" search: k nearest recipes to a protein/carbs/fat/calories
+# target, served from an in-memory KD-tree.
+#
+# Coordinates are scaled so one unit is roughly comparable on every axis
+# (calories are counted in 10 kcal steps). Per-macro weights are applied at
+# query time, so one tree serves every weighting. Hard caps (e.g. calories
+# under 450) prune whole subtrees using each node's bounding box.
+#
+# Recipe changes go to a small brute-force "delta" buffer plus a tombstone
+# set; the tree is rebuilt once the buffer grows past a fraction of the index.
+import heapq
+import threading
+
+import numpy as np
+
+import recipe_events
+from recipe_replica import recipe_rows
+
+MACROS = ('protein', 'carbs', 'fat', 'calories')
+# Macros plus the card fields macro search results show
+LOAD_FIELDS = ['name', 'category', 'tags', 'username', 'rating', 'reviews', 'date_posted'] + list(MACROS)
+SCALES = np.array([1.0, 1.0, 1.0, 0.1])
+LEAF_SIZE = 32
+REBUILD_FRACTION = 0.02
+MIN_REBUILD = 256
+
+
+# Function to pull the macro vector out of a recipe dict (None if incomplete)
+def macro_vector(recipe):
+    try:
+        return np.array([float(recipe[m]) for m in MACROS]) * SCALES
+    except (KeyError, TypeError, ValueError):
+        return None
+
+
+class _KDTree:
+    def __init__(self, points):
+        self.points = points
+        n = len(points)
+        self.order = np.arange(n)
+        # Flat node arrays: bounding box, children and the slice of self.order
+        self.lo, self.hi, self.left, self.right, self.start, self.end = [], [], [], [], [], []
+        if n:
+            self._build(0, n)
+            # Plain tuples: for 4 dimensions Python math beats numpy call overhead
+            self.lo = [tuple(x.tolist()) for x in self.lo]
+            self.hi = [tuple(x.tolist()) for x in self.hi]
+
+    def _build(self, start, end):
+        node = len(self.start)
+        idx = self.order[start:end]
+        pts = self.points[idx]
+        self.lo.append(pts.min(axis=0))
+        self.hi.append(pts.max(axis=0))
+        self.start.append(start)
+        self.end.append(end)
+        self.left.append(-1)
+        self.right.append(-1)
+        if end - start > LEAF_SIZE:
+            axis = int(np.argmax(self.hi[node] - self.lo[node]))
+            mid = (end - start) // 2
+            part = np.argpartition(pts[:, axis], mid)
+            self.order[start:end] = idx[part]
+            self.left[node] = self._build(start, start + mid)
+            self.right[node] = self._build(start + mid, end)
+        return node
+
+    # Best-first search over node bounding boxes. w is the per-axis weight
+    # (squared distance), cap_hi the per-axis upper bound (inf for none),
+    # keep an optional test a point's position must pass.
+    def query(self, target, w, cap_hi, k, skip, keep=None):
+        if not self.start:
+            return []
+        best = []  # max-heap of (-dist, index)
+        heap = [(0.0, 0)]
+        dims = list(zip(target.tolist(), w.tolist(), cap_hi.tolist()))
+        while heap:
+            bound, node = heapq.heappop(heap)
+            if len(best) == k and bound >= -best[0][0]:
+                break
+            left = self.left[node]
+            if left == -1:
+                idx = self.order[self.start[node]:self.end[node]]
+                pts = self.points[idx]
+                ok = np.all(pts <= cap_hi, axis=1)
+                if not ok.any():
+                    continue
+                idx, pts = idx[ok], pts[ok]
+                dist = ((pts - target) ** 2 * w).sum(axis=1)
+                for d, i in zip(dist.tolist(), idx.tolist()):
+                    if i in skip or (keep is not None and not keep(i)):
+                        continue
+                    if len(best) < k:
+                        heapq.heappush(best, (-d, i))
+                    elif d < -best[0][0]:
+                        heapq.heapreplace(best, (-d, i))
+                continue
+            for child in (left, self.right[node]):
+                bound = 0.0
+                for lo, hi, (t, wt, cap) in zip(self.lo[child], self.hi[child], dims):
+                    if lo > cap:
+                        break
+                    gap = lo - t if lo > t else (t - hi if t > hi else 0.0)
+                    bound += gap * gap * wt
+                else:
+                    heapq.heappush(heap, (bound, child))
+        return sorted((-d, i) for d, i in best)
+
+
+class MacroIndex:
+    def __init__(self, recipes=()):
+        self._lock = threading.Lock()
+        self._build(dict(recipes))
+
+    def _build(self, recipes):
+        ids, vectors = [], []
+        for recipe_id, recipe in recipes.items():
+            vec = macro_vector(recipe)
+            if vec is not None:
+                ids.append(recipe_id)
+                vectors.append(vec)
+        self._ids = ids
+        self._tree = _KDTree(np.array(vectors).reshape(-1, len(MACROS)))
+        self._position = {rid: i for i, rid in enumerate(ids)}
+        self._deleted = set()  # tree positions that are stale
+        self._delta = {}  # recipe_id -> vector, newer than the tree
+        self._recipes = recipes
+
+    def __len__(self):
+        return len(self._ids) - len(self._deleted) + len(self._delta)
+
+    # Function to apply a recipe change; pass recipe=None for a delete.
+    # Signature matches recipe_events.subscribe callbacks.
+    def update(self, recipe_id, recipe, changed_fields=None):
+        with self._lock:
+            card_only = changed_fields is not None and not set(changed_fields) & set(MACROS)
+            if recipe is not None and card_only and recipe_id in self._recipes:
+                # Card fields only (e.g. a new rating); the vector stays put
+                self._recipes[recipe_id] = {**self._recipes[recipe_id], **recipe}
+                return
+            pos = self._position.get(recipe_id)
+            if pos is not None:
+                self._deleted.add(pos)
+            self._delta.pop(recipe_id, None)
+            if recipe is None:
+                self._recipes.pop(recipe_id, None)
+            else:
+                # Edits may carry only some fields; keep the rest from before
+                recipe = {**self._recipes.get(recipe_id, {}), **recipe}
+                self._recipes[recipe_id] = recipe
+                vec = macro_vector(recipe)
+                if vec is not None:
+                    self._delta[recipe_id] = vec
+            if len(self._delta) + len(self._deleted) > max(MIN_REBUILD, REBUILD_FRACTION * len(self._ids)):
+                self._build(self._recipes)
+
+    # Function to find the k recipes nearest to the target macros.
+    #   target:  {'protein': 35, 'carbs': 40, ...}; missing macros are ignored
+    #   weights: optional {'protein': 2.0, ...}; default 1 for targeted macros
+    #   caps:    optional {'calories': 450, ...}; hard upper bounds
+    #   category, within: optional; only recipes in that category / id set
+    # Returns [(recipe_id, distance)] closest first.
+    def nearest(self, target, k=10, weights=None, caps=None, category=None, within=None):
+        weights = weights or {}
+        caps = caps or {}
+        t = np.array([float(target.get(m, 0) or 0) for m in MACROS]) * SCALES
+        w = np.array([float(weights.get(m, 1.0)) if target.get(m) else 0.0 for m in MACROS])
+        cap_hi = np.array([float(caps[m]) if caps.get(m) is not None else np.inf for m in MACROS]) * SCALES
+
+        with self._lock:
+            tree, ids, deleted, delta = self._tree, self._ids, set(self._deleted), dict(self._delta)
+            recipes = self._recipes
+
+        # Filters are applied inside the search, so k matches still come back
+        def allowed(recipe_id):
+            if within is not None and recipe_id not in within:
+                return False
+            return category is None or recipes.get(recipe_id, {}).get('category') == category
+
+        filtered = category is not None or within is not None
+        keep = (lambda i: allowed(ids[i])) if filtered else None
+        results = [(d, ids[i]) for d, i in tree.query(t, w, cap_hi, k, deleted, keep)]
+        if filtered:
+            delta = {rid: vec for rid, vec in delta.items() if allowed(rid)}
+        if delta:
+            delta_ids = list(delta)
+            pts = np.array([delta[rid] for rid in delta_ids])
+            ok = np.all(pts <= cap_hi, axis=1)
+            dist = ((pts - t) ** 2 * w).sum(axis=1)
+            results.extend((float(d), rid) for d, rid, keep in zip(dist, delta_ids, ok) if keep)
+            results.sort()
+        return [(rid, float(np.sqrt(d))) for d, rid in results[:k]]
+
+    def get(self, recipe_id):
+        return self._recipes.get(recipe_id)
+
+    # Function to snapshot every indexed recipe as (id, data) pairs
+    def items(self):
+        with self._lock:
+            return list(self._recipes.items())
+
+
+# Function to load every recipe's macros without pulling images or text
+def load_macro_index(db):
+    return MacroIndex(recipe_rows(db, LOAD_FIELDS))
+
+
+_shared_index = None
+_shared_lock = threading.Lock()
+
+
+# Function to return the process-wide index shared by every session and page.
+# It is loaded once and then kept current by recipe change events.
+def get_shared_index():
+    global _shared_index
+    with _shared_lock:
+        if _shared_index is None:
+            from firebase_config import db
+            _shared_index = load_macro_index(db)
+            recipe_events.subscribe(_shared_index.update, fields=LOAD_FIELDS)
+    return _shared_index
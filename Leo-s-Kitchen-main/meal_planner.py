@@ -0,0 +1,108 @@
+# meal_planner.py
+# Daily meal plans: one recipe per slot (Breakfast, Lunch, Dinner, Snacks)
+# chosen to land as close as possible to the user's daily macro targets.
+#
+# The search is two vectorized steps:
+#   1. For each slot, score every recipe in that category against the slot's
+#      share of the day and keep the best CANDIDATES_PER_SLOT (argpartition).
+#   2. Evaluate every combination of those candidates at once with numpy
+#      broadcasting (24^4 ~ 330k plans) and take the one with the smallest
+#      relative squared deviation from the daily targets.
+# Multi-day plans repeat step 2, dropping used recipes when repeats are off.
+# With repeats on a recipe may come back on a later day, but never the same
+# whole day's combination, so the days still differ.
+import numpy as np
+
+from macro_index import MACROS
+
+SLOTS = ["Breakfast", "Lunch", "Dinner", "Snacks"]
+# Rough share of the day's intake per slot, used only to shortlist candidates
+SLOT_SHARES = {"Breakfast": 0.25, "Lunch": 0.35, "Dinner": 0.30, "Snacks": 0.10}
+CANDIDATES_PER_SLOT = 24
+
+
+# Function to turn recipes into per-slot id lists and macro matrices
+def build_slot_arrays(recipes, exclude_tags=()):
+    exclude = {tag.strip().lower() for tag in exclude_tags if tag.strip()}
+    ids = {slot: [] for slot in SLOTS}
+    rows = {slot: [] for slot in SLOTS}
+    for recipe_id, recipe in recipes:
+        slot = recipe.get('category')
+        if slot not in ids:
+            continue
+        if exclude and exclude & {str(tag).lower() for tag in recipe.get('tags', [])}:
+            continue
+        try:
+            row = [float(recipe[m]) for m in MACROS]
+        except (KeyError, TypeError, ValueError):
+            continue
+        ids[slot].append(recipe_id)
+        rows[slot].append(row)
+    return {slot: (ids[slot], np.array(rows[slot]).reshape(-1, len(MACROS))) for slot in SLOTS}
+
+
+# Function to score how far totals are from the targets (relative, squared)
+def _deviation(totals, target, weights):
+    return (((totals - target) / target) ** 2 * weights).sum(axis=-1)
+
+
+# Function to pick the best plan for one day.
+# slot_arrays: output of build_slot_arrays; used: recipe ids to leave out;
+# avoid: earlier days' plans ({slot: recipe_id}) not to pick again.
+# Returns ({slot: recipe_id}, totals array, deviation) or None if a slot is empty.
+def plan_day(slot_arrays, targets, weights=None, used=(), avoid=()):
+    target = np.array([max(float(targets[m]), 1.0) for m in MACROS])
+    w = np.array([float((weights or {}).get(m, 1.0)) for m in MACROS])
+    used = set(used)
+
+    shortlist = []
+    for slot in SLOTS:
+        ids, matrix = slot_arrays[slot]
+        if used:
+            idx = np.flatnonzero(np.array([rid not in used for rid in ids], dtype=bool))
+        else:
+            idx = np.arange(len(ids))
+        if not len(idx):
+            return None
+        score = _deviation(matrix[idx], target * SLOT_SHARES[slot], w)
+        m = min(CANDIDATES_PER_SLOT, len(idx))
+        best = idx[np.argpartition(score, m - 1)[:m]]
+        shortlist.append((ids, best, matrix[best]))
+
+    # totals[b, l, d, s] = breakfast[b] + lunch[l] + dinner[d] + snack[s]
+    (_, _, b), (_, _, l), (_, _, d), (_, _, s) = shortlist
+    totals = (b[:, None, None, None, :] + l[None, :, None, None, :]
+              + d[None, None, :, None, :] + s[None, None, None, :, :])
+    deviation = _deviation(totals, target, w)
+    for earlier in avoid:
+        positions = []
+        for slot, (ids, best, _) in zip(SLOTS, shortlist):
+            shortlisted = [ids[i] for i in best]
+            if earlier[slot] not in shortlisted:
+                break
+            positions.append(shortlisted.index(earlier[slot]))
+        else:
+            deviation[tuple(positions)] = np.inf
+    pick = np.unravel_index(int(np.argmin(deviation)), deviation.shape)
+
+    plan = {}
+    for slot, (ids, best, _), choice in zip(SLOTS, shortlist, pick):
+        plan[slot] = ids[best[choice]]
+    return plan, totals[pick], float(deviation[pick])
+
+
+# Function to plan several days; with allow_repeats=False no recipe is used
+# twice, otherwise no day is the same as an earlier one
+def plan_days(recipes, targets, days=1, weights=None, exclude_tags=(), allow_repeats=True, exclude_ids=()):
+    slot_arrays = build_slot_arrays(recipes, exclude_tags)
+    used = set(exclude_ids)
+    plans = []
+    for _ in range(days):
+        avoid = [plan for plan, _, _ in plans] if allow_repeats else ()
+        result = plan_day(slot_arrays, targets, weights, used, avoid)
+        if result is None or np.isinf(result[2]):
+            break
+        plans.append(result)
+        if not allow_repeats:
+            used.update(result[0].values())
+    return plans
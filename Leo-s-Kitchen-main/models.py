@@ -0,0 +1,263 @@
+# models.py
+# Typed, compact records for recipes, users and comments.
+#
+# Pages used to pass raw Firestore dicts around and repeat the same defaults
+# everywhere (.get('name', 'Untitled Recipe')). A record is validated once at
+# the boundary (from_doc / from_dict), gets its defaults filled in, and keeps
+# its fields in __slots__ rather than a per-object dict. That makes a cached
+# recipe a fraction of the size of the equivalent dict (see record_size_report).
+# to_dict() gives back the Firestore document shape.
+#
+# Records also answer record['field'] and record.get('field', default), so
+# code written against the dicts keeps working. Fields a document carries that
+# the model doesn't know about are kept in `extra` and written back unchanged.
+import sys
+
+PLACEHOLDER_IMAGE = "https://api.placeholder.com/640/480"
+
+
+class SchemaError(ValueError):
+    pass
+
+
+# --- Field converters. Each takes the raw value and returns the stored one or
+# raises SchemaError; None (a missing field) never reaches them.
+
+def _text(value):
+    if isinstance(value, str):
+        return value
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return str(value)
+    raise SchemaError(f"expected text, got {type(value).__name__}")
+
+
+# Short strings repeated across many records (categories, user ids) are
+# interned so a large catalog holds one copy of each
+def _label(value):
+    return sys.intern(_text(value))
+
+
+def _amount(value):
+    if isinstance(value, bool):
+        raise SchemaError("expected a number, got bool")
+    if isinstance(value, str):
+        try:
+            value = float(value) if '.' in value else int(value)
+        except ValueError:
+            raise SchemaError(f"expected a number, got {value!r}")
+    if not isinstance(value, (int, float)):
+        raise SchemaError(f"expected a number, got {type(value).__name__}")
+    if value < 0:
+        raise SchemaError(f"must not be negative, got {value}")
+    return value
+
+
+def _rating(value):
+    value = _amount(value)
+    if value > 5:
+        raise SchemaError(f"must be between 0 and 5, got {value}")
+    return value
+
+
+def _flag(value):
+    if isinstance(value, bool):
+        return value
+    raise SchemaError(f"expected true/false, got {type(value).__name__}")
+
+
+def _texts(value):
+    if isinstance(value, str):
+        value = [value]
+    if not isinstance(value, (list, tuple)):
+        raise SchemaError(f"expected a list, got {type(value).__name__}")
+    return tuple(_text(item) for item in value)
+
+
+def _labels(value):
+    return tuple(sys.intern(item) for item in _texts(value))
+
+
+def _as_is(value):
+    return value
+
+
+class _Record:
+    __slots__ = ('id', 'extra')
+    # (field, converter, default) in document order
+    FIELDS = ()
+
+    def __init__(self, id=None, **values):
+        self.id = id
+        for name, _, default in self.FIELDS:
+            setattr(self, name, values.pop(name, default))
+        self.extra = values or None
+
+    # Function to build a record from a document's data, validating every field
+    @classmethod
+    def from_dict(cls, doc_id, data):
+        data = dict(data or {})
+        values = {}
+        for name, convert, default in cls.FIELDS:
+            raw = data.pop(name, None)
+            if raw is None:
+                continue
+            try:
+                values[name] = convert(raw)
+            except SchemaError as e:
+                raise SchemaError(f"{cls.__name__} {doc_id}: {name}: {e}") from None
+        data.pop('id', None)
+        values.update(data)
+        return cls(doc_id, **values)
+
+    # Function to build a record from a Firestore snapshot (None if missing)
+    @classmethod
+    def from_doc(cls, doc):
+        if not doc.exists:
+            return None
+        return cls.from_dict(doc.id, doc.to_dict())
+
+    # Function to return the Firestore document shape
+    def to_dict(self, include_id=False):
+        data = {}
+        for name, _, _ in self.FIELDS:
+            value = getattr(self, name)
+            data[name] = list(value) if isinstance(value, tuple) else value
+        if self.extra:
+            data.update(self.extra)
+        if include_id:
+            data['id'] = self.id
+        return data
+
+    def get(self, name, default=None):
+        if name == 'id':
+            return self.id
+        if name in self._field_names():
+            value = getattr(self, name)
+        else:
+            value = (self.extra or {}).get(name)
+        return default if value is None else value
+
+    def __getitem__(self, name):
+        if name == 'id' or name in self._field_names():
+            return self.get(name)
+        if self.extra and name in self.extra:
+            return self.extra[name]
+        raise KeyError(name)
+
+    @classmethod
+    def _field_names(cls):
+        names = cls.__dict__.get('_names')
+        if names is None:
+            names = frozenset(name for name, _, _ in cls.FIELDS)
+            cls._names = names
+        return names
+
+    def __eq__(self, other):
+        return type(self) is type(other) and self.id == other.id and self.to_dict() == other.to_dict()
+
+    __hash__ = None
+
+    def __repr__(self):
+        return f"{type(self).__name__}(id={self.id!r})"
+
+
+class Recipe(_Record):
+    FIELDS = (
+        ('name', _text, "Untitled Recipe"),
+        ('category', _label, "Uncategorized"),
+        ('description', _text, ""),
+        ('recipe_url', _text, ""),
+        ('image', _text, PLACEHOLDER_IMAGE),
+        ('user_id', _label, None),
+        ('username', _label, ""),
+        ('user', _label, ""),
+        ('date_posted', _as_is, ""),
+        ('updated_at', _as_is, None),
+        ('protein', _amount, 0),
+        ('carbs', _amount, 0),
+        ('fat', _amount, 0),
+        ('calories', _amount, 0),
+        ('fiber', _amount, 0),
+        ('sugar', _amount, 0),
+        ('sodium', _amount, 0),
+        ('cholesterol', _amount, 0),
+        ('saturated_fat', _amount, 0),
+        ('trans_fat', _amount, 0),
+        ('tags', _labels, ()),
+        ('ingredients', _texts, ()),
+        ('instructions', _texts, ()),
+        ('prep_time', _text, ""),
+        ('cook_time', _text, ""),
+        ('total_time', _text, ""),
+        ('servings', _amount, 1),
+        ('likes', _amount, 0),
+        ('comments', _amount, 0),
+        ('rating', _rating, 0),
+        ('reviews', _amount, 0),
+        ('saved_count', _amount, 0),
+    )
+    __slots__ = tuple(name for name, _, _ in FIELDS)
+
+    # Recipes posted through the app carry the author's username rather than
+    # the "@handle" the seed data used
+    @property
+    def author(self):
+        return self.user or (f"@{self.username}" if self.username else "")
+
+
+class User(_Record):
+    # Optional profile text defaults to None so callers can supply their own
+    # wording for an unset field via get()
+    FIELDS = (
+        ('username', _label, ""),
+        ('email', _text, ""),
+        ('password_hash', _text, ""),
+        ('full_name', _text, None),
+        ('bio', _text, None),
+        ('profile_pic', _text, None),
+        ('date_joined', _as_is, None),
+        ('is_premium', _flag, False),
+    )
+    __slots__ = tuple(name for name, _, _ in FIELDS)
+    # Fields safe to show other users or to put in a shared cache
+    PUBLIC_FIELDS = ('username', 'full_name', 'bio', 'profile_pic', 'date_joined', 'is_premium')
+
+    def __repr__(self):
+        return f"User(id={self.id!r}, username={self.username!r})"
+
+    # Function to return a copy with only the public profile fields; email,
+    # password hash and unknown extra fields are left out
+    def public(self):
+        return User(self.id, **{name: getattr(self, name) for name in self.PUBLIC_FIELDS})
+
+
+class Comment(_Record):
+    FIELDS = (
+        ('recipe_id', _label, None),
+        ('user_id', _label, None),
+        ('username', _label, "Anonymous"),
+        ('text', _text, ""),
+        ('created_at', _as_is, None),
+    )
+    __slots__ = tuple(name for name, _, _ in FIELDS)
+
+
+# Function to compare the memory held by records against the equivalent dicts
+def record_size_report(records):
+    def deep_size(obj, seen):
+        if id(obj) in seen:
+            return 0
+        seen.add(id(obj))
+        size = sys.getsizeof(obj)
+        if isinstance(obj, dict):
+            size += sum(deep_size(k, seen) + deep_size(v, seen) for k, v in obj.items())
+        elif isinstance(obj, (list, tuple)):
+            size += sum(deep_size(item, seen) for item in obj)
+        elif isinstance(obj, _Record):
+            size += sum(deep_size(getattr(obj, name), seen) for name in type(obj).__slots__)
+            size += deep_size(obj.extra, seen) if obj.extra else 0
+        return size
+
+    as_records = deep_size(list(records), set())
+    as_dicts = deep_size([r.to_dict() for r in records], set())
+    return {'records': as_records, 'dicts': as_dicts, 'ratio': as_records / as_dicts if as_dicts else 0.0}
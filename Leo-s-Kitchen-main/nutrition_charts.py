@@ -0,0 +1,153 @@
+# nutrition_charts.py
+# Chart specs for the profile page's nutrition dashboard.
+#
+# A user's history can hold years of daily points, and sending every point of
+# every series to the browser costs far more than drawing it. Each series is
+# cut down to a fixed point budget with Largest-Triangle-Three-Buckets (LTTB):
+# the points are split into equal buckets and each bucket keeps the point that
+# forms the largest triangle with the previously kept point and the next
+# bucket's average, so peaks, dips and trends survive while flat stretches
+# collapse. Series shorter than the budget are left alone.
+#
+# Finished figure dicts are cached in the shared cache per
+# (user, range, resolution). Each user has their own cache namespace, so
+# log_changed(user_id) drops all of that user's charts at once when new log
+# data is written and no other user is affected. Meals are logged with the
+# "I ate this" button on the recipe page, through log_meal().
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+import plotly.express as px
+from firebase_admin import firestore
+
+from shared_cache import cached, get_cache
+
+LOG_COLLECTION = 'nutrition_log'
+MACROS = ['Protein', 'Carbs', 'Fat']
+POINT_BUDGET = 200  # points per series
+CHART_TTL = 3600  # seconds
+
+# Range option -> number of days ending at the latest logged day (None = all)
+RANGES = {
+    "Last 30 days": 30,
+    "Last 90 days": 90,
+    "Last year": 365,
+    "All time": None,
+}
+
+
+# Function to pick the indices LTTB keeps for a series of at most `threshold` points
+def lttb(x, y, threshold):
+    n = len(x)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    every = (n - 2) / (threshold - 2)
+    selected = np.empty(threshold, dtype=np.int64)
+    selected[0], selected[-1] = 0, n - 1
+    a = 0
+    for i in range(threshold - 2):
+        start, end = int(i * every) + 1, int((i + 1) * every) + 1
+        next_end = min(int((i + 2) * every) + 1, n)
+        avg_x, avg_y = x[end:next_end].mean(), y[end:next_end].mean()
+        area = np.abs((x[a] - avg_x) * (y[start:end] - y[a]) - (x[a] - x[start:end]) * (avg_y - y[a]))
+        a = start + int(np.argmax(area))
+        selected[i + 1] = a
+    return selected
+
+
+# Function to downsample each column of a dated frame on its own and return
+# them in long form: one (Date, Nutrient, value_name) row per kept point
+def downsample_long(data, columns, budget, value_name='Grams'):
+    x = data['Date'].to_numpy(dtype='datetime64[s]').astype(np.int64)
+    parts = []
+    for column in columns:
+        keep = lttb(x, data[column].to_numpy(), budget)
+        parts.append(pd.DataFrame({
+            'Date': data['Date'].to_numpy()[keep],
+            'Nutrient': column,
+            value_name: data[column].to_numpy()[keep],
+        }))
+    return pd.concat(parts, ignore_index=True)
+
+
+# Sample history shown until the user has logged anything
+def sample_history():
+    dates = pd.date_range(start='2025-02-01', end='2025-03-01')
+    return pd.DataFrame({
+        'Date': dates,
+        'Protein': [round(100 + i*1.5) for i in range(len(dates))],
+        'Carbs': [round(150 - i) for i in range(len(dates))],
+        'Fat': [round(50 + i*0.5) for i in range(len(dates))],
+        'Calories': [round(1800 + i*10) for i in range(len(dates))]
+    })
+
+
+# Function to read a user's daily totals, oldest first
+def load_history(db, user_id):
+    docs = db.collection('users').document(user_id).collection(LOG_COLLECTION).order_by('date').stream()
+    rows = []
+    for doc in docs:
+        entry = doc.to_dict()
+        rows.append({
+            'Date': pd.Timestamp(entry.get('date') or doc.id),
+            'Protein': entry.get('protein', 0),
+            'Carbs': entry.get('carbs', 0),
+            'Fat': entry.get('fat', 0),
+            'Calories': entry.get('calories', 0),
+        })
+    if not rows:
+        return sample_history()
+    return pd.DataFrame(rows)
+
+
+# Function to keep only the last `days` days of a history
+def within_range(history, range_label):
+    days = RANGES.get(range_label)
+    if days is None or history.empty:
+        return history
+    cutoff = history['Date'].max() - pd.Timedelta(days=days - 1)
+    return history[history['Date'] >= cutoff]
+
+
+# Function to build the dashboard figures for one range and resolution
+def build_charts(db, user_id, range_label, budget):
+    history = within_range(load_history(db, user_id), range_label)
+    macros = px.line(downsample_long(history, MACROS, budget), x='Date', y='Grams', color='Nutrient',
+                     title=f'Daily Macro Nutrients ({range_label})')
+    calorie_points = downsample_long(history, ['Calories'], budget, value_name='Calories')
+    calories = px.bar(calorie_points, x='Date', y='Calories',
+                      title=f'Daily Calorie Intake ({range_label})')
+    return {
+        'macros': macros.to_dict(),
+        'calories': calories.to_dict(),
+        'recent': history.tail(7).reset_index(drop=True),
+        'points': len(history),
+    }
+
+
+def _namespace(user_id):
+    return f"nutrition_charts:{user_id}"
+
+
+# Function to return a user's dashboard figures through the shared cache
+def get_charts(db, user_id, range_label, budget=POINT_BUDGET):
+    return cached(_namespace(user_id), f"{range_label}:{budget}",
+                  lambda: build_charts(db, user_id, range_label, budget), ttl=CHART_TTL)
+
+
+# Function to drop every cached chart of a user after their log changed
+def log_changed(user_id):
+    get_cache().invalidate(_namespace(user_id))
+
+
+# Function to add a meal's macros to a user's daily totals
+def log_meal(db, user_id, macros, day=None):
+    day = day or datetime.now().strftime('%Y-%m-%d')
+    db.collection('users').document(user_id).collection(LOG_COLLECTION).document(day).set({
+        'date': day,
+        **{field: firestore.Increment(macros.get(field) or 0) for field in ('protein', 'carbs', 'fat', 'calories')},
+    }, merge=True)
+    log_changed(user_id)
@@ -5,6 +5,8 @@ import hashlib
 import re
 from datetime import datetime
 from firebase_config import db
+from shared_cache import cached
+from models import User
 import uuid
 
 # Page configuration
@@ -17,6 +19,7 @@ st.sidebar.page_link("pages/about_me.py", label="ℹ️ About Me")
 st.sidebar.page_link("pages/my_recipes.py", label="📊 My Recipes")
 st.sidebar.page_link("pages/chatbot.py", label="🤖 Chat Bot")
 st.sidebar.page_link("pages/post_meal.py", label="📝 Share Your Meal")
+st.sidebar.page_link("pages/meal_plan.py", label="🍽️ Meal Planner")
 st.sidebar.page_link("pages/auth.py", label="👤 Login/Register")
 
 # Hash password function
@@ -55,11 +58,14 @@ if st.session_state.authenticated:
         st.button("Edit Profile", key="edit_profile")
         
     with col2:
-        # Fetch user info from Firestore
-        user_doc = db.collection('users').document(st.session_state.user_id).get()
+        # Fetch the public profile from Firestore; credentials never reach the shared cache
+        def load_user():
+            user = User.from_doc(db.collection('users').document(st.session_state.user_id).get())
+            return user.public() if user is not None else None
         
-        if user_doc.exists:
-            user_info = user_doc.to_dict()
+        user_info = cached('profile', st.session_state.user_id, load_user, ttl=600)
+        
+        if user_info is not None:
             full_name = user_info.get('full_name', 'Not set')
             bio = user_info.get('bio', 'No bio yet')
             date_joined = user_info.get('date_joined', 'Unknown')
@@ -1,42 +1,86 @@
 import streamlit as st
-from openai import OpenAI
+import chat_client
+import chat_store
+from session_cache import session_id
 
 
 st.title("ChatGPT-like clone")
 
-# Set OpenAI API key from Streamlit secrets
-client = OpenAI(api_key=st.secrets["OPENAI_API_KEY"])
+# One OpenAI client and request queue shared by every session on this server
+pool = chat_client.get_pool(st.secrets["OPENAI_API_KEY"])
 
 # Set a default model
 if "openai_model" not in st.session_state:
     st.session_state["openai_model"] = "gpt-3.5-turbo"
 
-# Initialize chat history
-if "messages" not in st.session_state:
-    st.session_state.messages = []
+# History is stored per user; visitors who aren't logged in keep it for this browser session
+chat_user = st.session_state.get("user_id") or f"{chat_store.SESSION_PREFIX}{session_id()}"
+
+# Initialize chat history with only the most recent messages
+if st.session_state.get("chat_user") != chat_user:
+    st.session_state.chat_user = chat_user
+    st.session_state.messages = chat_store.get_messages(chat_user, limit=chat_store.WINDOW_SIZE)
+    st.session_state.older_messages = []
+
+# Older messages are loaded a page at a time, only when asked for
+shown = st.session_state.older_messages + st.session_state.messages
+oldest_id = shown[0]["id"] if shown else None
+if oldest_id is not None and chat_store.has_older(chat_user, oldest_id):
+    if st.button("Load older messages"):
+        st.session_state.older_messages = chat_store.get_messages(
+            chat_user, limit=chat_store.PAGE_SIZE, before_id=oldest_id) + st.session_state.older_messages
+        st.rerun()
+if st.session_state.older_messages and st.button("Hide older messages"):
+    st.session_state.older_messages = []
+    st.rerun()
 
 # Display chat messages from history on app rerun
-for message in st.session_state.messages:
+for message in st.session_state.older_messages + st.session_state.messages:
     with st.chat_message(message["role"]):
         st.markdown(message["content"])
 
+# Function to add a message to the store and the in-memory window
+def remember(role, content):
+    message_id = chat_store.add_message(chat_user, role, content)
+    st.session_state.messages.append({"id": message_id, "role": role, "content": content})
+    # Keep the session's window bounded; everything older stays in the store.
+    # If older messages are on screen, the trimmed ones join them so the
+    # shown history has no gap.
+    overflow = len(st.session_state.messages) - chat_store.WINDOW_SIZE
+    if overflow > 0:
+        if st.session_state.older_messages:
+            st.session_state.older_messages.extend(st.session_state.messages[:overflow])
+        del st.session_state.messages[:overflow]
+
 # Accept user input
 if prompt := st.chat_input("What is up?"):
     # Add user message to chat history
-    st.session_state.messages.append({"role": "user", "content": prompt})
+    remember("user", prompt)
     # Display user message in chat message container
     with st.chat_message("user"):
         st.markdown(prompt)
 # Display assistant response in chat message container
+    response = None
     with st.chat_message("assistant"):
-        stream = client.chat.completions.create(
-            model=st.session_state["openai_model"],
-            messages=[
-                {"role": m["role"], "content": m["content"]}
-                for m in st.session_state.messages
-            ],
-            stream=True,
-        )
-
-        response = st.write_stream(stream)
-    st.session_state.messages.append({"role": "assistant", "content": response})
\ No newline at end of file
+        try:
+            request = pool.submit(
+                chat_user,
+                st.session_state["openai_model"],
+                [{"role": m["role"], "content": m["content"]} for m in st.session_state.messages],
+            )
+        except chat_client.Busy as e:
+            st.warning(str(e))
+        else:
+            # Say so while the message waits for a free slot instead of just hanging
+            notice = st.empty()
+            while not request.wait_started(0.5):
+                ahead = pool.position(request)
+                notice.info(f"⏳ Busy right now, your message is queued"
+                            f"{f' behind {ahead} other' + ('s' if ahead != 1 else '') if ahead else ''}...")
+            notice.empty()
+            try:
+                response = st.write_stream(request.text())
+            except chat_client.ChatError as e:
+                st.error(str(e))
+    if response:
+        remember("assistant", response)
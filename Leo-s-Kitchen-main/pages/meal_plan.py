@@ -0,0 +1,74 @@
+# pages/meal_plan.py
+import streamlit as st
+import pandas as pd
+from macro_index import MACROS, get_shared_index
+from meal_planner import SLOTS, plan_days
+from ranking import summarize_recipe
+
+# Page configuration
+st.set_page_config(page_title="Meal Planner - Leo's Food App", page_icon="🐱", layout="wide")
+
+# --- SIDEBAR NAVIGATION ---
+st.sidebar.title("Navigation")
+st.sidebar.page_link("app.py", label="🏠 Home", icon="🏠")
+st.sidebar.page_link("pages/about_me.py", label="ℹ️ About Me")
+st.sidebar.page_link("pages/my_recipes.py", label="📊 My Recipes")
+st.sidebar.page_link("pages/chatbot.py", label="🤖 Chat Bot")
+st.sidebar.page_link("pages/post_meal.py", label="📝 Share Your Meal")
+st.sidebar.page_link("pages/meal_plan.py", label="🍽️ Meal Planner")
+
+st.title("Meal Planner 🍽️")
+st.write("Set your daily targets and we'll pick a breakfast, lunch, dinner and snack from the community recipes that add up as closely as possible.")
+
+with st.form("meal_plan_form"):
+    target_cols = st.columns(4)
+    with target_cols[0]:
+        target_protein = st.number_input("Protein (g)", min_value=1, value=150)
+    with target_cols[1]:
+        target_carbs = st.number_input("Carbs (g)", min_value=1, value=200)
+    with target_cols[2]:
+        target_fat = st.number_input("Fat (g)", min_value=1, value=60)
+    with target_cols[3]:
+        target_calories = st.number_input("Calories", min_value=1, value=target_protein*4 + target_carbs*4 + target_fat*9)
+    
+    option_col1, option_col2, option_col3 = st.columns(3)
+    with option_col1:
+        exclude_tags = st.text_input("Exclude tags (comma separated)", placeholder="e.g., dairy, nuts")
+    with option_col2:
+        days = st.slider("Days to plan", 1, 7, 1)
+    with option_col3:
+        allow_repeats = st.checkbox("Allow the same recipe on different days", value=False)
+    
+    generate = st.form_submit_button("Generate Plan")
+
+if generate:
+    targets = {'protein': target_protein, 'carbs': target_carbs, 'fat': target_fat, 'calories': target_calories}
+    index = get_shared_index()
+    with st.spinner("Building your plan..."):
+        plans = plan_days(index.items(), targets, days=days,
+                          exclude_tags=exclude_tags.split(','), allow_repeats=allow_repeats)
+    
+    if not plans:
+        st.warning("We couldn't find a recipe for every meal slot. Try removing some excluded tags.")
+    elif len(plans) < days:
+        st.info(f"Only found enough distinct recipes for {len(plans)} day(s).")
+    
+    for day, (plan, totals, _) in enumerate(plans, start=1):
+        st.subheader(f"Day {day}" if days > 1 else "Your Plan")
+        slot_cols = st.columns(len(SLOTS))
+        for slot_col, slot in zip(slot_cols, SLOTS):
+            meal = summarize_recipe(plan[slot], index.get(plan[slot]))
+            with slot_col:
+                st.caption(slot)
+                st.image(meal["image"], use_column_width=True)
+                st.markdown(f"**{meal['name']}**")
+                st.markdown(f"{meal['protein']}g P • {meal['carbs']}g C • {meal['fat']}g F • {meal['calories']} cal")
+                if st.button("View Recipe", key=f"plan_{day}_{slot}"):
+                    st.session_state.current_recipe_id = plan[slot]
+                    st.switch_page("pages/recipie_detail.py")
+        
+        # Plan totals against the targets
+        st.dataframe(pd.DataFrame({
+            'Target': [targets[m] for m in MACROS],
+            'Plan': [round(t) for t in totals.tolist()],
+        }, index=[m.capitalize() for m in MACROS]).T, use_container_width=True)
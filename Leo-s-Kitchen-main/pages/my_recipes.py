@@ -1,5 +1,9 @@
 import streamlit as st
 from firebase_config import db
+from session_cache import get_or_load, invalidate
+import reference_gc
+from saved_summaries import with_summaries
+from recipe_replica import user_posts
 
 # Page configuration
 st.set_page_config(page_title="My Recipes - Leo's Food App", page_icon="🐱", layout="wide")
@@ -11,6 +15,7 @@ st.sidebar.page_link("pages/about_me.py", label="ℹ️ About Me")
 st.sidebar.page_link("pages/my_recipes.py", label="📊 My Recipes")
 st.sidebar.page_link("pages/chatbot.py", label="🤖 Chat Bot")
 st.sidebar.page_link("pages/post_meal.py", label="📝 Share Your Meal")
+st.sidebar.page_link("pages/meal_plan.py", label="🍽️ Meal Planner")
 
 # Check if user is authenticated
 if 'authenticated' not in st.session_state or not st.session_state.authenticated:
@@ -21,13 +26,30 @@ else:
     st.title("My Recipes")
     st.write(f"Welcome, {st.session_state.username}! Here are all your saved recipes.")
     
-    # Create tabs for different recipe views
-    tab1, tab2, tab3 = st.tabs(["Saved Recipes", "My Posts", "Favorites"])
+    # Functions to load each view; results are cached for the session as (id, data) pairs
+    # Saved and favorite entries carry their own card fields; older entries
+    # without them are filled in from one batched read
+    def load_saved_recipes():
+        docs = db.collection('users').document(st.session_state.user_id).collection('saved_recipes').get()
+        return with_summaries(st.session_state.user_id, 'saved_recipes', [(doc.id, doc.to_dict()) for doc in docs])
     
-    with tab1:
+    # The user's own posts come from the local recipe replica, newest first
+    def load_user_posts():
+        return user_posts(db, st.session_state.user_id)
+    
+    def load_favorites():
+        docs = db.collection('users').document(st.session_state.user_id).collection('favorites').get()
+        return with_summaries(st.session_state.user_id, 'favorites', [(doc.id, doc.to_dict()) for doc in docs])
+    
+    # st.tabs runs every tab body on each rerun, so pick the view with a radio
+    # instead and only load (and render) the one that is visible
+    view = st.radio("View", ["Saved Recipes", "My Posts", "Favorites"],
+                    horizontal=True, label_visibility="collapsed", key="my_recipes_view")
+    
+    if view == "Saved Recipes":
         # Fetch saved recipes from Firebase
         try:
-            saved_recipes = db.collection('users').document(st.session_state.user_id).collection('saved_recipes').get()
+            saved_recipes = get_or_load('saved_recipes', load_saved_recipes)
             
             if not saved_recipes:
                 st.info("You haven't saved any recipes yet. Explore the home page to find recipes to save!")
@@ -38,8 +60,7 @@ else:
                 # Create columns for grid layout
                 cols = st.columns(3)
                 
-                for i, recipe_doc in enumerate(saved_recipes):
-                    recipe = recipe_doc.to_dict()
+                for i, (saved_id, recipe) in enumerate(saved_recipes):
                     
                     with cols[i % 3]:
                         # Display recipe card
@@ -61,25 +82,26 @@ else:
                         # Action buttons
                         col1, col2 = st.columns(2)
                         with col1:
-                            if st.button("View Recipe", key=f"view_{recipe_doc.id}"):
+                            if st.button("View Recipe", key=f"view_{saved_id}"):
                                 # Save recipe ID to session state and navigate to detail page
-                                st.session_state.current_recipe_id = recipe_doc.id
+                                st.session_state.current_recipe_id = saved_id
                                 st.switch_page("pages/recipe_detail.py")
                         
                         with col2:
-                            if st.button("Remove", key=f"remove_{recipe_doc.id}"):
+                            if st.button("Remove", key=f"remove_{saved_id}"):
                                 # Remove recipe from saved recipes
-                                db.collection('users').document(st.session_state.user_id).collection('saved_recipes').document(recipe_doc.id).delete()
+                                db.collection('users').document(st.session_state.user_id).collection('saved_recipes').document(saved_id).delete()
+                                invalidate('saved_recipes')
                                 st.success("Recipe removed from your saved recipes!")
                                 st.rerun()
         
         except Exception as e:
             st.error(f"Error fetching your saved recipes: {e}")
     
-    with tab2:
+    elif view == "My Posts":
         # Fetch recipes posted by the user
         try:
-            user_posts = db.collection('recipes').where('user_id', '==', st.session_state.user_id).get()
+            user_posts = get_or_load('user_posts', load_user_posts)
             
             if not user_posts:
                 st.info("You haven't posted any recipes yet. Share your meals to see them here!")
@@ -91,41 +113,49 @@ else:
                 # Create columns for grid layout
                 cols = st.columns(3)
                 
-                for i, post_doc in enumerate(user_posts):
-                    post = post_doc.to_dict()
+                for i, (post_id, post) in enumerate(user_posts):
                     
                     with cols[i % 3]:
                         # Display recipe card
-                        if 'image' in post:
-                            st.image(post['image'], use_column_width=True)
-                        else:
-                            st.image("https://api.placeholder.com/400/300", use_column_width=True)
+                        st.image(post.image, use_column_width=True)
                         
-                        st.markdown(f"#### {post.get('name', 'Untitled Recipe')}")
-                        st.markdown(f"Posted on: {post.get('date_posted', 'Unknown date')}")
-                        
-                        if 'likes' in post:
-                            st.markdown(f"❤️ {post['likes']} likes")
+                        st.markdown(f"#### {post.name}")
+                        st.markdown(f"Posted on: {post.date_posted or 'Unknown date'}")
+                        st.markdown(f"❤️ {post.likes} likes")
                         
                         # Action buttons
-                        col1, col2 = st.columns(2)
+                        col1, col2, col3 = st.columns(3)
                         with col1:
-                            if st.button("View", key=f"view_post_{post_doc.id}"):
-                                st.session_state.current_recipe_id = post_doc.id
+                            if st.button("View", key=f"view_post_{post_id}"):
+                                st.session_state.current_recipe_id = post_id
                                 st.switch_page("pages/recipe_detail.py")
                         
                         with col2:
-                            if st.button("Edit", key=f"edit_{post_doc.id}"):
-                                st.session_state.edit_recipe_id = post_doc.id
+                            if st.button("Edit", key=f"edit_{post_id}"):
+                                st.session_state.edit_recipe_id = post_id
                                 st.switch_page("pages/post_meal.py")
+                        
+                        with col3:
+                            if st.button("Delete", key=f"delete_{post_id}"):
+                                st.session_state.confirm_delete = post_id
+                        
+                        if st.session_state.get('confirm_delete') == post_id:
+                            st.warning("This also removes its comments and everyone's saves and likes of it.")
+                            if st.button("Yes, delete it", key=f"confirm_delete_{post_id}"):
+                                # Comments and every user's reference go with the recipe
+                                reference_gc.delete_recipe(post_id)
+                                st.session_state.confirm_delete = None
+                                invalidate('user_posts')
+                                st.success("Recipe deleted.")
+                                st.rerun()
         
         except Exception as e:
             st.error(f"Error fetching your posted recipes: {e}")
     
-    with tab3:
+    else:
         # Fetch favorite recipes (different from saved)
         try:
-            favorites = db.collection('users').document(st.session_state.user_id).collection('favorites').get()
+            favorites = get_or_load('favorites', load_favorites)
             
             if not favorites:
                 st.info("You haven't favorited any recipes yet.")
@@ -135,8 +165,7 @@ else:
                 # Similar layout as above tabs
                 cols = st.columns(3)
                 
-                for i, fav_doc in enumerate(favorites):
-                    fav = fav_doc.to_dict()
+                for i, (fav_id, fav) in enumerate(favorites):
                     
                     with cols[i % 3]:
                         # Basic recipe card display
@@ -148,8 +177,8 @@ else:
                         st.markdown(f"#### {fav.get('name', 'Untitled Recipe')}")
                         
                         # Action button
-                        if st.button("View Recipe", key=f"view_fav_{fav_doc.id}"):
-                            st.session_state.current_recipe_id = fav_doc.id
+                        if st.button("View Recipe", key=f"view_fav_{fav_id}"):
+                            st.session_state.current_recipe_id = fav_id
                             st.switch_page("pages/recipe_detail.py")
         
         except Exception as e:
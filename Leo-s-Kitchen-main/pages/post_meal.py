@@ -3,6 +3,12 @@ import streamlit as st
 import pandas as pd
 from datetime import datetime
 from firebase_config import db
+from session_cache import invalidate
+import recipe_events
+from models import Recipe
+from shared_cache import get_cache
+import recipe_snapshots
+import saved_summaries
 import uuid
 import base64
 from io import BytesIO
@@ -17,6 +23,7 @@ st.sidebar.page_link("pages/about_me.py", label="ℹ️ About Me")
 st.sidebar.page_link("pages/my_recipes.py", label="📊 My Recipes")
 st.sidebar.page_link("pages/chatbot.py", label="🤖 Chat Bot")
 st.sidebar.page_link("pages/post_meal.py", label="📝 Share Your Meal")
+st.sidebar.page_link("pages/meal_plan.py", label="🍽️ Meal Planner")
 
 # Check if user is authenticated
 if 'authenticated' not in st.session_state or not st.session_state.authenticated:
@@ -170,6 +177,9 @@ else:
             elif 'image' in recipe_data and recipe_data['image']:
                 image_url = recipe_data['image']
             
+            # Keep the document as loaded so edits can be diffed against it
+            original_recipe = recipe_data
+            
             # Process tags
             tags = [tag.strip() for tag in meal_tags.split(',') if tag.strip()]
             
@@ -202,10 +212,29 @@ else:
                 'updated_at': datetime.now().isoformat()
             }
             
+            # Reject malformed values before anything is written
+            Recipe.from_dict(st.session_state.get('edit_recipe_id'), recipe_data)
+            
             if editing:
-                # Update existing recipe
-                db.collection('recipes').document(st.session_state.edit_recipe_id).update(recipe_data)
-                st.success("Your recipe has been updated successfully!")
+                # Only send the fields that changed; an unchanged image is never re-sent
+                changes = recipe_events.diff_fields(original_recipe, recipe_data, ignore=('updated_at',))
+                if not uploaded_image:
+                    changes.pop('image', None)
+                if changes:
+                    changes['updated_at'] = recipe_data['updated_at']
+                    db.collection('recipes').document(st.session_state.edit_recipe_id).update(changes)
+                    # Indexes only hear about the fields that changed
+                    recipe_events.publish(st.session_state.edit_recipe_id, changes, changed_fields=changes.keys())
+                    # Tell every server process the cached copies are stale
+                    get_cache().delete('recipe', st.session_state.edit_recipe_id)
+                    # Anonymous viewers get a rebuilt page, not the stale one
+                    recipe_snapshots.refresh_later(st.session_state.edit_recipe_id)
+                    # Saved and favorite copies of the card pick up the edit in the background
+                    saved_summaries.fan_out_later(st.session_state.edit_recipe_id, changes)
+                    get_cache().invalidate('similar')
+                    st.success("Your recipe has been updated successfully!")
+                else:
+                    st.info("No changes to save.")
                 # Clear edit state
                 st.session_state.edit_recipe_id = None
             else:
@@ -216,15 +245,22 @@ else:
                     'comments': 0,
                     'rating': 0,
                     'reviews': 0,
+                    'rating_sum': 0,
+                    'rating_hist': {},
                     'saved_count': 0
                 })
                 
                 # Add to Firestore
                 new_recipe_ref = db.collection('recipes').document()
                 new_recipe_ref.set(recipe_data)
+                recipe_events.publish(new_recipe_ref.id, recipe_data)
+                get_cache().invalidate('similar')
                 
                 st.success("Your meal has been shared successfully!")
             
+            # My Recipes caches the user's posts for the session
+            invalidate('user_posts')
+            
             # Show a preview of how it will appear in the feed
             st.subheader("Preview:")
             
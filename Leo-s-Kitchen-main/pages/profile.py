@@ -1,8 +1,12 @@
 # pages/profile.py
 import streamlit as st
-import pandas as pd
-import plotly.express as px
 from firebase_config import db
+from shared_cache import cached, get_cache
+from models import User
+import nutrition_charts
+import reference_gc
+from recipe_replica import user_posts
+from session_cache import get_or_load, invalidate
 from datetime import datetime, timedelta
 
 # Page configuration
@@ -15,6 +19,7 @@ st.sidebar.page_link("pages/about_me.py", label="ℹ️ About Me")
 st.sidebar.page_link("pages/my_recipes.py", label="📊 My Recipes")
 st.sidebar.page_link("pages/chatbot.py", label="🤖 Chat Bot")
 st.sidebar.page_link("pages/post_meal.py", label="📝 Share Your Meal")
+st.sidebar.page_link("pages/meal_plan.py", label="🍽️ Meal Planner")
 st.sidebar.page_link("pages/profile.py", label="👤 My Profile")
 st.sidebar.page_link("pages/auth.py", label="🔑 Login/Register")
 
@@ -25,14 +30,19 @@ if 'authenticated' not in st.session_state or not st.session_state.authenticated
 else:
     # Get user data from Firestore
     user_ref = db.collection('users').document(st.session_state.user_id)
-    user_doc = user_ref.get()
     
-    if not user_doc.exists:
+    # Function to read the user's public profile (None if it doesn't exist).
+    # Only the public fields go into the cache shared with other processes.
+    def load_user():
+        user = User.from_doc(user_ref.get())
+        return user.public() if user is not None else None
+    
+    user_data = cached('profile', st.session_state.user_id, load_user, ttl=600)
+    
+    if user_data is None:
         st.error("User data not found. Please try logging in again.")
     else:
-        user_data = user_doc.to_dict()
         username = user_data.get('username', '')
-        email = user_data.get('email', '')
         full_name = user_data.get('full_name', '')
         bio = user_data.get('bio', '')
         profile_pic = user_data.get('profile_pic', '')
@@ -91,6 +101,7 @@ else:
                     
                     # Update user document
                     user_ref.update(updates)
+                    get_cache().delete('profile', st.session_state.user_id)
                     
                     st.success("Profile updated successfully!")
                     st.session_state.editing_profile = False
@@ -106,32 +117,22 @@ else:
         with tab1:
             st.subheader("Nutrition Summary")
             
-            # In a real app, you'd query the user's nutrition data from Firestore
-            # For now, using mock data
-            dates = pd.date_range(start='2025-02-01', end='2025-03-01')
-            nutrition_data = pd.DataFrame({
-                'Date': dates,
-                'Protein': [round(100 + i*1.5) for i in range(len(dates))],
-                'Carbs': [round(150 - i) for i in range(len(dates))],
-                'Fat': [round(50 + i*0.5) for i in range(len(dates))],
-                'Calories': [round(1800 + i*10) for i in range(len(dates))]
-            })
+            # Figures come ready-made from the shared cache, with long
+            # histories downsampled to a fixed number of points per series
+            chart_range = st.selectbox("Range", list(nutrition_charts.RANGES), key="chart_range")
+            charts = nutrition_charts.get_charts(db, st.session_state.user_id, chart_range)
             
             # Nutrition trend chart
             st.subheader("Your Macro Trends")
-            fig = px.line(nutrition_data, x='Date', y=['Protein', 'Carbs', 'Fat'], 
-                          title='Daily Macro Nutrients (Last 30 Days)')
-            st.plotly_chart(fig, use_container_width=True)
+            st.plotly_chart(charts['macros'], use_container_width=True)
             
             # Calorie tracking
             st.subheader("Calorie Tracking")
-            fig2 = px.bar(nutrition_data, x='Date', y='Calories', 
-                          title='Daily Calorie Intake (Last 30 Days)')
-            st.plotly_chart(fig2, use_container_width=True)
+            st.plotly_chart(charts['calories'], use_container_width=True)
             
             # Weekly summary stats
             st.subheader("Weekly Summary")
-            weekly_data = nutrition_data.tail(7)
+            weekly_data = charts['recent']
             
             avg_col1, avg_col2, avg_col3, avg_col4 = st.columns(4)
             with avg_col1:
@@ -150,42 +151,45 @@ else:
         with tab2:
             st.subheader("My Shared Recipes")
             
-            # Query Firestore for user's recipes
-            # In a real app, you'd use this:
-            # recipes_query = db.collection('recipes').where('user_id', '==', st.session_state.user_id).get()
+            # The user's own posts, from the local recipe replica; shared with
+            # My Recipes through the session cache
+            user_recipes = get_or_load('user_posts', lambda: user_posts(db, st.session_state.user_id))
             
-            # For demo purposes, using mock data
-            user_recipes = [
-                {"name": "Protein Pancakes", "date": "Feb 28, 2025", "likes": 24, "comments": 3, 
-                 "image": "https://api.placeholder.com/300/200", "id": "recipe1"},
-                {"name": "Chicken Avocado Wrap", "date": "Feb 20, 2025", "likes": 18, "comments": 2, 
-                 "image": "https://api.placeholder.com/300/200", "id": "recipe2"},
-                {"name": "Greek Yogurt Bowl", "date": "Feb 15, 2025", "likes": 32, "comments": 5, 
-                 "image": "https://api.placeholder.com/300/200", "id": "recipe3"}
-            ]
+            if not user_recipes:
+                st.info("You haven't shared any recipes yet.")
             
-            for i, recipe in enumerate(user_recipes):
+            for recipe_id, recipe in user_recipes:
                 col1, col2 = st.columns([1, 3])
                 
                 with col1:
-                    st.image(recipe["image"], use_column_width=True)
+                    st.image(recipe.image, use_column_width=True)
                     
                 with col2:
-                    st.subheader(recipe["name"])
-                    st.write(f"Posted on: {recipe['date']}")
-                    st.write(f"❤️ {recipe['likes']} likes • 💬 {recipe['comments']} comments")
+                    st.subheader(recipe.name)
+                    st.write(f"Posted on: {recipe.date_posted or 'Unknown date'}")
+                    st.write(f"❤️ {recipe.likes} likes • 💬 {recipe.comments} comments")
                     
                     action_col1, action_col2, action_col3 = st.columns(3)
                     with action_col1:
-                        st.button("View Recipe", key=f"view_{i}")
+                        if st.button("View Recipe", key=f"view_{recipe_id}"):
+                            st.session_state.current_recipe_id = recipe_id
+                            st.switch_page("pages/recipie_detail.py")
                     with action_col2:
-                        st.button("Edit", key=f"edit_{i}")
+                        if st.button("Edit", key=f"edit_{recipe_id}"):
+                            st.session_state.edit_recipe_id = recipe_id
+                            st.switch_page("pages/post_meal.py")
                     with action_col3:
-                        # In a real app, this would delete the recipe document from Firestore
-                        if st.button("Delete", key=f"delete_{i}"):
-                            # Delete logic would go here, e.g.:
-                            # db.collection('recipes').document(recipe['id']).delete()
-                            st.success(f"Recipe '{recipe['name']}' deleted successfully!")
+                        if st.button("Delete", key=f"delete_{recipe_id}"):
+                            st.session_state.confirm_delete = recipe_id
+                    
+                    if st.session_state.get('confirm_delete') == recipe_id:
+                        st.warning("This also removes its comments and everyone's saves and likes of it.")
+                        if st.button("Yes, delete it", key=f"confirm_delete_{recipe_id}"):
+                            # Comments, ratings and every user's reference go with the recipe
+                            reference_gc.delete_recipe(recipe_id)
+                            st.session_state.confirm_delete = None
+                            invalidate('user_posts')
+                            st.success(f"Recipe '{recipe.name}' deleted.")
                             st.rerun()
                         
                 st.divider()
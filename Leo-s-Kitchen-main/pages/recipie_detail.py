@@ -1,9 +1,20 @@
 # pages/recipe_detail.py
 import streamlit as st
-import pandas as pd
-import plotly.express as px
 from datetime import datetime
+from firebase_admin import firestore
 from firebase_config import db  # Import Firestore client
+from data_loader import PageLoader
+from session_cache import get_or_load, invalidate, mark_drawn, moved_since_drawn, session_id
+import live_queries
+from shared_cache import cached, get_cache
+from ranking import record_engagement
+from recommender import mark_user_dirty
+import event_log
+from models import Recipe, Comment
+import recipe_snapshots
+import ratings
+import nutrition_charts
+from saved_summaries import summary_of
 
 # Page configuration
 st.set_page_config(page_title="Recipe Details - Leo's Food App", page_icon="🐱", layout="wide")
@@ -15,34 +26,29 @@ st.sidebar.page_link("pages/about_me.py", label="ℹ️ About Me")
 st.sidebar.page_link("pages/my_recipes.py", label="📊 My Recipes")
 st.sidebar.page_link("pages/chatbot.py", label="🤖 Chat Bot")
 st.sidebar.page_link("pages/post_meal.py", label="📝 Share Your Meal")
+st.sidebar.page_link("pages/meal_plan.py", label="🍽️ Meal Planner")
 
 # Get recipe ID from query parameters
 # For actual implementation, we would use st.experimental_get_query_params()
 # For demonstration, let's use a URL parameter or session state
-recipe_id = st.experimental_get_query_params().get("recipe_id", ["1"])[0]
+recipe_id = st.query_params.get("recipe_id") or st.session_state.get("current_recipe_id") or "1"
 
-# Function to fetch recipe from Firestore
+# Function to fetch recipe from Firestore (runs in a loader thread, so no st.* calls)
+def fetch_recipe(recipe_id):
+    # Get document reference
+    recipe_ref = db.collection('recipes').document(recipe_id)
+    recipe_doc = recipe_ref.get()
+    
+    # Validate the document and fill in defaults (None if it doesn't exist)
+    return Recipe.from_doc(recipe_doc)
+
+# Function to get a recipe through the cache shared by all server processes
 def get_recipe_from_firestore(recipe_id):
-    try:
-        # Get document reference
-        recipe_ref = db.collection('recipes').document(recipe_id)
-        recipe_doc = recipe_ref.get()
-        
-        if recipe_doc.exists:
-            # Convert Firestore document to dictionary
-            recipe = recipe_doc.to_dict()
-            recipe['id'] = recipe_id  # Add the ID to the recipe
-            return recipe
-        else:
-            st.error(f"Recipe with ID {recipe_id} not found")
-            return get_sample_recipe()  # Fallback to sample recipe
-    except Exception as e:
-        st.error(f"Error fetching recipe: {e}")
-        return get_sample_recipe()  # Fallback to sample recipe
+    return cached('recipe', recipe_id, lambda: fetch_recipe(recipe_id), ttl=60)
 
 # Sample recipe for fallback
 def get_sample_recipe():
-    return {
+    return Recipe.from_dict("1", {
         "id": "1",
         "name": "Protein-Packed Overnight Oats",
         "user": "@HealthyChef",
@@ -90,7 +96,17 @@ def get_sample_recipe():
             {"id": "3", "name": "Greek Yogurt Bowl", "image": "https://api.placeholder.com/150/150"},
             {"id": "4", "name": "Protein Smoothie", "image": "https://api.placeholder.com/150/150"}
         ]
-    }
+    })
+
+# Function to save the star widget's value as the user's rating (widget callback)
+def submit_rating(recipe_id, user_id, username):
+    picked = st.session_state.get(f"rate_{recipe_id}")
+    stars = None if picked is None else picked + 1
+    try:
+        ratings.rate(recipe_id, user_id, stars, username=username)
+        invalidate(f"rating_{recipe_id}")
+    except Exception as e:
+        st.error(f"Error saving your rating: {e}")
 
 # Function to update likes and saves
 def update_recipe_stats(recipe_id, field, increment=1):
@@ -125,18 +141,61 @@ def add_comment_to_recipe(recipe_id, user_id, username, comment_text):
         st.error(f"Error posting comment: {e}")
         return False
 
-# Function to get comments for a recipe
-def get_recipe_comments(recipe_id, limit=10):
-    try:
-        comments_ref = db.collection('comments').where('recipe_id', '==', recipe_id).order_by('created_at', direction=firestore.Query.DESCENDING).limit(limit)
-        comments = [doc.to_dict() for doc in comments_ref.stream()]
-        return comments
-    except Exception as e:
-        st.error(f"Error fetching comments: {e}")
+# Function to pick the similar-recipes query inputs once the recipe is known
+def get_similar_for(recipe):
+    if recipe is None:
         return []
+    return recipe_snapshots.cached_similar(db, recipe_id, recipe.get('category'))
+
+# Visitors who aren't logged in get the pre-rendered snapshot: one shared cache
+# read instead of the recipe, comments and similar-recipes queries
+snapshot = None
+recipe_missing = False
+if not st.session_state.get('authenticated', False):
+    snapshot = recipe_snapshots.get_snapshot(recipe_id)
+    if snapshot == recipe_snapshots.MISSING:
+        # Known not to exist; show the sample recipe without asking Firestore again
+        recipe_missing = True
+        sample = get_sample_recipe()
+        snapshot = {'recipe': sample, 'charts': recipe_snapshots.cached_chart_specs(sample),
+                    'comments': [], 'similar': []}
+
+if snapshot is None:
+    # Fire all reads for this page at once instead of one round trip after another.
+    # Comments come from a listener shared by everyone viewing this recipe on this
+    # server process; similar recipes only need the recipe's category.
+    loader = PageLoader()
+    loader.submit('recipe', get_recipe_from_firestore, recipe_id, deadline=5.0)
+    loader.submit_after('similar', 'recipe', get_similar_for, deadline=3.0)
+    live_queries.recipe_comments(db, recipe_id, session_id())
+    recipe_result = loader.result('recipe')
 
 # Fetch the recipe data
-recipe = get_recipe_from_firestore(recipe_id)
+recipe_found = False
+if recipe_missing:
+    st.error(f"Recipe with ID {recipe_id} not found")
+    recipe = snapshot['recipe']
+elif snapshot is not None:
+    recipe = snapshot['recipe']
+    recipe_found = True
+elif recipe_result.timed_out:
+    st.error("Loading this recipe is taking too long. Showing a sample recipe instead.")
+    recipe = get_sample_recipe()  # Fallback to sample recipe
+elif recipe_result.error is not None:
+    st.error(f"Error fetching recipe: {recipe_result.error}")
+    recipe = get_sample_recipe()  # Fallback to sample recipe
+elif recipe_result.value is None:
+    st.error(f"Recipe with ID {recipe_id} not found")
+    recipe = get_sample_recipe()  # Fallback to sample recipe
+else:
+    recipe = recipe_result.value
+    recipe_found = True
+if recipe_found:
+    # Count a view once per session rather than on every rerun
+    viewed = st.session_state.setdefault('viewed_recipes', set())
+    if recipe_id not in viewed:
+        viewed.add(recipe_id)
+        event_log.emit('view', recipe_id, st.session_state.get('user_id'))
 
 # --- RECIPE DETAIL PAGE ---
 
@@ -152,6 +211,10 @@ with col_img:
         if st.button("❤️ Like", key="like_btn"):
             if st.session_state.get('authenticated', False):
                 update_recipe_stats(recipe_id, 'likes')
+                get_cache().delete('recipe', recipe_id)
+                recipe_snapshots.refresh_later(recipe_id)
+                record_engagement(recipe_id, 'like', recipe.get('category'))
+                event_log.emit('like', recipe_id, st.session_state.get('user_id'))
                 # Also add to user's liked recipes
                 user_id = st.session_state.get('user_id')
                 if user_id:
@@ -159,6 +222,7 @@ with col_img:
                         'recipe_id': recipe_id,
                         'liked_at': firestore.SERVER_TIMESTAMP
                     })
+                    mark_user_dirty(user_id)
             else:
                 st.warning("Please log in to like recipes")
     
@@ -166,13 +230,21 @@ with col_img:
         if st.button("🔖 Save", key="save_btn"):
             if st.session_state.get('authenticated', False):
                 update_recipe_stats(recipe_id, 'saved_count')
+                get_cache().delete('recipe', recipe_id)
+                recipe_snapshots.refresh_later(recipe_id)
+                record_engagement(recipe_id, 'save', recipe.get('category'))
+                event_log.emit('save', recipe_id, st.session_state.get('user_id'))
                 # Also add to user's saved recipes
                 user_id = st.session_state.get('user_id')
                 if user_id:
+                    # The entry carries the card fields so My Recipes needs no recipe reads
                     db.collection('users').document(user_id).collection('saved_recipes').document(recipe_id).set({
                         'recipe_id': recipe_id,
-                        'saved_at': firestore.SERVER_TIMESTAMP
+                        'saved_at': firestore.SERVER_TIMESTAMP,
+                        **summary_of(recipe_id, recipe.to_dict())
                     })
+                    invalidate('saved_recipes')
+                    mark_user_dirty(user_id)
             else:
                 st.warning("Please log in to save recipes")
     
@@ -186,10 +258,16 @@ with col_info:
     st.title(recipe["name"])
     
     # User and date info
-    st.markdown(f"Posted by {recipe['user']} on {recipe['date_posted']}")
+    st.markdown(f"Posted by {recipe.author} on {recipe['date_posted']}")
     
-    # Rating
+    # Rating; the average is stored on the recipe, so this is one field
     st.markdown(f"⭐ {recipe['rating']} ({recipe['reviews']} ratings)")
+    if recipe_found and st.session_state.get('authenticated', False):
+        user_id = st.session_state.get('user_id')
+        current = get_or_load(f"rating_{recipe_id}", lambda: ratings.user_rating(recipe_id, user_id))
+        st.caption("Your rating")
+        st.feedback("stars", key=f"rate_{recipe_id}", default=None if current is None else current - 1,
+                    on_change=submit_rating, args=(recipe_id, user_id, st.session_state.get('username')))
     
     # Description
     st.markdown(recipe["description"])
@@ -219,25 +297,21 @@ with macro_cols[2]:
 with macro_cols[3]:
     st.metric("Calories", f"{recipe['calories']}")
 
-# Macro pie chart
-nutrition_data = pd.DataFrame({
-    'Nutrient': ['Protein', 'Carbs', 'Fat'],
-    'Grams': [recipe['protein'], recipe['carbs'], recipe['fat']],
-    'Calories': [recipe['protein'] * 4, recipe['carbs'] * 4, recipe['fat'] * 9]
-})
+# Add this recipe's macros to today's totals on the profile dashboard
+if recipe_found and st.session_state.get('authenticated', False):
+    if st.button("🍽️ I ate this", key="log_meal_btn"):
+        nutrition_charts.log_meal(db, st.session_state.get('user_id'),
+                                  {field: recipe[field] for field in ('protein', 'carbs', 'fat', 'calories')})
+        st.success("Added to today's nutrition log!")
 
+# Macro pie charts (grams and calories); snapshots carry them ready-made
+charts = snapshot['charts'] if snapshot is not None else recipe_snapshots.cached_chart_specs(recipe)
 chart_col1, chart_col2 = st.columns(2)
 with chart_col1:
-    fig = px.pie(nutrition_data, values='Grams', names='Nutrient', 
-                 title='Macronutrient Distribution (grams)',
-                 color_discrete_sequence=['#1f77b4', '#ff7f0e', '#2ca02c'])
-    st.plotly_chart(fig, use_container_width=True)
+    st.plotly_chart(charts[0], use_container_width=True)
 
 with chart_col2:
-    fig = px.pie(nutrition_data, values='Calories', names='Nutrient', 
-                 title='Calorie Distribution',
-                 color_discrete_sequence=['#1f77b4', '#ff7f0e', '#2ca02c'])
-    st.plotly_chart(fig, use_container_width=True)
+    st.plotly_chart(charts[1], use_container_width=True)
 
 # Ingredients and Instructions
 ingredients_col, instructions_col = st.columns(2)
@@ -264,47 +338,57 @@ if submit_comment and comment_text:
     if st.session_state.get('authenticated', False):
         user_id = st.session_state.get('user_id')
         username = st.session_state.get('username', 'Anonymous')
-        add_comment_to_recipe(recipe_id, user_id, username, comment_text)
+        if add_comment_to_recipe(recipe_id, user_id, username, comment_text):
+            record_engagement(recipe_id, 'comment', recipe.get('category'))
+            recipe_snapshots.refresh_later(recipe_id)
+            event_log.emit('comment', recipe_id, user_id)
     else:
         st.warning("Please log in to comment")
 
-# Display existing comments
-comments = get_recipe_comments(recipe_id)
-if comments:
-    for comment in comments:
-        st.markdown(f"**{comment['username']}** • {comment.get('created_at', 'Just now')}  \n{comment['text']}")
-else:
-    # Display sample comments if no actual comments found
-    st.markdown("**@FitnessFoodie** • 2 days ago  \nMade this yesterday and loved it! I added a tablespoon of cocoa powder for a chocolate version. Delicious!")
-    st.markdown("**@ProteinQueen** • 5 days ago  \nThis has become my go-to breakfast! So convenient and keeps me full until lunch.")
+# Function to list comments, or sample ones while a recipe has none
+def render_comments(comments):
+    if comments:
+        for comment in comments:
+            st.markdown(f"**{comment.username}** • {comment.created_at or 'Just now'}  \n{comment.text}")
+    else:
+        # Display sample comments if no actual comments found
+        st.markdown("**@FitnessFoodie** • 2 days ago  \nMade this yesterday and loved it! I added a tablespoon of cocoa powder for a chocolate version. Delicious!")
+        st.markdown("**@ProteinQueen** • 5 days ago  \nThis has become my go-to breakfast! So convenient and keeps me full until lunch.")
 
-# Function to get similar recipes
-def get_similar_recipes(recipe_id, category, tags, limit=3):
-    try:
-        # Query recipes with the same category and at least one matching tag
-        similar_ref = db.collection('recipes').where('category', '==', category).limit(limit+1)
-        similar_recipes = []
-        
-        # Process results and exclude the current recipe
-        for doc in similar_ref.stream():
-            recipe_data = doc.to_dict()
-            if doc.id != recipe_id:
-                similar_recipes.append({
-                    'id': doc.id,
-                    'name': recipe_data.get('name', 'Recipe'),
-                    'image': recipe_data.get('image', 'https://api.placeholder.com/150/150')
-                })
-            
-            if len(similar_recipes) >= limit:
-                break
-                
-        return similar_recipes
-    except Exception as e:
-        st.error(f"Error fetching similar recipes: {e}")
-        return recipe.get('similar_recipes', [])
+# Display existing comments from the shared listener's in-memory result
+def show_comments():
+    live = live_queries.recipe_comments(db, recipe_id, session_id())
+    if not live.wait_ready(timeout=2.0):
+        mark_drawn(('comments', recipe_id), 0)
+        st.info("Comments are taking a while to load. They will appear here shortly.")
+        return
+    mark_drawn(('comments', recipe_id), live.version)
+    if live.error is not None:
+        st.caption("Comments may be out of date; reconnecting...")
+    render_comments([Comment.from_dict(comment_id, data) for comment_id, data in live.data])
+
+# Checks every few seconds whether the comments moved since they were drawn,
+# and reruns the page only then. It draws nothing and never reads Firestore.
+@st.fragment(run_every=3)
+def watch_comments():
+    live = live_queries.recipe_comments(db, recipe_id, session_id())
+    if moved_since_drawn(('comments', recipe_id), live.version):
+        st.rerun()
+
+if snapshot is not None:
+    render_comments(snapshot['comments'])
+else:
+    show_comments()
+    watch_comments()
 
 # Similar recipes section
-similar_recipes = get_similar_recipes(recipe_id, recipe['category'], recipe.get('tags', []))
+if snapshot is not None:
+    similar_recipes = snapshot['similar']
+else:
+    similar_result = loader.result('similar')
+    if similar_result.error is not None:
+        st.error(f"Error fetching similar recipes: {similar_result.error}")
+    similar_recipes = similar_result.value
 if not similar_recipes:
     similar_recipes = recipe.get('similar_recipes', [])
 
@@ -318,5 +402,5 @@ for i, similar in enumerate(similar_recipes):
         if st.button("View Recipe", key=f"similar_{i}"):
             # Redirect to the recipe page with the new recipe_id
             new_recipe_id = similar['id']
-            st.experimental_set_query_params(recipe_id=new_recipe_id)
+            st.query_params["recipe_id"] = new_recipe_id
             st.rerun()
\ No newline at end of file
@@ -0,0 +1,202 @@
+# ranking.py
+# Trending and featured meals for the home page.
+#
+# Engagement is scored with forward decay: an event at time t adds
+#     weight * 2 ** ((t - SCORE_EPOCH) / HALF_LIFE)
+# to the recipe's trend_score. Older events are worth exponentially less than
+# newer ones when compared at any point in time, but the stored score never has
+# to be rewritten, so every event is a single Increment with no read.
+# With a 7 day half-life the score stays within float range for ~19 years
+# after SCORE_EPOCH; rebase_scores() moves the epoch forward if ever needed.
+#
+# Run `python ranking.py` on a schedule (e.g. every few minutes) to rebuild the
+# top-k lists for categories with new engagement and publish the weekly
+# featured snapshot. The home page reads everything from one document.
+import math
+import time
+from datetime import datetime, timezone
+
+from firebase_admin import firestore
+from firebase_config import db
+
+CATEGORIES = ["Breakfast", "Lunch", "Dinner", "Snacks", "Desserts"]
+ALL_CATEGORIES = "All"
+
+HALF_LIFE = 7 * 24 * 3600  # seconds
+SCORE_EPOCH = datetime(2025, 1, 1, tzinfo=timezone.utc).timestamp()
+
+# Weight per engagement kind. Ratings are scaled by stars in record_rating().
+ENGAGEMENT_WEIGHTS = {
+    'like': 1.0,
+    'save': 2.0,
+    'comment': 1.5,
+    'rating': 0.5,
+}
+
+TOP_K = 12
+FEATURED_COUNT = 3
+PLACEHOLDER_IMAGE = "https://api.placeholder.com/640/480"
+
+SCORES_COLLECTION = 'recipe_scores'
+RANKINGS_DOC = ('rankings', 'home')
+RANKINGS_PATH = '/'.join(RANKINGS_DOC)
+FEATURED_COLLECTION = 'featured'
+# Writers stamp updated_at with their own clock before the write lands, so an
+# engagement can carry a time just before the last refresh yet commit after it
+# read the top-k. Categories are treated as dirty back to this long before the
+# last refresh; recomputing one that didn't change costs a few reads.
+DIRTY_MARGIN = 120  # seconds
+
+
+# Function to convert an engagement weight at time t into a forward-decayed score
+def decayed_weight(weight, t=None, epoch=SCORE_EPOCH):
+    t = time.time() if t is None else t
+    return weight * math.pow(2.0, (t - epoch) / HALF_LIFE)
+
+
+# Function to read a stored trend_score back as "points as of now"
+def current_score(trend_score, now=None, epoch=SCORE_EPOCH):
+    now = time.time() if now is None else now
+    return trend_score * math.pow(2.0, -(now - epoch) / HALF_LIFE)
+
+
+# Function to record one engagement event; a single blind write, no reads
+def record_engagement(recipe_id, kind, category, weight=None):
+    if weight is None:
+        weight = ENGAGEMENT_WEIGHTS[kind]
+    db.collection(SCORES_COLLECTION).document(recipe_id).set({
+        'category': category,
+        'trend_score': firestore.Increment(decayed_weight(weight)),
+        kind + '_count': firestore.Increment(1),
+        'updated_at': time.time(),
+    }, merge=True)
+
+
+# Function to record a rating; higher ratings push a recipe up more
+def record_rating(recipe_id, category, stars):
+    record_engagement(recipe_id, 'rating', category,
+                      weight=ENGAGEMENT_WEIGHTS['rating'] * stars)
+
+
+# Function to build the compact card shown on the home page.
+# Inline base64 images are left out to keep the rankings document small.
+def summarize_recipe(recipe_id, recipe):
+    image = recipe.get('image') or PLACEHOLDER_IMAGE
+    if image.startswith('data:'):
+        image = PLACEHOLDER_IMAGE
+    username = recipe.get('username') or recipe.get('user') or 'Anonymous'
+    return {
+        'id': recipe_id,
+        'name': recipe.get('name', 'Untitled Recipe'),
+        'image': image,
+        'user': username if username.startswith('@') else f"@{username}",
+        'rating': recipe.get('rating', 0),
+        'reviews': recipe.get('reviews', 0),
+        'protein': recipe.get('protein', 0),
+        'carbs': recipe.get('carbs', 0),
+        'fat': recipe.get('fat', 0),
+        'calories': recipe.get('calories', 0),
+        'category': recipe.get('category', ''),
+        'date_posted': recipe.get('date_posted', ''),
+    }
+
+
+# Function to fetch recipe summaries for a list of ids in one batched read
+def _load_summaries(recipe_ids):
+    if not recipe_ids:
+        return {}
+    refs = [db.collection('recipes').document(rid) for rid in recipe_ids]
+    return {doc.id: summarize_recipe(doc.id, doc.to_dict())
+            for doc in db.get_all(refs) if doc.exists}
+
+
+# Function to compute the top-k (recipe_id, trend_score) pairs for a category
+def _top_scores(category, k=TOP_K):
+    query = db.collection(SCORES_COLLECTION)
+    if category != ALL_CATEGORIES:
+        query = query.where('category', '==', category)
+    query = query.order_by('trend_score', direction=firestore.Query.DESCENDING).limit(k)
+    return [(doc.id, doc.to_dict().get('trend_score', 0)) for doc in query.stream()]
+
+
+# Function to find the categories that saw engagement since the last run,
+# allowing DIRTY_MARGIN for late commits and clock skew
+def _dirty_categories(since):
+    query = db.collection(SCORES_COLLECTION).where('updated_at', '>', since - DIRTY_MARGIN)
+    return {doc.to_dict().get('category') for doc in query.stream()} & set(CATEGORIES)
+
+
+# Function to return the ISO week key used for featured snapshots, e.g. "2025-W09"
+def week_key(t=None):
+    year, week, _ = datetime.fromtimestamp(time.time() if t is None else t, timezone.utc).isocalendar()
+    return f"{year}-W{week:02d}"
+
+
+# Function to refresh trending lists and, on a new week, the featured snapshot
+def refresh_rankings(full=False):
+    now = time.time()
+    rankings_ref = db.collection(RANKINGS_DOC[0]).document(RANKINGS_DOC[1])
+    rankings_doc = rankings_ref.get()
+    rankings = rankings_doc.to_dict() if rankings_doc.exists else {}
+    trending = rankings.get('trending', {})
+
+    # Only categories with new engagement need their top-k recomputed
+    if full or not rankings:
+        categories = list(CATEGORIES)
+    else:
+        categories = sorted(_dirty_categories(rankings.get('updated_at', 0)))
+
+    top_by_category = {category: _top_scores(category) for category in categories}
+    if categories:
+        top_by_category[ALL_CATEGORIES] = _top_scores(ALL_CATEGORIES)
+
+    needed = {rid for top in top_by_category.values() for rid, _ in top}
+    summaries = _load_summaries(sorted(needed))
+    for category, top in top_by_category.items():
+        trending[category] = [summaries[rid] for rid, _ in top if rid in summaries]
+
+    updates = {'trending': trending, 'updated_at': now}
+
+    # Featured meals are frozen for the week once published
+    current_week = week_key(now)
+    if rankings.get('featured_week') != current_week:
+        featured = trending.get(ALL_CATEGORIES, [])[:FEATURED_COUNT]
+        db.collection(FEATURED_COLLECTION).document(current_week).set({
+            'week': current_week,
+            'recipes': featured,
+            'published_at': now,
+        })
+        updates['featured'] = featured
+        updates['featured_week'] = current_week
+
+    rankings_ref.set(updates, merge=True)
+    return categories
+
+
+# Function to move the score epoch forward; rewrites every score once.
+# Pause engagement writes while it runs, then set SCORE_EPOCH to new_epoch.
+def rebase_scores(new_epoch):
+    factor = math.pow(2.0, -(new_epoch - SCORE_EPOCH) / HALF_LIFE)
+    batch = db.batch()
+    pending = 0
+    for doc in db.collection(SCORES_COLLECTION).stream():
+        batch.update(doc.reference, {'trend_score': doc.to_dict().get('trend_score', 0) * factor})
+        pending += 1
+        if pending == 400:
+            batch.commit()
+            batch = db.batch()
+            pending = 0
+    if pending:
+        batch.commit()
+
+
+# Function used by the home page: everything it needs in one read
+def get_home_rankings():
+    doc = db.collection(RANKINGS_DOC[0]).document(RANKINGS_DOC[1]).get()
+    return doc.to_dict() if doc.exists else {}
+
+
+if __name__ == "__main__":
+    import sys
+    refreshed = refresh_rankings(full="--full" in sys.argv)
+    print(f"Refreshed trending for: {', '.join(refreshed) or 'no categories'}")
@@ -0,0 +1,127 @@
+# ratings.py
+# Star ratings: one review per user per recipe, with the recipe's aggregate
+# kept current in the same transaction.
+#
+# A review is stored at recipes/{recipe_id}/ratings/{user_id}, so each user
+# has at most one per recipe. The recipe document carries the aggregate:
+# rating_sum, reviews (the count), rating_hist ({"1": n, ..., "5": n}) and
+# rating, the average rounded to one decimal. rate() reads the user's previous
+# review and the aggregate in one transaction and applies only the difference:
+#
+#   * a first rating adds its stars to the sum and one to the count,
+#   * a re-rating moves one vote between histogram buckets and changes the sum
+#     by the difference, with the count unchanged,
+#   * removing a rating takes both back out.
+#
+# Clearing a rating keeps the review document with stars set to None, so a
+# later rating by the same user is known not to be their first. Only a first
+# rating counts towards trending and goes into the event log, which sums stars.
+#
+# No call ever scans the reviews. Firestore retries the transaction if either
+# document changes under it, so concurrent ratings don't lose updates. Showing
+# the average is a read of the one `rating` field the pages already show.
+#
+# Recipes rated before this existed only have rating and reviews. Their sum is
+# taken as rating * reviews the first time they are rated again. Their
+# histogram only counts ratings made from then on.
+from firebase_admin import firestore
+
+from firebase_config import db
+import event_log
+import recipe_events
+import recipe_snapshots
+import saved_summaries
+from ranking import record_rating
+from shared_cache import get_cache
+
+RATINGS_COLLECTION = 'ratings'  # subcollection of each recipe
+STARS = (1, 2, 3, 4, 5)
+
+
+def _rating_ref(recipe_id, user_id):
+    return db.collection('recipes').document(recipe_id).collection(RATINGS_COLLECTION).document(user_id)
+
+
+# Function to read a recipe document's aggregate, filling in what older
+# recipes lack
+def aggregate_of(recipe):
+    count = recipe.get('reviews') or 0
+    total = recipe.get('rating_sum')
+    if total is None:
+        total = round((recipe.get('rating') or 0) * count)
+    hist = {str(stars): 0 for stars in STARS}
+    hist.update(recipe.get('rating_hist') or {})
+    return {'rating_sum': total, 'reviews': count, 'rating_hist': hist}
+
+
+# Function to apply one user's change of rating (None = no rating) to an aggregate
+def adjust(aggregate, old, new):
+    total, count, hist = aggregate['rating_sum'], aggregate['reviews'], dict(aggregate['rating_hist'])
+    if old is not None:
+        total -= old
+        count -= 1
+        hist[str(old)] = max(0, hist.get(str(old), 0) - 1)
+    if new is not None:
+        total += new
+        count += 1
+        hist[str(new)] = hist.get(str(new), 0) + 1
+    return {
+        'rating_sum': total,
+        'reviews': count,
+        'rating_hist': hist,
+        'rating': round(total / count, 1) if count else 0,
+    }
+
+
+@firestore.transactional
+def _rate_in_transaction(transaction, recipe_id, user_id, stars, username):
+    recipe_ref = db.collection('recipes').document(recipe_id)
+    rating_ref = _rating_ref(recipe_id, user_id)
+    # Firestore wants every read in a transaction before its first write
+    recipe_doc = recipe_ref.get(transaction=transaction)
+    rating_doc = rating_ref.get(transaction=transaction)
+    if not recipe_doc.exists:
+        return None, None, None, None
+    recipe = recipe_doc.to_dict()
+    previous = rating_doc.to_dict().get('stars') if rating_doc.exists else None
+    after = adjust(aggregate_of(recipe), previous, stars)
+    if previous != stars:
+        transaction.update(recipe_ref, after)
+        transaction.set(rating_ref, {
+            'recipe_id': recipe_id,
+            'user_id': user_id,
+            'username': username,
+            'stars': stars,
+            'rated_at': firestore.SERVER_TIMESTAMP,
+        })
+    return recipe, previous, not rating_doc.exists, after
+
+
+# Function to set (stars 1-5) or clear (stars None) a user's rating of a
+# recipe. Returns (previous stars, new aggregate), both read in the
+# transaction, or (None, None) if the recipe doesn't exist.
+def rate(recipe_id, user_id, stars, username=None):
+    if stars is not None and stars not in STARS:
+        raise ValueError(f"stars must be one of {STARS}, got {stars!r}")
+    recipe, previous, first, after = _rate_in_transaction(db.transaction(), recipe_id, user_id, stars, username)
+    if after is None or previous == stars:
+        return previous, after
+
+    # Indexes, the replica and every process's cached copy pick up the new average
+    changes = {'rating': after['rating'], 'reviews': after['reviews']}
+    recipe_events.publish(recipe_id, changes, changed_fields=changes.keys())
+    get_cache().delete('recipe', recipe_id)
+    recipe_snapshots.refresh_later(recipe_id)
+    # Saved cards show the average; skip the fan-out when it didn't move
+    if after['rating'] != recipe.get('rating'):
+        saved_summaries.fan_out_later(recipe_id, changes)
+    if first and stars is not None:
+        record_rating(recipe_id, recipe.get('category'), stars)
+        event_log.emit('rating', recipe_id, user_id, value=stars)
+    return previous, after
+
+
+# Function to read a user's current rating of a recipe (None if unrated)
+def user_rating(recipe_id, user_id):
+    doc = _rating_ref(recipe_id, user_id).get()
+    return doc.to_dict().get('stars') if doc.exists else None
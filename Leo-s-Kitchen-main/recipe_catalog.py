@@ -0,0 +1,244 @@
+# recipe_catalog.py
+# Columnar in-memory copy of the recipe collection for the home feed.
+#
+# Numbers live in NumPy arrays (macros, rating, reviews, posting time),
+# category is a small integer code and each tag has a boolean membership
+# column. A feed request is one vectorized mask (category, tags, optional id
+# set) followed by argpartition/argsort on the sort column, so it costs the
+# same whether the catalog holds 500 recipes or 100k. Only the cards that are
+# actually shown are turned back into dicts. Image URLs are kept, inline
+# data: images are not.
+#
+# One catalog is shared by every session in a server process. It is loaded
+# once and then patched row by row from recipe change events.
+import threading
+from datetime import datetime
+
+import numpy as np
+
+import recipe_events
+from recipe_replica import recipe_rows
+from ranking import summarize_recipe
+
+NUMERIC = ('protein', 'carbs', 'fat', 'calories', 'rating', 'reviews')
+TEXT = ('name', 'image', 'username', 'user')
+LOAD_FIELDS = list(TEXT) + list(NUMERIC) + ['category', 'tags', 'date_posted']
+INITIAL_CAPACITY = 1024
+
+# Sort option -> (column, descending)
+SORTS = {
+    "Newest": ('date_posted', True),
+    "Most Popular": ('reviews', True),
+    "Highest Protein": ('protein', True),
+    "Lowest Calories": ('calories', False),
+    "Highest Rated": ('rating', True),
+}
+
+
+# Function to turn a date_posted value (ISO string, datetime or epoch) into epoch seconds
+def posted_epoch(value):
+    if isinstance(value, datetime):
+        return value.timestamp()
+    if isinstance(value, (int, float)):
+        return float(value)
+    if isinstance(value, str) and value:
+        try:
+            return datetime.fromisoformat(value.replace('Z', '+00:00')).timestamp()
+        except ValueError:
+            return 0.0
+    return 0.0
+
+
+def _number(value):
+    try:
+        return float(value or 0)
+    except (TypeError, ValueError):
+        return 0.0
+
+
+class RecipeCatalog:
+    def __init__(self, recipes=()):
+        self._lock = threading.Lock()
+        self._size = 0
+        self._capacity = INITIAL_CAPACITY
+        self._columns = {name: np.zeros(self._capacity) for name in NUMERIC + ('date_posted',)}
+        self._category = np.full(self._capacity, -1, dtype=np.int16)
+        self._valid = np.zeros(self._capacity, dtype=bool)
+        self._text = {name: [] for name in TEXT}
+        self._dates = []  # original date_posted values, for the cards
+        self._ids = []
+        self._row = {}
+        self._category_codes = {}
+        self._categories = []
+        self._tag_codes = {}
+        self._tag_columns = []
+        for recipe_id, recipe in recipes:
+            self._write_row(recipe_id, recipe)
+
+    def __len__(self):
+        return len(self._row)
+
+    # --- storage ---
+
+    def _grow(self):
+        self._capacity *= 2
+        for name, column in self._columns.items():
+            self._columns[name] = np.resize(column, self._capacity)
+        self._category = np.resize(self._category, self._capacity)
+        self._valid = np.resize(self._valid, self._capacity)
+        self._valid[self._size:] = False
+        self._tag_columns = [np.resize(col, self._capacity) for col in self._tag_columns]
+        for col in self._tag_columns:
+            col[self._size:] = False
+
+    def _code(self, codes, values, value):
+        code = codes.get(value)
+        if code is None:
+            code = codes[value] = len(values)
+            values.append(value)
+        return code
+
+    def _tag_column(self, tag):
+        code = self._tag_codes.get(tag)
+        if code is None:
+            code = self._tag_codes[tag] = len(self._tag_columns)
+            self._tag_columns.append(np.zeros(self._capacity, dtype=bool))
+        return self._tag_columns[code]
+
+    # Function to write (or overwrite) one recipe's row; only fields present
+    # in `recipe` are touched, so partial edits keep everything else
+    def _write_row(self, recipe_id, recipe):
+        row = self._row.get(recipe_id)
+        if row is None:
+            if self._size == self._capacity:
+                self._grow()
+            row = self._size
+            self._size += 1
+            self._row[recipe_id] = row
+            self._ids.append(recipe_id)
+            for name in TEXT:
+                self._text[name].append(None)
+            self._dates.append('')
+            recipe = {**{name: None for name in LOAD_FIELDS}, **recipe}
+        self._valid[row] = True
+        for name in NUMERIC:
+            if name in recipe:
+                self._columns[name][row] = _number(recipe[name])
+        if 'date_posted' in recipe:
+            self._columns['date_posted'][row] = posted_epoch(recipe['date_posted'])
+            self._dates[row] = recipe['date_posted'] or ''
+        for name in TEXT:
+            if name in recipe:
+                self._text[name][row] = recipe[name]
+        # Uploaded images are inline data: URIs that the cards replace with the
+        # placeholder anyway; keeping them would make the catalog as big as
+        # every image put together
+        if isinstance(self._text['image'][row], str) and self._text['image'][row].startswith('data:'):
+            self._text['image'][row] = None
+        if 'category' in recipe:
+            self._category[row] = self._code(self._category_codes, self._categories, recipe['category'] or '')
+        if 'tags' in recipe:
+            for col in self._tag_columns:
+                col[row] = False
+            for tag in recipe['tags'] or ():
+                self._tag_column(tag)[row] = True
+
+    # Function to apply a recipe change; pass recipe=None for a delete.
+    # Signature matches recipe_events.subscribe callbacks.
+    def update(self, recipe_id, recipe, changed_fields=None):
+        with self._lock:
+            if recipe is None:
+                row = self._row.pop(recipe_id, None)
+                if row is not None:
+                    self._valid[row] = False
+            else:
+                self._write_row(recipe_id, recipe)
+
+    # --- queries ---
+
+    # Function to build the row mask for a set of filters
+    def _mask(self, category=None, tags=(), within=None):
+        n = self._size
+        mask = self._valid[:n].copy()
+        if category and category != "All":
+            code = self._category_codes.get(category)
+            if code is None:
+                return np.zeros(n, dtype=bool)
+            mask &= self._category[:n] == code
+        for tag in tags or ():
+            code = self._tag_codes.get(tag)
+            if code is None:
+                return np.zeros(n, dtype=bool)
+            mask &= self._tag_columns[code][:n]
+        if within is not None:
+            rows = np.fromiter((self._row[rid] for rid in within if rid in self._row), dtype=np.int64)
+            allowed = np.zeros(n, dtype=bool)
+            allowed[rows] = True
+            mask &= allowed
+        return mask
+
+    # Function to return the top-k recipe ids for a filter and sort option.
+    # Unknown sort options fall back to newest first.
+    def top_ids(self, category=None, sort="Newest", k=12, tags=(), within=None):
+        column, descending = SORTS.get(sort, SORTS["Newest"])
+        with self._lock:
+            mask = self._mask(category, tags, within)
+            rows = np.flatnonzero(mask)
+            if len(rows) == 0:
+                return []
+            keys = self._columns[column][rows]
+            if descending:
+                keys = -keys
+            if len(rows) > k:
+                part = np.argpartition(keys, k - 1)[:k]
+                rows, keys = rows[part], keys[part]
+            order = rows[np.argsort(keys, kind='stable')]
+            return [self._ids[row] for row in order]
+
+    # Function to count matching recipes without building any cards
+    def count(self, category=None, tags=(), within=None):
+        with self._lock:
+            return int(self._mask(category, tags, within).sum())
+
+    # Function to return the feed cards for a filter and sort option
+    def query(self, category=None, sort="Newest", k=12, tags=(), within=None):
+        return [self.card(recipe_id) for recipe_id in self.top_ids(category, sort, k, tags, within)]
+
+    # Function to rebuild one recipe's feed card from its row
+    def card(self, recipe_id):
+        with self._lock:
+            row = self._row.get(recipe_id)
+            if row is None:
+                return None
+            recipe = {name: self._text[name][row] for name in TEXT if self._text[name][row] is not None}
+            for name in NUMERIC:
+                value = self._columns[name][row]
+                recipe[name] = int(value) if value.is_integer() and name != 'rating' else float(value)
+            recipe['category'] = self._categories[self._category[row]] if self._category[row] >= 0 else ''
+            recipe['date_posted'] = self._dates[row]
+        return summarize_recipe(recipe_id, recipe)
+
+    def categories(self):
+        with self._lock:
+            return list(self._categories)
+
+
+# Function to load the catalog columns without pulling ingredients or instructions
+def load_recipe_catalog(db):
+    return RecipeCatalog(recipe_rows(db, LOAD_FIELDS))
+
+
+_shared_catalog = None
+_shared_lock = threading.Lock()
+
+
+# Function to return the process-wide catalog shared by every session.
+# It is loaded once and then kept current by recipe change events.
+def get_shared_catalog():
+    global _shared_catalog
+    with _shared_lock:
+        if _shared_catalog is None:
+            from firebase_config import db
+            _shared_catalog = load_recipe_catalog(db)
+            recipe_events.subscribe(_shared_catalog.update, fields=LOAD_FIELDS)
+    return _shared_catalog
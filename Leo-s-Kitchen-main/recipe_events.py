@@ -0,0 +1,52 @@
+# recipe_events.py
+# In-process notifications for recipe changes. Pages that write recipes call
+# publish(); in-memory indexes subscribe so they stay current without
+# re-reading the whole collection. Subscribers can ask to be told only about
+# changes to the fields they index.
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+_lock = threading.Lock()
+_subscribers = []
+
+
+# Function to register callback(recipe_id, recipe, changed_fields).
+# recipe is None when the recipe was deleted.
+def subscribe(callback, fields=None):
+    with _lock:
+        _subscribers.append((callback, set(fields) if fields else None))
+    return callback
+
+
+def unsubscribe(callback):
+    with _lock:
+        _subscribers[:] = [(cb, f) for cb, f in _subscribers if cb is not callback]
+
+
+# Function to notify subscribers. changed_fields=None means "treat everything
+# as changed" (new or deleted recipes). skip is a subscriber that already has
+# the change, e.g. the replica passing on what it synced.
+def publish(recipe_id, recipe, changed_fields=None, skip=None):
+    changed = set(changed_fields) if changed_fields is not None else None
+    with _lock:
+        subscribers = list(_subscribers)
+    for callback, fields in subscribers:
+        if skip is not None and callback == skip:
+            continue
+        if changed is not None and fields is not None and not (changed & fields):
+            continue
+        try:
+            callback(recipe_id, recipe, changed)
+        except Exception:
+            # One broken index must not stop the write that triggered it
+            logger.exception("Recipe change subscriber %r failed", callback)
+
+
+# Function to compare an edited recipe with the stored one and return only the
+# fields whose values actually changed. Fields in `ignore` (e.g. updated_at)
+# never count as a change on their own.
+def diff_fields(original, updated, ignore=()):
+    return {field: value for field, value in updated.items()
+            if field not in ignore and (field not in original or original[field] != value)}
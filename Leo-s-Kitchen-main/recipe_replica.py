@@ -0,0 +1,348 @@
+# recipe_replica.py
+# Local SQLite copy of the recipes collection in data/recipe_replica.db (not
+# tracked by git), so reads that don't need to be live never leave the host.
+#
+# Syncing is incremental. post_meal.py stamps every new or edited recipe with
+# updated_at (an ISO timestamp), and the replica remembers the newest
+# updated_at it has copied (the watermark). A sync asks Firestore only for
+# recipes with updated_at at or after it, in pages. The first sync, and a
+# periodic full one, stream the whole collection instead. A full sync also
+# picks up what a watermark can't see: engagement counters (Increment writes
+# don't touch updated_at), documents without updated_at, and deletes made
+# outside this process. In this process, recipe change events are applied
+# immediately.
+#
+# Syncs are how this process hears about edits, posts and deletes made by
+# other server processes, so every row a background sync adds, changes or
+# removes is published as a recipe change event for the in-memory indexes.
+# Rows that come back exactly as stored (e.g. changes this process already
+# published) aren't published again.
+#
+# Each Recipe field gets its own column (lists as JSON text), so a load that
+# needs a few fields never decodes images or instructions. Fields a document
+# doesn't have stay NULL and are left out of the rows, the same as a Firestore
+# select(). Indexes cover the feed, category, "My Posts" and macro lookups.
+#
+# The in-memory indexes (catalog, facets, search, suggestions, macros) load
+# through recipe_rows(), so a server process starts from local disk rather
+# than streaming every recipe from Firestore.
+#
+# Run `python recipe_replica.py [--full]` to sync by hand.
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from datetime import datetime
+
+import recipe_events
+from models import Recipe, SchemaError
+
+logger = logging.getLogger(__name__)
+
+DB_PATH = os.environ.get("LEO_REPLICA_PATH", os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "recipe_replica.db"))
+SYNC_PAGE = 500
+SYNC_INTERVAL = 30  # seconds between incremental syncs
+FULL_SYNC_INTERVAL = 6 * 3600  # seconds between full syncs
+
+LIST_FIELDS = {'tags', 'ingredients', 'instructions'}
+AMOUNT_FIELDS = {name for name, convert, _ in Recipe.FIELDS if convert.__name__ in ('_amount', '_rating')}
+RECIPE_COLUMNS = [name for name, _, _ in Recipe.FIELDS]
+
+# Sort option -> ORDER BY, matching recipe_catalog.SORTS
+SORTS = {
+    "Newest": "date_posted DESC",
+    "Most Popular": "reviews DESC",
+    "Highest Protein": "protein DESC",
+    "Lowest Calories": "calories ASC",
+    "Highest Rated": "rating DESC",
+}
+
+INDEXES = {
+    'idx_recipes_category': "recipes (category, date_posted DESC)",
+    'idx_recipes_user': "recipes (user_id, date_posted DESC)",
+    'idx_recipes_date': "recipes (date_posted DESC)",
+    'idx_recipes_updated': "recipes (updated_at)",
+    'idx_recipes_protein': "recipes (protein)",
+    'idx_recipes_carbs': "recipes (carbs)",
+    'idx_recipes_fat': "recipes (fat)",
+    'idx_recipes_calories': "recipes (calories)",
+}
+
+
+def _column_type(name):
+    return "NUMERIC" if name in AMOUNT_FIELDS else "TEXT"
+
+
+# Function to turn a stored value into something SQLite can hold
+def _to_column(name, value):
+    if value is None:
+        return None
+    if name in LIST_FIELDS:
+        return json.dumps(list(value))
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, (dict, list, tuple)):
+        return json.dumps(value, default=str)
+    return value
+
+
+def _from_column(name, value):
+    if value is not None and name in LIST_FIELDS:
+        return json.loads(value)
+    return value
+
+
+# Function to validate a recipe document and return its column values.
+# Fields the document doesn't have stay None rather than taking defaults.
+def recipe_columns(recipe_id, data):
+    record = Recipe.from_dict(recipe_id, data)
+    return {name: _to_column(name, getattr(record, name)) if data.get(name) is not None else None
+            for name in RECIPE_COLUMNS}
+
+
+class RecipeReplica:
+    def __init__(self, path=None):
+        self.path = path or DB_PATH
+        self._local = threading.local()
+        conn = self._conn()
+        columns = ", ".join(f"{name} {_column_type(name)}" for name in RECIPE_COLUMNS)
+        conn.execute(f"CREATE TABLE IF NOT EXISTS recipes (id TEXT PRIMARY KEY, {columns})")
+        for name, target in INDEXES.items():
+            conn.execute(f"CREATE INDEX IF NOT EXISTS {name} ON {target}")
+        conn.execute("CREATE TABLE IF NOT EXISTS replica_state (name TEXT PRIMARY KEY, value TEXT)")
+        conn.commit()
+
+    # One connection per thread; sqlite3 connections can't be shared across threads
+    def _conn(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=5.0)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def _state(self, name, default=None):
+        row = self._conn().execute("SELECT value FROM replica_state WHERE name = ?", (name,)).fetchone()
+        return row[0] if row else default
+
+    def _set_state(self, conn, name, value):
+        conn.execute("INSERT OR REPLACE INTO replica_state (name, value) VALUES (?, ?)", (name, str(value)))
+
+    def __len__(self):
+        return self._conn().execute("SELECT COUNT(*) FROM recipes").fetchone()[0]
+
+    @property
+    def watermark(self):
+        return self._state('watermark')
+
+    @property
+    def last_full_sync(self):
+        return float(self._state('full_synced_at', 0))
+
+    # --- writing ---
+
+    # Function to store a recipe; returns False if it isn't valid. When
+    # `changed` is a list, (id, data) is appended to it unless the row was
+    # already stored exactly like this.
+    def _upsert(self, conn, recipe_id, data, changed=None):
+        try:
+            values = recipe_columns(recipe_id, data)
+        except SchemaError as e:
+            logger.warning("Not replicating recipe %s: %s", recipe_id, e)
+            return False
+        row = [values[name] for name in RECIPE_COLUMNS]
+        if changed is not None:
+            current = conn.execute(f"SELECT {', '.join(RECIPE_COLUMNS)} FROM recipes WHERE id = ?",
+                                   (recipe_id,)).fetchone()
+            if current is None or list(current) != row:
+                changed.append((recipe_id, data))
+        names = ["id"] + RECIPE_COLUMNS
+        conn.execute(f"INSERT OR REPLACE INTO recipes ({', '.join(names)}) VALUES ({', '.join('?' * len(names))})",
+                     [recipe_id] + row)
+        return True
+
+    # Function to pass synced changes on to the other recipe_events
+    # subscribers; data None is a delete
+    def _publish(self, changed):
+        for recipe_id, data in changed:
+            recipe_events.publish(recipe_id, data, skip=self.update)
+
+    # Function to apply a recipe change; pass recipe=None for a delete.
+    # Signature matches recipe_events.subscribe callbacks. Partial edits only
+    # touch the columns they carry.
+    def update(self, recipe_id, recipe, changed_fields=None):
+        conn = self._conn()
+        if recipe is None:
+            conn.execute("DELETE FROM recipes WHERE id = ?", (recipe_id,))
+        elif changed_fields is None:
+            self._upsert(conn, recipe_id, recipe)
+        else:
+            try:
+                values = recipe_columns(recipe_id, recipe)
+            except SchemaError as e:
+                logger.warning("Not replicating edit of recipe %s: %s", recipe_id, e)
+                return
+            fields = [name for name in RECIPE_COLUMNS if name in recipe]
+            if fields:
+                conn.execute(f"UPDATE recipes SET {', '.join(f'{name} = ?' for name in fields)} WHERE id = ?",
+                             [values[name] for name in fields] + [recipe_id])
+        conn.commit()
+
+    # Function to copy recipes changed since the watermark; returns how many.
+    # With publish, rows that changed are also sent out as recipe change events.
+    def sync(self, db, full=False, publish=True):
+        watermark = self.watermark
+        if full or watermark is None:
+            return self._full_sync(db, publish)
+        conn = self._conn()
+        copied = 0
+        while True:
+            changed = []
+            docs = list(db.collection('recipes').where('updated_at', '>=', watermark)
+                        .order_by('updated_at').limit(SYNC_PAGE).stream())
+            newest = watermark
+            for doc in docs:
+                data = doc.to_dict()
+                copied += self._upsert(conn, doc.id, data, changed)
+                newest = max(newest, str(data.get('updated_at')))
+            self._set_state(conn, 'watermark', newest)
+            self._set_state(conn, 'synced_at', time.time())
+            conn.commit()
+            if publish:
+                self._publish(changed)
+            # A full page whose last timestamp didn't move the watermark would
+            # repeat forever; the next full sync picks up the rest
+            if len(docs) < SYNC_PAGE or newest == watermark:
+                return copied
+            watermark = newest
+
+    def _full_sync(self, db, publish=True):
+        conn = self._conn()
+        started = time.time()
+        seen = set()
+        changed = []
+        newest = ''
+        for doc in db.collection('recipes').stream():
+            data = doc.to_dict()
+            if self._upsert(conn, doc.id, data, changed):
+                seen.add(doc.id)
+                if len(seen) % SYNC_PAGE == 0:
+                    conn.commit()
+            if data.get('updated_at'):
+                newest = max(newest, str(data['updated_at']))
+        # Anything not in the collection any more was deleted
+        stale = [rid for (rid,) in conn.execute("SELECT id FROM recipes") if rid not in seen]
+        conn.executemany("DELETE FROM recipes WHERE id = ?", [(rid,) for rid in stale])
+        self._set_state(conn, 'watermark', newest)
+        self._set_state(conn, 'synced_at', time.time())
+        self._set_state(conn, 'full_synced_at', started)
+        conn.commit()
+        if publish:
+            self._publish(changed + [(rid, None) for rid in stale])
+        return len(seen)
+
+    # --- reading ---
+
+    def _rows(self, sql, params, fields):
+        for row in self._conn().execute(sql, params):
+            yield row[0], {name: _from_column(name, value) for name, value in zip(fields, row[1:]) if value is not None}
+
+    # Function to list (id, data) for every recipe with only the given fields
+    def rows(self, fields):
+        fields = [name for name in fields if name in RECIPE_COLUMNS]
+        return self._rows(f"SELECT id{''.join(', ' + name for name in fields)} FROM recipes", (), fields)
+
+    # Function to return one user's recipes, newest first, as (id, Recipe)
+    def posts_by_user(self, user_id):
+        rows = self._rows(f"SELECT id, {', '.join(RECIPE_COLUMNS)} FROM recipes WHERE user_id = ? "
+                          "ORDER BY date_posted DESC", (user_id,), RECIPE_COLUMNS)
+        return [(recipe_id, Recipe.from_dict(recipe_id, data)) for recipe_id, data in rows]
+
+    # Function to return the top-k feed rows for a category, sort option, tags
+    # and macro ranges {field: (low inclusive, high exclusive)}
+    def feed(self, fields, category=None, sort="Newest", k=12, tags=(), ranges=None):
+        where, params = [], []
+        if category and category != "All":
+            where.append("category = ?")
+            params.append(category)
+        for tag in tags or ():
+            where.append("EXISTS (SELECT 1 FROM json_each(recipes.tags) WHERE value = ?)")
+            params.append(tag)
+        for field, (low, high) in (ranges or {}).items():
+            if field in AMOUNT_FIELDS:
+                where.append(f"{field} >= ?")
+                params.append(low)
+                if high != float('inf'):
+                    where.append(f"{field} < ?")
+                    params.append(high)
+        fields = [name for name in fields if name in RECIPE_COLUMNS]
+        sql = (f"SELECT id{''.join(', ' + name for name in fields)} FROM recipes"
+               f"{' WHERE ' + ' AND '.join(where) if where else ''} "
+               f"ORDER BY {SORTS.get(sort, SORTS['Newest'])} LIMIT ?")
+        return list(self._rows(sql, params + [k], fields))
+
+
+# Function to keep a replica in sync on a background thread
+def _keep_synced(replica, db):
+    while True:
+        time.sleep(SYNC_INTERVAL)
+        try:
+            replica.sync(db, full=time.time() - replica.last_full_sync > FULL_SYNC_INTERVAL)
+        except Exception:
+            logger.exception("Recipe replica sync failed")
+
+
+_replica = None
+_replica_lock = threading.Lock()
+
+
+# Function to return this process's replica. The first call catches it up
+# with Firestore (a full copy if it has never synced), subscribes it to
+# recipe change events and starts the background sync.
+def get_replica(db=None):
+    global _replica
+    with _replica_lock:
+        if _replica is None:
+            if db is None:
+                from firebase_config import db
+            replica = RecipeReplica()
+            # Nothing in this process has loaded from the replica yet, so the
+            # catch-up has no one to tell
+            replica.sync(db, publish=False)
+            recipe_events.subscribe(replica.update)
+            threading.Thread(target=_keep_synced, args=(replica, db), name="recipe-replica", daemon=True).start()
+            _replica = replica
+    return _replica
+
+
+# Function to list (id, data) for every recipe with only `fields`, from the
+# replica when it can be opened, else straight from Firestore
+def recipe_rows(db, fields):
+    try:
+        return get_replica(db).rows(fields)
+    except Exception:
+        logger.exception("Recipe replica unavailable; reading from Firestore")
+        return ((doc.id, doc.to_dict()) for doc in db.collection('recipes').select(fields).stream())
+
+
+# Function to return one user's recipes, newest first, as (id, Recipe), from
+# the replica when it can be opened, else straight from Firestore
+def user_posts(db, user_id):
+    try:
+        return get_replica(db).posts_by_user(user_id)
+    except Exception:
+        logger.exception("Recipe replica unavailable; reading from Firestore")
+        docs = db.collection('recipes').where('user_id', '==', user_id).get()
+        return [(doc.id, Recipe.from_doc(doc)) for doc in docs]
+
+
+if __name__ == "__main__":
+    import sys
+    from firebase_config import db
+    replica = RecipeReplica()
+    copied = replica.sync(db, full="--full" in sys.argv)
+    print(f"Copied {copied} recipes; {len(replica)} in the replica, watermark {replica.watermark or 'none'}")
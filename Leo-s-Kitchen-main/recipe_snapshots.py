@@ -0,0 +1,166 @@
+# recipe_snapshots.py
+# Pre-rendered recipe pages for visitors who aren't logged in.
+#
+# A snapshot is everything the recipe page shows that doesn't depend on who
+# is looking: the validated recipe, the two macro pie chart specs, the first
+# page of comments and the "You might also like" list. It is built once and
+# stored in the shared cache, so an anonymous view is a single cache lookup
+# with no Firestore reads and no chart building.
+#
+# Snapshots are rebuilt, not just dropped, whenever the recipe is edited or
+# gets a like, save or comment; the old one keeps being served until the new
+# one replaces it. Rebuilds run on a small background pool and repeated
+# requests for the same recipe collapse into one extra rebuild. A miss (first
+# view, expired entry) schedules a build and the page falls back to its
+# normal reads for that one view.
+#
+# A recipe that doesn't exist (a bad link, a deleted recipe) is remembered as
+# MISSING for MISSING_TTL, so repeated views of it neither schedule rebuilds
+# nor read Firestore. The short TTL lets an id that appears later show up.
+#
+# SNAPSHOT_VERSION is part of the key; bump it when the snapshot shape changes.
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+import plotly.express as px
+from firebase_admin import firestore
+
+from models import Comment, Recipe
+from shared_cache import cached, get_cache
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_VERSION = 1
+NAMESPACE = 'recipe_snapshot'
+SNAPSHOT_TTL = 6 * 3600  # seconds; rebuilds on change keep it current in between
+MISSING = 'missing'  # stored in place of a snapshot for recipes that don't exist
+MISSING_TTL = 60  # seconds
+COMMENTS_PAGE = 10
+SIMILAR_COUNT = 3
+PIE_COLORS = ['#1f77b4', '#ff7f0e', '#2ca02c']
+
+_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="recipe-snapshot")
+_pending = {}  # recipe id -> another rebuild requested while this one runs
+_pending_lock = threading.Lock()
+
+
+def _key(recipe_id):
+    return f"v{SNAPSHOT_VERSION}:{recipe_id}"
+
+
+# Function to build the two macro pie charts as plain figure dicts
+def macro_chart_specs(recipe):
+    nutrition_data = pd.DataFrame({
+        'Nutrient': ['Protein', 'Carbs', 'Fat'],
+        'Grams': [recipe['protein'], recipe['carbs'], recipe['fat']],
+        'Calories': [recipe['protein'] * 4, recipe['carbs'] * 4, recipe['fat'] * 9]
+    })
+    by_grams = px.pie(nutrition_data, values='Grams', names='Nutrient',
+                      title='Macronutrient Distribution (grams)', color_discrete_sequence=PIE_COLORS)
+    by_calories = px.pie(nutrition_data, values='Calories', names='Nutrient',
+                         title='Calorie Distribution', color_discrete_sequence=PIE_COLORS)
+    return [by_grams.to_dict(), by_calories.to_dict()]
+
+
+# Function to get the pie chart specs through the shared cache. The charts
+# depend only on the three macros, so those are the key and an edit that
+# changes them simply lands on a new entry.
+def cached_chart_specs(recipe):
+    key = f"{recipe['protein']}:{recipe['carbs']}:{recipe['fat']}"
+    return cached('recipe_charts', key, lambda: macro_chart_specs(recipe), ttl=SNAPSHOT_TTL)
+
+
+# Function to find other recipes in the same category
+def similar_recipes(db, recipe_id, category, limit=SIMILAR_COUNT):
+    similar_ref = db.collection('recipes').where('category', '==', category).limit(limit + 1)
+    similar = []
+
+    # Process results and exclude the current recipe
+    for doc in similar_ref.stream():
+        recipe_data = doc.to_dict()
+        if doc.id != recipe_id:
+            similar.append({
+                'id': doc.id,
+                'name': recipe_data.get('name', 'Recipe'),
+                'image': recipe_data.get('image', 'https://api.placeholder.com/150/150')
+            })
+        if len(similar) >= limit:
+            break
+    return similar
+
+
+# Function to get the similar list through the shared cache
+def cached_similar(db, recipe_id, category):
+    return cached('similar', f"{category}:{recipe_id}",
+                  lambda: similar_recipes(db, recipe_id, category), ttl=300)
+
+
+# Function to read the newest page of comments, same query as the live listener
+def first_comments(db, recipe_id, limit=COMMENTS_PAGE):
+    query = (db.collection('comments').where('recipe_id', '==', recipe_id)
+             .order_by('created_at', direction=firestore.Query.DESCENDING).limit(limit))
+    return [Comment.from_dict(doc.id, doc.to_dict()) for doc in query.stream()]
+
+
+# Function to build a recipe's snapshot (None if the recipe doesn't exist)
+def build_snapshot(db, recipe_id):
+    recipe = Recipe.from_doc(db.collection('recipes').document(recipe_id).get())
+    if recipe is None:
+        return None
+    return {
+        'version': SNAPSHOT_VERSION,
+        'built_at': time.time(),
+        'recipe': recipe,
+        'charts': macro_chart_specs(recipe),
+        'comments': first_comments(db, recipe_id),
+        'similar': cached_similar(db, recipe_id, recipe.category) or list(recipe.get('similar_recipes', [])),
+    }
+
+
+# Function to rebuild and store one snapshot now; a deleted recipe's snapshot
+# is replaced by the MISSING marker
+def refresh_snapshot(recipe_id):
+    from firebase_config import db
+    snapshot = build_snapshot(db, recipe_id)
+    if snapshot is None:
+        get_cache().set(NAMESPACE, _key(recipe_id), MISSING, ttl=MISSING_TTL)
+    else:
+        get_cache().set(NAMESPACE, _key(recipe_id), snapshot, ttl=SNAPSHOT_TTL)
+    return snapshot
+
+
+def _rebuild(recipe_id):
+    while True:
+        try:
+            refresh_snapshot(recipe_id)
+        except Exception:
+            logger.exception("Rebuilding the snapshot of recipe %s failed", recipe_id)
+        with _pending_lock:
+            if not _pending[recipe_id]:
+                del _pending[recipe_id]
+                return
+            _pending[recipe_id] = False
+
+
+# Function to rebuild a snapshot in the background after the recipe or its
+# engagement changed. Safe to call from a page run; never blocks.
+def refresh_later(recipe_id):
+    with _pending_lock:
+        if recipe_id in _pending:
+            # A rebuild is queued or running; make sure one more follows it
+            _pending[recipe_id] = True
+            return
+        _pending[recipe_id] = False
+    _executor.submit(_rebuild, recipe_id)
+
+
+# Function to return the cached snapshot, MISSING if the recipe is known not
+# to exist, or None after scheduling a build
+def get_snapshot(recipe_id):
+    snapshot = get_cache().get(NAMESPACE, _key(recipe_id))
+    if snapshot is None:
+        refresh_later(recipe_id)
+    return snapshot
@@ -0,0 +1,207 @@
+# recommender.py
+# Personalized "recommended for you" lists built from what users have liked,
+# saved and favorited.
+#
+# Offline (`python recommender.py --full`): read every user's interactions into
+# a sparse user x recipe matrix (dicts of dicts), compute item-item cosine
+# similarity from co-occurrence and keep the top neighbors per recipe in
+# item_neighbors/{recipe_id}. Then score every user.
+#
+# Incremental (`python recommender.py`): users who liked/saved something since
+# the last run are flagged dirty; only their lists are recomputed, using the
+# stored neighbors, so one refresh costs a handful of reads per user.
+# Each flag also bumps the user's dirty_version. A refresh notes the version
+# before it reads the interactions and only clears the flag, in a transaction,
+# if the version hasn't moved since; a like made mid-refresh stays flagged.
+#
+# Serving is one document read: recommendations/{user_id}.
+import math
+import time
+from collections import defaultdict
+
+from firebase_admin import firestore
+
+from firebase_config import db
+from ranking import summarize_recipe
+from shared_cache import get_cache
+
+# Interaction subcollections under users/{id} and how strongly each counts
+INTERACTION_WEIGHTS = {
+    'liked_recipes': 1.0,
+    'saved_recipes': 2.0,
+    'favorites': 3.0,
+}
+
+NEIGHBORS_PER_ITEM = 50
+RECOMMENDATIONS_PER_USER = 24
+# Very active users add little signal but quadratic work; cap their row
+MAX_ITEMS_PER_USER = 500
+
+NEIGHBORS_COLLECTION = 'item_neighbors'
+RECOMMENDATIONS_COLLECTION = 'recommendations'
+
+
+# Function to merge interaction docs into {user_id: {recipe_id: weight}}
+def build_interaction_matrix(interactions):
+    matrix = defaultdict(dict)
+    for user_id, recipe_id, weight in interactions:
+        row = matrix[user_id]
+        # Liking and saving the same recipe counts once, at the stronger weight
+        row[recipe_id] = max(row.get(recipe_id, 0.0), weight)
+    for user_id, row in matrix.items():
+        if len(row) > MAX_ITEMS_PER_USER:
+            top = sorted(row.items(), key=lambda kv: kv[1], reverse=True)[:MAX_ITEMS_PER_USER]
+            matrix[user_id] = dict(top)
+    return dict(matrix)
+
+
+# Function to compute item-item cosine similarity from a user x recipe matrix.
+# Returns {recipe_id: {neighbor_id: similarity}} keeping the strongest k per item.
+def build_item_neighbors(matrix, k=NEIGHBORS_PER_ITEM):
+    norms = defaultdict(float)
+    co = defaultdict(lambda: defaultdict(float))
+    for row in matrix.values():
+        items = list(row.items())
+        for i, w_i in items:
+            norms[i] += w_i * w_i
+            for j, w_j in items:
+                if i != j:
+                    co[i][j] += w_i * w_j
+
+    neighbors = {}
+    for i, row in co.items():
+        sims = {j: dot / math.sqrt(norms[i] * norms[j]) for j, dot in row.items()}
+        top = sorted(sims.items(), key=lambda kv: kv[1], reverse=True)[:k]
+        neighbors[i] = dict(top)
+    return neighbors
+
+
+# Function to score unseen recipes for one user from their row and item neighbors
+def score_user(row, neighbors, n=RECOMMENDATIONS_PER_USER):
+    scores = defaultdict(float)
+    for i, w_i in row.items():
+        for j, sim in neighbors.get(i, {}).items():
+            if j not in row:
+                scores[j] += w_i * sim
+    top = sorted(scores.items(), key=lambda kv: kv[1], reverse=True)[:n]
+    return [recipe_id for recipe_id, _ in top]
+
+
+# Function to stream (user_id, recipe_id, weight) for every interaction doc
+def _all_interactions():
+    for subcollection, weight in INTERACTION_WEIGHTS.items():
+        for doc in db.collection_group(subcollection).stream():
+            user_ref = doc.reference.parent.parent
+            if user_ref is not None:
+                yield user_ref.id, doc.id, weight
+
+
+# Function to read one user's row straight from their subcollections
+def _user_row(user_id):
+    user_ref = db.collection('users').document(user_id)
+    interactions = []
+    for subcollection, weight in INTERACTION_WEIGHTS.items():
+        for doc in user_ref.collection(subcollection).stream():
+            interactions.append((user_id, doc.id, weight))
+    return build_interaction_matrix(interactions).get(user_id, {})
+
+
+# Function to load stored neighbor lists for a set of recipes in one batched read
+def _load_neighbors(recipe_ids):
+    if not recipe_ids:
+        return {}
+    refs = [db.collection(NEIGHBORS_COLLECTION).document(rid) for rid in recipe_ids]
+    return {doc.id: doc.to_dict().get('neighbors', {}) for doc in db.get_all(refs) if doc.exists}
+
+
+@firestore.transactional
+def _write_recommendations(transaction, ref, data, seen_version):
+    doc = ref.get(transaction=transaction)
+    current = (doc.to_dict().get('dirty_version') or 0) if doc.exists else 0
+    # A like or save since seen_version was read isn't in this list yet
+    transaction.set(ref, dict(data, dirty=current != seen_version), merge=True)
+
+
+# Function to write a user's list with the card data the home page needs.
+# seen_version is the user's dirty_version read before their interactions.
+def _store_recommendations(user_id, recipe_ids, seen_version=0):
+    summaries = {}
+    if recipe_ids:
+        refs = [db.collection('recipes').document(rid) for rid in recipe_ids]
+        summaries = {doc.id: summarize_recipe(doc.id, doc.to_dict())
+                     for doc in db.get_all(refs) if doc.exists}
+    _write_recommendations(db.transaction(), db.collection(RECOMMENDATIONS_COLLECTION).document(user_id), {
+        'recipes': [summaries[rid] for rid in recipe_ids if rid in summaries],
+        'updated_at': time.time(),
+    }, seen_version)
+    get_cache().delete('recommendations', user_id)
+
+
+# Function to flag a user for the next incremental refresh (called on like/save)
+def mark_user_dirty(user_id):
+    db.collection(RECOMMENDATIONS_COLLECTION).document(user_id).set(
+        {'dirty': True, 'dirty_version': firestore.Increment(1)}, merge=True)
+
+
+# Function to read a user's dirty_version (0 if never flagged)
+def _dirty_version(user_id):
+    doc = db.collection(RECOMMENDATIONS_COLLECTION).document(user_id).get()
+    return (doc.to_dict().get('dirty_version') or 0) if doc.exists else 0
+
+
+# Function to recompute one user's list from the stored neighbor lists
+def refresh_user(user_id, seen_version=None):
+    if seen_version is None:
+        seen_version = _dirty_version(user_id)
+    row = _user_row(user_id)
+    neighbors = _load_neighbors(sorted(row))
+    _store_recommendations(user_id, score_user(row, neighbors), seen_version)
+
+
+# Function to refresh every user flagged dirty since the last run
+def refresh_dirty_users():
+    dirty = db.collection(RECOMMENDATIONS_COLLECTION).where('dirty', '==', True).stream()
+    refreshed = 0
+    for doc in dirty:
+        refresh_user(doc.id, doc.to_dict().get('dirty_version') or 0)
+        refreshed += 1
+    return refreshed
+
+
+# Function to rebuild all neighbor lists and every user's recommendations
+def rebuild_all():
+    # Versions first, so likes made while the matrix is read stay flagged
+    versions = {doc.id: doc.to_dict().get('dirty_version') or 0
+                for doc in db.collection(RECOMMENDATIONS_COLLECTION).stream()}
+    matrix = build_interaction_matrix(_all_interactions())
+    neighbors = build_item_neighbors(matrix)
+
+    batch = db.batch()
+    pending = 0
+    for recipe_id, sims in neighbors.items():
+        batch.set(db.collection(NEIGHBORS_COLLECTION).document(recipe_id), {'neighbors': sims})
+        pending += 1
+        if pending == 400:
+            batch.commit()
+            batch = db.batch()
+            pending = 0
+    if pending:
+        batch.commit()
+
+    for user_id, row in matrix.items():
+        _store_recommendations(user_id, score_user(row, neighbors), versions.get(user_id, 0))
+    return len(matrix)
+
+
+# Function used by the home page: a user's feed is a single document read
+def get_recommendations(user_id):
+    doc = db.collection(RECOMMENDATIONS_COLLECTION).document(user_id).get()
+    return doc.to_dict().get('recipes', []) if doc.exists else []
+
+
+if __name__ == "__main__":
+    import sys
+    if "--full" in sys.argv:
+        print(f"Rebuilt recommendations for {rebuild_all()} users")
+    else:
+        print(f"Refreshed recommendations for {refresh_dirty_users()} users")
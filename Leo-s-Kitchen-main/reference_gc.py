@@ -0,0 +1,240 @@
+# reference_gc.py
+# Cleanup of per-user references to recipes that no longer exist.
+#
+# Saved, favorite and liked entries live under users/{uid}/<subcollection>
+# and point at a recipe by id. Nothing removes them when the recipe goes
+# away, so every list view keeps paying to read (and skip) them.
+#
+#   * sweep_dangling() walks each reference subcollection across all users,
+#     looks up the referenced recipes in batched reads (remembering what it
+#     has already seen) and deletes the dangling entries in batched writes.
+#   * delete_recipe() removes a recipe together with its comments and ratings,
+#     every user's reference to it and its derived score/neighbor documents.
+#
+# Both take dry_run=True to report what would be removed without writing,
+# and a writes_per_second cap so a large cleanup doesn't starve the app's
+# own writes. Users who lose a reference are flagged for a recommendations
+# refresh.
+#
+# Run `python reference_gc.py [--dry-run] [--rate N]` on a schedule, or
+# `python reference_gc.py --delete <recipe_id> [--dry-run]` for one recipe.
+import time
+
+from firebase_config import db
+import recipe_events
+import recipe_snapshots
+from ranking import SCORES_COLLECTION
+from ratings import RATINGS_COLLECTION
+from recommender import NEIGHBORS_COLLECTION, RECOMMENDATIONS_COLLECTION
+from shared_cache import get_cache
+
+REF_SUBCOLLECTIONS = ('saved_recipes', 'favorites', 'liked_recipes')
+BATCH_SIZE = 400  # Firestore allows 500 writes per batch
+LOOKUP_CHUNK = 100  # recipe ids per batched existence check
+DEFAULT_WRITES_PER_SECOND = 200
+EXAMPLES = 20  # paths listed in a report
+
+
+# Spaces out batch commits so the average stays under a write rate
+class _Throttle:
+    def __init__(self, writes_per_second):
+        self.interval = 1.0 / writes_per_second if writes_per_second else 0.0
+        self.next_at = time.monotonic()
+
+    def wait(self, writes):
+        now = time.monotonic()
+        if self.next_at > now:
+            time.sleep(self.next_at - now)
+        self.next_at = max(now, self.next_at) + writes * self.interval
+
+
+# Collects deletes and commits them in batches; in a dry run it only counts
+class _Deleter:
+    def __init__(self, dry_run, writes_per_second):
+        self.dry_run = dry_run
+        self.throttle = _Throttle(writes_per_second)
+        self.batch = None
+        self.pending = 0
+        self.deleted = 0
+        self.examples = []
+        self.users = set()
+
+    def delete(self, ref):
+        if len(self.examples) < EXAMPLES:
+            self.examples.append(_path(ref))
+        user_ref = ref.parent.parent
+        if user_ref is not None and ref.parent.id in REF_SUBCOLLECTIONS:
+            self.users.add(user_ref.id)
+        self.deleted += 1
+        if self.dry_run:
+            return
+        if self.batch is None:
+            self.batch = db.batch()
+        self.batch.delete(ref)
+        self.pending += 1
+        if self.pending == BATCH_SIZE:
+            self.flush()
+
+    def flush(self):
+        if self.pending:
+            self.throttle.wait(self.pending)
+            self.batch.commit()
+        self.batch = None
+        self.pending = 0
+
+    # Function to flag every affected user so their recommendations drop the recipe
+    def mark_users(self):
+        if self.dry_run:
+            return
+        for user_id in sorted(self.users):
+            if self.batch is None:
+                self.batch = db.batch()
+            self.batch.set(db.collection(RECOMMENDATIONS_COLLECTION).document(user_id), {'dirty': True}, merge=True)
+            self.pending += 1
+            if self.pending == BATCH_SIZE:
+                self.flush()
+        self.flush()
+
+
+def _path(ref):
+    return getattr(ref, 'path', None) or f"{ref.parent.id}/{ref.id}"
+
+
+# Function to read which referenced recipe an entry points at
+def _referenced_id(doc):
+    return (doc.to_dict() or {}).get('recipe_id') or doc.id
+
+
+# Function to check which of the given recipe ids still exist, in batched reads
+def _existing(recipe_ids):
+    recipe_ids = list(recipe_ids)
+    found = set()
+    for i in range(0, len(recipe_ids), LOOKUP_CHUNK):
+        refs = [db.collection('recipes').document(rid) for rid in recipe_ids[i:i + LOOKUP_CHUNK]]
+        found.update(doc.id for doc in db.get_all(refs) if doc.exists)
+    return found
+
+
+# Function to remove saved/favorite/liked entries whose recipe is gone.
+# Returns a report; with dry_run=True nothing is written.
+def sweep_dangling(dry_run=False, writes_per_second=DEFAULT_WRITES_PER_SECOND):
+    started = time.monotonic()
+    deleter = _Deleter(dry_run, writes_per_second)
+    known = {}  # recipe id -> exists
+    report = {'dry_run': dry_run, 'scanned': 0, 'dangling': {}, 'missing_recipes': set()}
+
+    def settle(entries, subcollection):
+        unknown = {rid for _, rid in entries if rid not in known}
+        if unknown:
+            existing = _existing(unknown)
+            known.update((rid, rid in existing) for rid in unknown)
+        for ref, rid in entries:
+            if not known[rid]:
+                report['dangling'][subcollection] = report['dangling'].get(subcollection, 0) + 1
+                report['missing_recipes'].add(rid)
+                deleter.delete(ref)
+
+    for subcollection in REF_SUBCOLLECTIONS:
+        entries = []
+        for doc in db.collection_group(subcollection).stream():
+            entries.append((doc.reference, _referenced_id(doc)))
+            report['scanned'] += 1
+            if len(entries) == LOOKUP_CHUNK:
+                settle(entries, subcollection)
+                entries = []
+        if entries:
+            settle(entries, subcollection)
+    deleter.flush()
+    deleter.mark_users()
+
+    report['missing_recipes'] = sorted(report['missing_recipes'])
+    report['deleted'] = deleter.deleted
+    report['users'] = len(deleter.users)
+    report['examples'] = deleter.examples
+    report['seconds'] = round(time.monotonic() - started, 3)
+    return report
+
+
+# Function to delete a recipe and everything that hangs off it: comments,
+# ratings, every user's saved/favorite/liked entry and its score and neighbor
+# docs.
+# Returns a report; with dry_run=True nothing is written.
+def delete_recipe(recipe_id, dry_run=False, writes_per_second=DEFAULT_WRITES_PER_SECOND):
+    started = time.monotonic()
+    deleter = _Deleter(dry_run, writes_per_second)
+    report = {'dry_run': dry_run, 'recipe_id': recipe_id, 'refs': {}}
+
+    comments = list(db.collection('comments').where('recipe_id', '==', recipe_id).stream())
+    for doc in comments:
+        deleter.delete(doc.reference)
+    report['comments'] = len(comments)
+
+    reviews = list(db.collection('recipes').document(recipe_id).collection(RATINGS_COLLECTION).stream())
+    for doc in reviews:
+        deleter.delete(doc.reference)
+    report['ratings'] = len(reviews)
+
+    for subcollection in REF_SUBCOLLECTIONS:
+        refs = db.collection_group(subcollection).where('recipe_id', '==', recipe_id).stream()
+        count = 0
+        for doc in refs:
+            deleter.delete(doc.reference)
+            count += 1
+        report['refs'][subcollection] = count
+
+    # The recipe itself and the documents derived from it, in one batched read
+    refs = [db.collection(SCORES_COLLECTION).document(recipe_id),
+            db.collection(NEIGHBORS_COLLECTION).document(recipe_id),
+            db.collection('recipes').document(recipe_id)]
+    existing = {doc.reference.parent.id: doc for doc in db.get_all(refs) if doc.exists}
+    report['found'] = 'recipes' in existing
+    for doc in existing.values():
+        deleter.delete(doc.reference)
+    deleter.flush()
+    deleter.mark_users()
+
+    if not dry_run:
+        # In-memory indexes drop the recipe; every process drops its cached copy
+        recipe_events.publish(recipe_id, None)
+        get_cache().delete('recipe', recipe_id)
+        get_cache().invalidate('similar')
+        recipe_snapshots.refresh_later(recipe_id)
+
+    report['deleted'] = deleter.deleted
+    report['users'] = len(deleter.users)
+    report['examples'] = deleter.examples
+    report['seconds'] = round(time.monotonic() - started, 3)
+    return report
+
+
+# Function to turn a report into a few readable lines
+def format_report(report):
+    verb = "Would delete" if report['dry_run'] else "Deleted"
+    lines = []
+    if 'recipe_id' in report:
+        refs = ", ".join(f"{n} {name}" for name, n in report['refs'].items())
+        lines.append(f"{verb} recipe {report['recipe_id']}"
+                     f"{'' if report['found'] else ' (already gone)'}: "
+                     f"{report['comments']} comments, {report['ratings']} ratings, {refs}")
+    else:
+        dangling = ", ".join(f"{n} {name}" for name, n in report['dangling'].items()) or "none"
+        lines.append(f"Scanned {report['scanned']} references; dangling: {dangling}")
+        if report['missing_recipes']:
+            lines.append(f"Missing recipes: {', '.join(report['missing_recipes'][:EXAMPLES])}"
+                         f"{' ...' if len(report['missing_recipes']) > EXAMPLES else ''}")
+    lines.append(f"{verb} {report['deleted']} documents for {report['users']} users in {report['seconds']}s")
+    lines.extend(f"  {path}" for path in report['examples'])
+    return "\n".join(lines)
+
+
+if __name__ == "__main__":
+    import sys
+    dry_run = "--dry-run" in sys.argv
+    rate = DEFAULT_WRITES_PER_SECOND
+    if "--rate" in sys.argv:
+        rate = float(sys.argv[sys.argv.index("--rate") + 1])
+    if "--delete" in sys.argv:
+        result = delete_recipe(sys.argv[sys.argv.index("--delete") + 1], dry_run=dry_run, writes_per_second=rate)
+    else:
+        result = sweep_dangling(dry_run=dry_run, writes_per_second=rate)
+    print(format_report(result))
@@ -0,0 +1,95 @@
+# saved_summaries.py
+# Recipe summaries copied into users' saved and favorite entries.
+#
+# My Recipes renders its grid straight from users/{uid}/saved_recipes (and
+# favorites), so each entry carries the card fields itself: name, thumbnail,
+# rating and macros. The grid is then one query with no per-card recipe read.
+# Inline base64 images are not copied; the card uses the placeholder, like
+# the home page cards.
+#
+# The copies are written when a recipe is saved. When the recipe is edited,
+# fan_out_later() pushes just the changed card fields to every copy in batched
+# writes on a background thread, so the edit itself doesn't wait on them.
+# Entries saved before summaries existed are filled in with one batched read
+# the first time they are listed, and written back.
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+from firebase_config import db
+from ranking import summarize_recipe
+
+logger = logging.getLogger(__name__)
+
+SUMMARY_FIELDS = ('name', 'image', 'rating', 'reviews', 'protein', 'carbs', 'fat', 'calories')
+SUMMARY_SUBCOLLECTIONS = ('saved_recipes', 'favorites')
+BATCH_SIZE = 400
+
+_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="saved-summaries")
+
+
+# Function to build the card fields copied into a saved/favorite entry
+def summary_of(recipe_id, recipe):
+    card = summarize_recipe(recipe_id, recipe)
+    return {field: card[field] for field in SUMMARY_FIELDS}
+
+
+# Function to write the changed card fields to every saved/favorite copy of a recipe
+def fan_out(recipe_id, changes):
+    card = summarize_recipe(recipe_id, changes)
+    updates = {field: card[field] for field in SUMMARY_FIELDS if field in changes}
+    if not updates:
+        return 0
+    batch, pending, written = db.batch(), 0, 0
+    for subcollection in SUMMARY_SUBCOLLECTIONS:
+        for doc in db.collection_group(subcollection).where('recipe_id', '==', recipe_id).stream():
+            batch.update(doc.reference, updates)
+            pending += 1
+            if pending == BATCH_SIZE:
+                batch.commit()
+                written += pending
+                batch, pending = db.batch(), 0
+    if pending:
+        batch.commit()
+        written += pending
+    return written
+
+
+def _fan_out_logged(recipe_id, changes):
+    try:
+        return fan_out(recipe_id, changes)
+    except Exception:
+        logger.exception("Updating saved copies of recipe %s failed", recipe_id)
+
+
+# Function to run fan_out in the background after an edit; returns immediately
+def fan_out_later(recipe_id, changes):
+    if any(field in changes for field in SUMMARY_FIELDS):
+        _executor.submit(_fan_out_logged, recipe_id, dict(changes))
+
+
+def _write_back(entry_refs, summaries):
+    try:
+        batch = db.batch()
+        for entry_id, ref in entry_refs.items():
+            batch.set(ref, summaries[entry_id], merge=True)
+        batch.commit()
+    except Exception:
+        logger.exception("Writing back saved recipe summaries failed")
+
+
+# Function to fill in entries that have no summary yet, from one batched read
+# of their recipes. entries are (entry_id, data) pairs as read from the
+# user's subcollection; the filled copies are also written back.
+def with_summaries(user_id, subcollection, entries):
+    missing = {entry_id: data.get('recipe_id') or entry_id
+               for entry_id, data in entries if 'name' not in data}
+    if not missing:
+        return entries
+    refs = [db.collection('recipes').document(rid) for rid in set(missing.values())]
+    recipes = {doc.id: doc.to_dict() for doc in db.get_all(refs) if doc.exists}
+    summaries = {entry_id: summary_of(rid, recipes[rid]) for entry_id, rid in missing.items() if rid in recipes}
+    if summaries:
+        user_ref = db.collection('users').document(user_id)
+        entry_refs = {entry_id: user_ref.collection(subcollection).document(entry_id) for entry_id in summaries}
+        _executor.submit(_write_back, entry_refs, summaries)
+    return [(entry_id, {**data, **summaries.get(entry_id, {})}) for entry_id, data in entries]
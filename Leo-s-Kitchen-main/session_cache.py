@@ -0,0 +1,52 @@
+# session_cache.py
+import streamlit as st
+from streamlit.runtime.scriptrunner import get_script_run_ctx
+
+# Per-session cache for page data that is expensive to read on every rerun.
+# Entries are keyed by the logged in user so logging out and back in as
+# someone else in the same browser tab never shows stale data.
+_CACHE_KEY = '_session_data_cache'
+
+
+def _cache():
+    if _CACHE_KEY not in st.session_state:
+        st.session_state[_CACHE_KEY] = {}
+    return st.session_state[_CACHE_KEY]
+
+
+# Function to return cached data, calling loader() only on a miss
+def get_or_load(name, loader):
+    key = (st.session_state.get('user_id'), name)
+    cache = _cache()
+    if key not in cache:
+        cache[key] = loader()
+    return cache[key]
+
+
+# Function to peek at cached data without loading it
+def get_cached(name, default=None):
+    return _cache().get((st.session_state.get('user_id'), name), default)
+
+
+# Function to drop cached entries after a write so the next read refetches
+def invalidate(*names):
+    user_id = st.session_state.get('user_id')
+    cache = _cache()
+    for name in names:
+        cache.pop((user_id, name), None)
+
+
+# Function to return the id of the browser session running this script
+def session_id():
+    ctx = get_script_run_ctx()
+    return ctx.session_id if ctx else 'no-session'
+
+
+# Function to note which version of a live query this session has drawn
+def mark_drawn(name, version):
+    st.session_state.setdefault('_live_versions', {})[name] = version
+
+
+# Function to tell whether a live query has moved since this session drew it
+def moved_since_drawn(name, version):
+    return st.session_state.get('_live_versions', {}).get(name, version) != version
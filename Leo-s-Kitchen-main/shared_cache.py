@@ -0,0 +1,153 @@
+# shared_cache.py
+# Cache shared by every Streamlit server process on a host (or, with Redis, a
+# whole deployment), so hit rates don't divide by the worker count and a
+# deploy doesn't start every worker cold.
+#
+# Keys are namespaced and versioned: "<namespace>:s<SCHEMA>:g<generation>:<key>".
+#   * SCHEMA_VERSION changes when cached value shapes change, so old entries
+#     from a previous deploy are never read back.
+#   * Each namespace has a generation counter stored in the shared backend.
+#     invalidate(namespace) bumps it, which every worker sees on its next
+#     lookup; that is the write-invalidation broadcast. delete() drops one key.
+# Every entry has a TTL.
+#
+# Backends:
+#   * SqliteCache (default): one SQLite file in WAL mode with mmap enabled,
+#     safe for concurrent readers and writers across processes.
+#   * RedisCache: used when REDIS_URL is set and the redis package is
+#     installed. Any Redis-protocol server works.
+import os
+import pickle
+import sqlite3
+import threading
+import time
+
+SCHEMA_VERSION = 2  # 2: recipes and users are cached as models.Recipe / models.User
+DEFAULT_TTL = 300  # seconds
+CACHE_PATH = os.environ.get("LEO_CACHE_PATH", os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "shared_cache.db"))
+MMAP_SIZE = 256 * 1024 * 1024
+PURGE_EVERY = 1000  # sets between sweeps of expired entries
+
+_MISSING = object()
+
+
+def _full_key(namespace, generation, key):
+    return f"{namespace}:s{SCHEMA_VERSION}:g{generation}:{key}"
+
+
+class SqliteCache:
+    def __init__(self, path=CACHE_PATH):
+        self.path = path
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._local = threading.local()
+        self._sets = 0
+        conn = self._conn()
+        conn.execute("CREATE TABLE IF NOT EXISTS entries (key TEXT PRIMARY KEY, value BLOB NOT NULL, expires_at REAL NOT NULL)")
+        conn.execute("CREATE TABLE IF NOT EXISTS generations (namespace TEXT PRIMARY KEY, generation INTEGER NOT NULL)")
+        conn.commit()
+
+    # One connection per thread; sqlite3 connections can't be shared across threads
+    def _conn(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5.0)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(f"PRAGMA mmap_size={MMAP_SIZE}")
+            self._local.conn = conn
+        return conn
+
+    def generation(self, namespace):
+        row = self._conn().execute("SELECT generation FROM generations WHERE namespace = ?", (namespace,)).fetchone()
+        return row[0] if row else 0
+
+    def get(self, namespace, key, default=None):
+        full_key = _full_key(namespace, self.generation(namespace), key)
+        row = self._conn().execute("SELECT value, expires_at FROM entries WHERE key = ?", (full_key,)).fetchone()
+        if row is None or row[1] < time.time():
+            return default
+        return pickle.loads(row[0])
+
+    def set(self, namespace, key, value, ttl=DEFAULT_TTL):
+        conn = self._conn()
+        full_key = _full_key(namespace, self.generation(namespace), key)
+        conn.execute("INSERT OR REPLACE INTO entries (key, value, expires_at) VALUES (?, ?, ?)",
+                     (full_key, pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL), time.time() + ttl))
+        conn.commit()
+        self._sets += 1
+        if self._sets % PURGE_EVERY == 0:
+            self.purge_expired()
+
+    def delete(self, namespace, key):
+        conn = self._conn()
+        conn.execute("DELETE FROM entries WHERE key = ?", (_full_key(namespace, self.generation(namespace), key),))
+        conn.commit()
+
+    def invalidate(self, namespace):
+        conn = self._conn()
+        conn.execute("INSERT INTO generations (namespace, generation) VALUES (?, 1) "
+                     "ON CONFLICT(namespace) DO UPDATE SET generation = generation + 1", (namespace,))
+        conn.commit()
+
+    # Function to drop expired entries (superseded generations expire too)
+    def purge_expired(self):
+        conn = self._conn()
+        conn.execute("DELETE FROM entries WHERE expires_at < ?", (time.time(),))
+        conn.commit()
+
+
+class RedisCache:
+    def __init__(self, url):
+        import redis
+        self._redis = redis.Redis.from_url(url)
+
+    def generation(self, namespace):
+        value = self._redis.get(f"gen:{namespace}")
+        return int(value) if value else 0
+
+    def get(self, namespace, key, default=None):
+        raw = self._redis.get(_full_key(namespace, self.generation(namespace), key))
+        return default if raw is None else pickle.loads(raw)
+
+    def set(self, namespace, key, value, ttl=DEFAULT_TTL):
+        self._redis.set(_full_key(namespace, self.generation(namespace), key),
+                        pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL), ex=int(ttl))
+
+    def delete(self, namespace, key):
+        self._redis.delete(_full_key(namespace, self.generation(namespace), key))
+
+    def invalidate(self, namespace):
+        # Old-generation keys are never read again and expire on their TTL
+        self._redis.incr(f"gen:{namespace}")
+
+    def purge_expired(self):
+        pass  # Redis expires keys itself
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+# Function to return this process's handle on the shared cache
+def get_cache():
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            redis_url = os.environ.get("REDIS_URL")
+            if redis_url:
+                _cache = RedisCache(redis_url)
+            else:
+                _cache = SqliteCache()
+    return _cache
+
+
+# Function to read through the cache: return the cached value or call loader()
+# and store its result. Values of None are not cached.
+def cached(namespace, key, loader, ttl=DEFAULT_TTL):
+    cache = get_cache()
+    value = cache.get(namespace, key, _MISSING)
+    if value is _MISSING:
+        value = loader()
+        if value is not None:
+            cache.set(namespace, key, value, ttl)
+    return value
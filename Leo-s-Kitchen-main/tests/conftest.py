@@ -0,0 +1,22 @@
+# tests/conftest.py
+# Put the app modules on the path and give them the Firestore stand-in from
+# tools/standins.py, the same one tools/loadtest.py uses, plus scratch paths
+# for the local caches. Must run before any app module is imported.
+import os
+import sys
+import tempfile
+import types
+
+APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, APP_DIR)
+sys.path.insert(0, os.path.join(APP_DIR, "tools"))
+
+_scratch = tempfile.mkdtemp(prefix="leo-tests-")
+os.environ.setdefault("LEO_CACHE_PATH", os.path.join(_scratch, "shared_cache.db"))
+os.environ.setdefault("LEO_EVENT_LOG_DIR", os.path.join(_scratch, "events"))
+os.environ.setdefault("LEO_REPLICA_PATH", os.path.join(_scratch, "recipe_replica.db"))
+os.environ.setdefault("LEO_CHAT_DB_PATH", os.path.join(_scratch, "chat.db"))
+
+from standins import FakeFirestore  # noqa: E402
+
+sys.modules.setdefault("firebase_config", types.SimpleNamespace(db=FakeFirestore(latency=0, jitter=0)))
@@ -0,0 +1,38 @@
+from facets import FacetIndex
+
+
+def _recipe(category, tags=(), protein=20, calories=400):
+    return {'category': category, 'tags': list(tags), 'protein': protein, 'calories': calories}
+
+
+def test_counts_leave_single_choice_selection_out():
+    index = FacetIndex([
+        ("r1", _recipe("Lunch", ["keto"], protein=35)),
+        ("r2", _recipe("Lunch", ["vegan"])),
+        ("r3", _recipe("Dinner", ["keto"], calories=650)),
+    ])
+    counts = index.counts({'category': "Lunch"})
+    assert counts['category'] == {"Lunch": 2, "Dinner": 1}
+    assert counts['tags'] == {"keto": 1, "vegan": 1}
+    assert counts['total'] == 2
+    assert sorted(index.ids({'tags': ["keto"]})) == ["r1", "r3"]
+
+
+def test_deleted_bits_are_reused_without_leaking():
+    index = FacetIndex([("r1", _recipe("Lunch", ["keto"])), ("r2", _recipe("Dinner"))])
+    index.update("r1", None)
+    index.update("r3", _recipe("Snacks", ["vegan"]))
+    assert index._bit["r3"] == 0
+    assert len(index) == 2
+    assert index.ids({'tags': ["keto"]}) == []
+    assert index.ids({'category': "Snacks"}) == ["r3"]
+    assert "keto" not in index.counts()['tags']
+
+
+def test_partial_edit_moves_only_the_changed_facet():
+    index = FacetIndex([("r1", _recipe("Lunch", ["keto"], protein=10))])
+    index.update("r1", {'protein': 50}, changed_fields={'protein'})
+    counts = index.counts()
+    assert counts['protein'] == {"45g+": 1}
+    assert counts['category'] == {"Lunch": 1}
+    assert counts['tags'] == {"keto": 1}
@@ -0,0 +1,59 @@
+from fuzzy_search import PREFIX_PENALTY, FuzzyIndex, edit_distance, trigrams
+
+
+def test_edit_distance_counts_a_transposition_as_one_edit():
+    assert edit_distance("protien", "protein", 2) == 1
+    assert edit_distance("chiken", "chicken", 2) == 1
+    assert edit_distance("oats", "oats", 1) == 0
+
+
+def test_edit_distance_gives_up_past_the_limit():
+    assert edit_distance("salmon", "turkey", 2) == 3
+    assert edit_distance("oat", "oatmeal", 2) == 3
+
+
+def test_prefix_match_costs_the_penalty():
+    index = FuzzyIndex([("r1", {'name': "Chicken Bowl"})])
+    assert index.similar_words("chick")["chicken"] == PREFIX_PENALTY
+    assert index.similar_words("chicken")["chicken"] == 0
+
+
+def test_search_needs_every_query_word():
+    index = FuzzyIndex([
+        ("r1", {'name': "Chicken Bowl"}),
+        ("r2", {'name': "Chicken Wrap"}),
+    ])
+    assert [rid for rid, _ in index.search("chiken bowl")] == ["r1"]
+    assert {rid for rid, _ in index.search("chicken")} == {"r1", "r2"}
+
+
+def _postings_match_recipes(index):
+    expected = {}
+    for recipe_id, found in index._words_by_recipe.items():
+        for word in found:
+            expected.setdefault(word, set()).add(recipe_id)
+    assert dict(index._recipes_by_word) == expected
+    grams = {}
+    for word in expected:
+        for gram in trigrams(word):
+            grams.setdefault(gram, set()).add(word)
+    assert dict(index._words_by_gram) == grams
+    shapes = {word for words in index._words_by_shape.values() for word in words}
+    assert shapes == set(expected)
+
+
+def test_add_edit_and_delete_keep_postings_consistent():
+    index = FuzzyIndex([("r1", {'name': "Salmon Plate", 'ingredients': ["200g salmon fillet"]})])
+    index.update("r2", {'name': "Salmon Bowl", 'ingredients': ["1 cup rice"]})
+    _postings_match_recipes(index)
+
+    # A partial edit keeps the fields it doesn't carry
+    index.update("r1", {'name': "Tuna Plate"}, changed_fields={'name'})
+    _postings_match_recipes(index)
+    assert {rid for rid, _ in index.search("salmon")} == {"r1", "r2"}
+    assert [rid for rid, _ in index.search("tuna")] == ["r1"]
+
+    index.update("r2", None)
+    _postings_match_recipes(index)
+    assert index.search("bowl") == []
+    assert "rice" not in index._recipes_by_word
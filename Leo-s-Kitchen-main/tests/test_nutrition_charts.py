@@ -0,0 +1,23 @@
+import numpy as np
+
+from nutrition_charts import lttb
+
+
+def test_short_series_are_left_alone():
+    assert list(lttb([0, 1, 2], [5, 6, 7], 10)) == [0, 1, 2]
+
+
+def test_keeps_the_ends_and_the_budget():
+    x = np.arange(1000)
+    y = np.sin(x / 50.0)
+    keep = lttb(x, y, 50)
+    assert len(keep) == 50
+    assert keep[0] == 0 and keep[-1] == 999
+    assert list(keep) == sorted(set(keep))
+
+
+def test_keeps_a_spike():
+    x = np.arange(500)
+    y = np.zeros(500)
+    y[321] = 100.0
+    assert 321 in lttb(x, y, 20)
@@ -0,0 +1,26 @@
+from ratings import adjust, aggregate_of
+
+
+def test_aggregate_of_fills_in_older_recipes():
+    aggregate = aggregate_of({'rating': 4.5, 'reviews': 2})
+    assert aggregate['rating_sum'] == 9
+    assert aggregate['reviews'] == 2
+    assert aggregate['rating_hist'] == {"1": 0, "2": 0, "3": 0, "4": 0, "5": 0}
+
+
+def test_first_rating_rerating_and_removal():
+    start = aggregate_of({})
+    first = adjust(start, None, 4)
+    assert (first['rating_sum'], first['reviews'], first['rating']) == (4, 1, 4.0)
+    assert first['rating_hist']["4"] == 1
+
+    second = adjust(first, None, 1)
+    assert (second['reviews'], second['rating']) == (2, 2.5)
+
+    moved = adjust(second, 1, 5)
+    assert (moved['rating_sum'], moved['reviews'], moved['rating']) == (9, 2, 4.5)
+    assert moved['rating_hist']["1"] == 0 and moved['rating_hist']["5"] == 1
+
+    cleared = adjust(adjust(moved, 4, None), 5, None)
+    assert (cleared['rating_sum'], cleared['reviews'], cleared['rating']) == (0, 0, 0)
+    assert not any(cleared['rating_hist'].values())
@@ -0,0 +1,42 @@
+from typeahead import Typeahead, ingredient_name
+
+
+def _texts(index, prefix):
+    return [entry['text'] for entry in index.complete(prefix)]
+
+
+def _fresh(index):
+    # The same weights built from scratch, to compare the patched trie against
+    rebuilt = Typeahead(k=index._k)
+    rebuilt._weights.update(index._weights)
+    rebuilt._display.update(index._display)
+    rebuilt._rebuild()
+    return rebuilt
+
+
+def test_ingredient_name_drops_quantities_and_notes():
+    assert ingredient_name("1/2 cup rolled oats, soaked") == "rolled oats"
+    assert ingredient_name("2 tbsp of peanut butter (smooth)") == "peanut butter"
+
+
+def test_names_complete_from_later_words_by_popularity():
+    index = Typeahead([
+        ("r1", {'name': "Chicken Bowl", 'likes': 5}),
+        ("r2", {'name': "Chia Pudding", 'likes': 1}),
+    ])
+    assert _texts(index, "chi") == ["Chicken Bowl", "Chia Pudding"]
+    assert _texts(index, "bowl") == ["Chicken Bowl"]
+
+
+def test_patched_trie_matches_a_rebuild():
+    index = Typeahead([
+        ("r1", {'name': "Chicken Bowl", 'tags': ["high-protein"], 'likes': 3}),
+        ("r2", {'name': "Chia Pudding", 'ingredients': ["2 tbsp chia seeds"]}),
+    ], k=3)
+    index.update("r3", {'name': "Chickpea Curry", 'likes': 10})
+    index.update("r1", {'likes': 0}, changed_fields={'likes'})
+    index.update("r2", None)
+    fresh = _fresh(index)
+    for prefix in ("c", "ch", "chi", "chick", "h", "b", "curry"):
+        assert index.complete(prefix) == fresh.complete(prefix)
+    assert _texts(index, "chia") == []
@@ -0,0 +1,294 @@
+# tools/loadtest.py
+# Concurrent-session load generator for the whole app.
+#
+# Every simulated user is a real Streamlit session driven through
+# streamlit.testing.v1.AppTest, so each interaction runs the actual page
+# script end to end, exactly like a browser-triggered rerun. Firestore and the
+# OpenAI API are replaced by the local stand-ins in tools/standins.py, with a
+# configurable round-trip latency.
+#
+# Sessions follow weighted journeys (browse the home feed, search, open a
+# recipe, like/save it, post a meal, chat). The run ramps through increasing
+# session counts and reports, per level: throughput (reruns/s), p50/p95/p99
+# rerun latency, errors, and the memory each session takes when it is built
+# (its first run; what it grows to during the level isn't measured). The
+# saturation point is the first level where throughput stops growing or p95
+# crosses the limit.
+#
+#   python tools/loadtest.py --levels 10,50,100,200 --duration 30
+import argparse
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+import types
+from collections import defaultdict
+
+APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, APP_DIR)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+# AppTest gives every rerun a fresh ScriptCache, so each rerun re-parses its
+# page, and ast.parse is not safe to call from many threads at once on CPython
+# 3.11. The real server keeps one ScriptCache for the process and compiles each
+# script once, so hand every session the same one. Its own lock serialises the
+# first compile of each page; nothing else in the process is touched.
+def _share_script_cache():
+    from streamlit.runtime.scriptrunner.script_cache import ScriptCache
+    from streamlit.testing.v1 import app_test, local_script_runner
+
+    shared = ScriptCache()
+    app_test.ScriptCache = local_script_runner.ScriptCache = lambda: shared
+
+
+# Function to swap Firestore, OpenAI and local storage for stand-ins. Must run
+# before any app module is imported.
+def install_standins(latency, jitter, recipes, users):
+    import openai
+    from standins import FakeAsyncOpenAI, FakeFirestore, FakeOpenAI, seed
+
+    scratch = tempfile.mkdtemp(prefix="leo-loadtest-")
+    os.environ["LEO_CACHE_PATH"] = os.path.join(scratch, "shared_cache.db")
+    os.environ["LEO_EVENT_LOG_DIR"] = os.path.join(scratch, "events")
+
+    db = FakeFirestore(latency=latency, jitter=jitter)
+    user_ids = seed(db, recipes=recipes, users=users)
+    sys.modules["firebase_config"] = types.SimpleNamespace(db=db)
+    # Keep the real module for its exception types; only the clients are swapped
+    openai.OpenAI, openai.AsyncOpenAI = FakeOpenAI, FakeAsyncOpenAI
+
+    import chat_store
+    chat_store.DB_PATH = os.path.join(scratch, "chat.db")
+    import recipe_replica
+    recipe_replica.DB_PATH = os.path.join(scratch, "replica.db")
+    return db, user_ids
+
+
+# --- Journeys. Each step is one rerun; the step's name is used in the report.
+
+def step_home(at):
+    at.switch_page("app.py").run()
+    return "home"
+
+
+def step_search(at):
+    at.switch_page("app.py").run()
+    at.text_input[0].input(random.choice(["chicken", "protein", "bowl", "oats"])).run()
+    return "search"
+
+
+def step_filter(at):
+    at.switch_page("app.py").run()
+    at.selectbox[0].select(random.choice(["Breakfast", "Lunch", "Dinner"])).run()
+    return "filter"
+
+
+def step_detail(at):
+    at.query_params["recipe_id"] = f"recipe{random.randrange(RECIPE_COUNT)}"
+    at.switch_page("pages/recipie_detail.py").run()
+    return "detail"
+
+
+def step_like(at):
+    step_detail(at)
+    at.button(key=random.choice(["like_btn", "save_btn"])).click().run()
+    return "like_save"
+
+
+def step_post(at):
+    at.switch_page("pages/post_meal.py").run()
+    at.text_input[0].input(f"Load test meal {random.randrange(10**6)}").run()
+    at.button[-1].click().run()
+    return "post"
+
+
+def step_chat(at):
+    at.switch_page("pages/chatbot.py").run()
+    at.chat_input[0].set_value("What should I eat after a workout?").run()
+    return "chat"
+
+
+def step_my_recipes(at):
+    at.switch_page("pages/my_recipes.py").run()
+    return "my_recipes"
+
+
+JOURNEYS = [
+    # (weight, steps)
+    (40, [step_home, step_filter, step_detail]),
+    (20, [step_search, step_detail]),
+    (15, [step_detail, step_like]),
+    (10, [step_my_recipes, step_detail]),
+    (8, [step_chat]),
+    (7, [step_post, step_my_recipes]),
+]
+
+RECIPE_COUNT = 500
+
+# AppTest keeps the multipage registry and its mock runtime in process-wide
+# state, so reruns racing across threads occasionally fail to resolve a sidebar
+# page_link or find the runtime. Those failures belong to the harness, not the
+# app, and are reported separately.
+HARNESS_ERRORS = ("Could not find page", "Runtime hasn't been created")
+
+
+class Session:
+    def __init__(self, user_id, timeout):
+        from streamlit.testing.v1 import AppTest
+        self.at = AppTest.from_file(os.path.join(APP_DIR, "app.py"), default_timeout=timeout)
+        self.at.secrets["OPENAI_API_KEY"] = "load-test"
+        self.at.session_state["authenticated"] = True
+        self.at.session_state["user_id"] = user_id
+        self.at.session_state["username"] = user_id
+        self.at.run()
+
+
+class Stats:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.latencies = defaultdict(list)
+        self.errors = defaultdict(int)
+        self.harness_errors = 0
+
+    def record_harness_error(self):
+        with self.lock:
+            self.harness_errors += 1
+
+    def record(self, name, seconds, error=None):
+        with self.lock:
+            self.latencies[name].append(seconds)
+            if error:
+                self.errors[name] += 1
+
+    def all_latencies(self):
+        return [x for values in self.latencies.values() for x in values]
+
+
+def percentile(values, p):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(p / 100 * (len(values) - 1))))]
+
+
+# Function to drive one session until the stop event is set
+def run_session(session, stats, stop, think_time):
+    weights = [w for w, _ in JOURNEYS]
+    while not stop.is_set():
+        _, steps = random.choices(JOURNEYS, weights=weights)[0]
+        for step in steps:
+            if stop.is_set():
+                return
+            start = time.perf_counter()
+            error = None
+            try:
+                name = step(session.at)
+            except Exception as e:
+                # A widget missing because the previous rerun failed
+                name, error = step.__name__[len("step_"):], str(e)
+            if session.at.exception:
+                error = session.at.exception[0].message
+            if error and any(marker in error for marker in HARNESS_ERRORS):
+                stats.record_harness_error()
+            else:
+                stats.record(name, time.perf_counter() - start, error)
+            time.sleep(random.uniform(0, 2 * think_time))
+
+
+# Function to run one load level and return its summary
+def run_level(n_sessions, user_ids, duration, think_time, timeout):
+    # Tracing slows every allocation, so memory is only measured while the
+    # sessions are built, not while they run
+    tracemalloc.start()
+    before, _ = tracemalloc.get_traced_memory()
+    sessions = [Session(user_ids[i % len(user_ids)], timeout) for i in range(n_sessions)]
+    after, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    stats = Stats()
+    stop = threading.Event()
+    threads = [threading.Thread(target=run_session, args=(s, stats, stop, think_time), daemon=True) for s in sessions]
+    started = time.perf_counter()
+    for t in threads:
+        t.start()
+    time.sleep(duration)
+    stop.set()
+    for t in threads:
+        t.join(timeout=timeout)
+    elapsed = time.perf_counter() - started
+
+    latencies = stats.all_latencies()
+    return {
+        'sessions': n_sessions,
+        'reruns': len(latencies),
+        'throughput': len(latencies) / elapsed,
+        'p50': percentile(latencies, 50),
+        'p95': percentile(latencies, 95),
+        'p99': percentile(latencies, 99),
+        'errors': sum(stats.errors.values()),
+        'harness_errors': stats.harness_errors,
+        'build_kb_per_session': (after - before) / n_sessions / 1024,
+        'by_step': {name: (len(v), percentile(v, 95), stats.errors[name]) for name, v in stats.latencies.items()},
+    }
+
+
+def print_level(result):
+    print(f"{result['sessions']:>5} sessions | {result['throughput']:7.1f} reruns/s | "
+          f"p50 {result['p50'] * 1000:7.0f} ms | p95 {result['p95'] * 1000:7.0f} ms | "
+          f"p99 {result['p99'] * 1000:7.0f} ms | errors {result['errors']:>4} | "
+          f"{result['build_kb_per_session']:8.0f} KB/session built | harness errors {result['harness_errors']}")
+    for name, (count, p95, errors) in sorted(result['by_step'].items()):
+        print(f"        {name:<12} n={count:<6} p95 {p95 * 1000:7.0f} ms  errors {errors}")
+
+
+# Function to find the first level where adding sessions stops adding throughput
+def saturation_point(results, p95_limit, min_gain):
+    for previous, current in zip(results, results[1:]):
+        if current['p95'] > p95_limit or current['throughput'] < previous['throughput'] * (1 + min_gain):
+            return current['sessions']
+    if results and results[0]['p95'] > p95_limit:
+        return results[0]['sessions']
+    return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Concurrent-session load test for Leo's Food App")
+    parser.add_argument("--levels", default="10,25,50,100,200", help="comma separated session counts to ramp through")
+    parser.add_argument("--duration", type=float, default=30, help="seconds to run each level")
+    parser.add_argument("--think", type=float, default=0.5, help="mean think time between steps (s)")
+    parser.add_argument("--latency", type=float, default=0.02, help="stand-in Firestore round trip (s)")
+    parser.add_argument("--jitter", type=float, default=0.01)
+    parser.add_argument("--recipes", type=int, default=500)
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--timeout", type=float, default=60, help="per-rerun timeout (s)")
+    parser.add_argument("--p95-limit", type=float, default=2.0, help="p95 (s) above which the server counts as saturated")
+    parser.add_argument("--min-gain", type=float, default=0.10, help="throughput gain below which it counts as saturated")
+    args = parser.parse_args()
+
+    global RECIPE_COUNT
+    RECIPE_COUNT = args.recipes
+    _share_script_cache()
+    db, user_ids = install_standins(args.latency, args.jitter, args.recipes, args.users)
+    # Warm up module imports and process-wide caches so they aren't billed to the first level
+    Session(user_ids[0], args.timeout)
+
+    results = []
+    for level in [int(x) for x in args.levels.split(",")]:
+        result = run_level(level, user_ids, args.duration, args.think, args.timeout)
+        print_level(result)
+        results.append(result)
+
+    saturated = saturation_point(results, args.p95_limit, args.min_gain)
+    print()
+    print(f"Stand-in Firestore: {db.reads} reads, {db.writes} writes")
+    if saturated is None:
+        print("No saturation within the tested levels.")
+    else:
+        print(f"Server saturates at about {saturated} concurrent sessions.")
+
+
+if __name__ == "__main__":
+    main()
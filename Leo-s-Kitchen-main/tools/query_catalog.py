@@ -0,0 +1,522 @@
+# tools/query_catalog.py
+# Static catalog of every Firestore query the app runs, and the composite
+# indexes they need.
+#
+# The app's scripts and modules are parsed (not imported) and every query
+# chain that ends in .stream(), .get() or .on_snapshot() is recorded:
+# collection, filters, orderings, limit and where it lives. Chains built up
+# through variables (query = db.collection(...); query = query.where(...))
+# are followed within a function, including conditional refinements, so each
+# shape a query can take is listed separately. A collection named by a loop
+# over a module-level tuple or dict of names (`for sub in REF_SUBCOLLECTIONS`)
+# is listed once per name, and constants imported from other app modules are
+# resolved.
+#
+# Besides composite indexes, collection-group queries filtered or ordered on a
+# single field need that field's collection-group index, which Firestore
+# doesn't create automatically; --write adds those to the fieldOverrides and
+# --check fails when one is missing.
+#
+#   python tools/query_catalog.py              # print the catalog and warnings
+#   python tools/query_catalog.py --write      # regenerate firestore.indexes.json
+#   python tools/query_catalog.py --check      # exit 1 if an index is missing
+#   python tools/query_catalog.py --verify     # run each query's plan against Firestore
+#
+# Warnings are printed for queries with no limit, whose result size grows with
+# the collection.
+import argparse
+import ast
+import glob
+import json
+import os
+import sys
+
+APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+INDEXES_PATH = os.path.join(APP_DIR, "firestore.indexes.json")
+
+TERMINALS = {'stream', 'get', 'on_snapshot'}
+EQUALITY_OPS = {'==', 'in'}
+ARRAY_OPS = {'array_contains', 'array_contains_any'}
+DIRECTIONS = {'ASCENDING', 'DESCENDING'}
+
+
+# Function to list the files scanned: the main script, the pages and the
+# modules they import from the app directory
+def source_files():
+    files = sorted(glob.glob(os.path.join(APP_DIR, "*.py"))) + sorted(glob.glob(os.path.join(APP_DIR, "pages", "*.py")))
+    return [f for f in files if os.path.basename(f) != "test_firebase.py"]
+
+
+class _Query:
+    # One possible shape of a query or reference while a chain is evaluated
+    def __init__(self, path, scope='COLLECTION', kind='collection', filters=(), orders=(), limit=None, select=None):
+        self.path = list(path)
+        self.scope = scope
+        self.kind = kind  # 'collection', 'document' or 'client'
+        self.filters = list(filters)
+        self.orders = list(orders)
+        self.limit = limit
+        self.select = select
+
+    def copy(self, **changes):
+        q = _Query(self.path, self.scope, self.kind, self.filters, self.orders, self.limit, self.select)
+        for name, value in changes.items():
+            setattr(q, name, value)
+        return q
+
+
+CLIENT = _Query([], kind='client')
+
+
+# Function to collect a module's top-level string constants and tuples, lists
+# or dict literals of strings (dicts by their keys)
+def module_constants(tree):
+    constants, sequences = {}, {}
+    for node in tree.body:
+        if not (isinstance(node, ast.Assign) and len(node.targets) == 1 and isinstance(node.targets[0], ast.Name)):
+            continue
+        name, value = node.targets[0].id, node.value
+        if isinstance(value, ast.Constant) and isinstance(value.value, str):
+            constants[name] = value.value
+            continue
+        items = value.keys if isinstance(value, ast.Dict) else getattr(value, 'elts', None)
+        if isinstance(value, (ast.Tuple, ast.List, ast.Dict)) and items and all(
+                isinstance(item, ast.Constant) and isinstance(item.value, str) for item in items):
+            sequences[name] = [item.value for item in items]
+    return constants, sequences
+
+
+def _module_name(filename):
+    return os.path.splitext(os.path.basename(filename))[0]
+
+
+class _Extractor:
+    def __init__(self, filename, tree, modules=None):
+        self.filename = os.path.relpath(filename, APP_DIR)
+        self.tree = tree
+        self.constants, self.sequences = module_constants(tree)
+        self.bound = {}  # loop variable -> the name it stands for in this pass
+        self.queries = []
+        # Names imported from other app modules
+        for node in tree.body:
+            if isinstance(node, ast.ImportFrom) and node.module in (modules or {}):
+                constants, sequences = modules[node.module]
+                for alias in node.names:
+                    local = alias.asname or alias.name
+                    if alias.name in constants:
+                        self.constants[local] = constants[alias.name]
+                    if alias.name in sequences:
+                        self.sequences[local] = sequences[alias.name]
+
+    def run(self):
+        self._block(self.tree.body, {}, "<module>", conditional=False)
+        return self.queries
+
+    # --- statement walking ---
+
+    def _block(self, statements, env, function, conditional):
+        for stmt in statements:
+            if isinstance(stmt, (ast.FunctionDef, ast.AsyncFunctionDef)):
+                self._block(stmt.body, {}, stmt.name, conditional=False)
+                continue
+            if isinstance(stmt, ast.ClassDef):
+                self._block(stmt.body, {}, stmt.name, conditional=False)
+                continue
+
+            self._record_terminals(stmt, env, function)
+
+            loop = self._loop_names(stmt)
+            if loop is not None:
+                variable, names = loop
+                for name in names:
+                    self.bound[variable] = name
+                    self._block(stmt.body, env, function, conditional=True)
+                self.bound.pop(variable, None)
+                if stmt.orelse:
+                    self._block(stmt.orelse, env, function, conditional=True)
+                continue
+
+            if isinstance(stmt, ast.Assign) and len(stmt.targets) == 1 and isinstance(stmt.targets[0], ast.Name):
+                states = self._eval(stmt.value, env)
+                name = stmt.targets[0].id
+                if states is None:
+                    env.pop(name, None)
+                elif conditional and name in env:
+                    env[name] = env[name] + states
+                else:
+                    env[name] = states
+
+            for field in ('body', 'orelse', 'finalbody'):
+                inner = getattr(stmt, field, None)
+                if isinstance(inner, list) and inner and isinstance(inner[0], ast.stmt):
+                    self._block(inner, env, function, conditional=True)
+            for handler in getattr(stmt, 'handlers', []):
+                self._block(handler.body, env, function, conditional=True)
+
+    # Function to recognise `for name in CONSTANT_NAMES` (or CONSTANT.items() /
+    # .keys(), unpacking the first element); returns (variable, names) or None
+    def _loop_names(self, stmt):
+        if not isinstance(stmt, ast.For):
+            return None
+        source = stmt.iter
+        if (isinstance(source, ast.Call) and isinstance(source.func, ast.Attribute)
+                and source.func.attr in ('items', 'keys') and not source.args):
+            source = source.func.value
+        if not (isinstance(source, ast.Name) and source.id in self.sequences):
+            return None
+        target = stmt.target
+        if isinstance(target, ast.Tuple) and target.elts:
+            target = target.elts[0]
+        if not isinstance(target, ast.Name):
+            return None
+        return target.id, self.sequences[source.id]
+
+    def _record_terminals(self, stmt, env, function):
+        # Only look at expressions belonging to this statement, not nested blocks
+        roots = [value for field, value in ast.iter_fields(stmt)
+                 if field not in ('body', 'orelse', 'finalbody', 'handlers')]
+        for root in roots:
+            for node in (n for r in (root if isinstance(root, list) else [root]) if isinstance(r, ast.AST)
+                         for n in ast.walk(r)):
+                if not (isinstance(node, ast.Call) and isinstance(node.func, ast.Attribute)
+                        and node.func.attr in TERMINALS):
+                    continue
+                for state in self._eval(node.func.value, env) or []:
+                    if state.kind == 'collection':
+                        self.queries.append(self._entry(state, node, function))
+
+    # --- expression evaluation ---
+
+    def _eval(self, node, env):
+        if isinstance(node, ast.Name):
+            if node.id in env:
+                return env[node.id]
+            return [CLIENT] if node.id == 'db' else None
+        if isinstance(node, ast.Attribute) and node.attr == 'db':
+            return [CLIENT]
+        if not (isinstance(node, ast.Call) and isinstance(node.func, ast.Attribute)):
+            return None
+        bases = self._eval(node.func.value, env)
+        if not bases:
+            return None
+        method = node.func.attr
+        results = []
+        for base in bases:
+            state = self._apply(base, method, node)
+            if state is None:
+                return None
+            results.append(state)
+        return results
+
+    def _apply(self, base, method, call):
+        args = call.args
+        kwargs = {kw.arg: kw.value for kw in call.keywords}
+        if method == 'collection' and base.kind in ('client', 'document') and args:
+            return _Query(base.path + [self._name(args[0])])
+        if method == 'collection_group' and base.kind == 'client' and args:
+            return _Query([self._name(args[0])], scope='COLLECTION_GROUP')
+        if method == 'document' and base.kind in ('client', 'collection'):
+            return base.copy(kind='document', path=base.path + ['{}'], filters=[], orders=[])
+        if base.kind != 'collection':
+            return None
+        if method == 'where':
+            if 'filter' in kwargs:
+                field, op = self._field_filter(kwargs['filter'])
+            else:
+                field, op = self._name(args[0]), self._text(args[1]) if len(args) > 1 else '=='
+            return base.copy(filters=base.filters + [(field, op)])
+        if method == 'order_by':
+            direction = kwargs.get('direction', args[1] if len(args) > 1 else None)
+            return base.copy(orders=base.orders + [(self._name(args[0]), self._direction(direction))])
+        if method in ('limit', 'limit_to_last'):
+            return base.copy(limit=self._text(args[0]) if args else None)
+        if method == 'select':
+            return base.copy(select=self._text(args[0]) if args else None)
+        if method in ('start_at', 'start_after', 'end_at', 'end_before', 'offset'):
+            return base.copy()
+        return None
+
+    def _field_filter(self, node):
+        if isinstance(node, ast.Call) and len(node.args) >= 2:
+            return self._name(node.args[0]), self._text(node.args[1])
+        return self._text(node), '?'
+
+    def _name(self, node):
+        if isinstance(node, ast.Constant) and isinstance(node.value, str):
+            return node.value
+        if isinstance(node, ast.Name) and node.id in self.bound:
+            return self.bound[node.id]
+        if isinstance(node, ast.Name) and node.id in self.constants:
+            return self.constants[node.id]
+        return "{" + ast.unparse(node) + "}"
+
+    def _text(self, node):
+        if isinstance(node, ast.Constant) and isinstance(node.value, str):
+            return node.value
+        if isinstance(node, ast.Name) and node.id in self.constants:
+            return self.constants[node.id]
+        return ast.unparse(node)
+
+    def _direction(self, node):
+        if node is None:
+            return 'ASCENDING'
+        text = self._text(node).rsplit('.', 1)[-1].upper()
+        return text if text in DIRECTIONS else 'ASCENDING'
+
+    def _entry(self, state, call, function):
+        entry = {
+            'file': self.filename,
+            'line': call.lineno,
+            'function': function,
+            'terminal': call.func.attr,
+            'collection': state.path[-1],
+            'path': "/".join(state.path),
+            'scope': state.scope,
+            'filters': [list(f) for f in state.filters],
+            'order_by': [list(o) for o in state.orders],
+            'limit': state.limit,
+            'select': state.select,
+        }
+        entry['unbounded'] = state.limit is None
+        entry['index'] = required_index(entry)
+        entry['field_overrides'] = required_field_overrides(entry) if entry['index'] is None else []
+        return entry
+
+
+# Function to work out the composite index a query needs, or None when
+# Firestore's automatic single-field indexes (with index merging for equality
+# filters) already serve it
+def required_index(query):
+    filters, orders = query['filters'], query['order_by']
+    equality = sorted({field for field, op in filters if op in EQUALITY_OPS})
+    arrays = sorted({field for field, op in filters if op in ARRAY_OPS})
+    ranges = [field for field, op in filters if op not in EQUALITY_OPS | ARRAY_OPS]
+    fields = set(equality) | set(arrays) | set(ranges) | {field for field, _ in orders}
+    if len(fields) < 2 or not (orders or ranges):
+        return None
+
+    index_fields = [{'fieldPath': f, 'order': 'ASCENDING'} for f in equality]
+    index_fields += [{'fieldPath': f, 'arrayConfig': 'CONTAINS'} for f in arrays]
+    ordered = [field for field, _ in orders]
+    for field in ranges:
+        if field not in ordered and field not in {f['fieldPath'] for f in index_fields}:
+            index_fields.append({'fieldPath': field, 'order': 'ASCENDING'})
+    for field, direction in orders:
+        if field not in equality:
+            index_fields.append({'fieldPath': field, 'order': direction})
+    return {'collectionGroup': query['collection'], 'queryScope': query['scope'], 'fields': index_fields}
+
+
+# Function to list the collection-group single-field indexes a query needs.
+# Firestore only creates single-field indexes at collection scope, so a
+# collection-group query filtered or ordered on one field needs an override.
+def required_field_overrides(query):
+    if query['scope'] != 'COLLECTION_GROUP':
+        return []
+    needed = {}
+    for field, op in query['filters']:
+        index = {'arrayConfig': 'CONTAINS'} if op in ARRAY_OPS else {'order': 'ASCENDING'}
+        needed.setdefault(field, index)
+    for field, direction in query['order_by']:
+        needed[field] = {'order': direction}
+    return [{'collectionGroup': query['collection'], 'fieldPath': field, 'index': dict(index, queryScope='COLLECTION_GROUP')}
+            for field, index in sorted(needed.items())]
+
+
+# Function to parse every source file into the query catalog
+def build_catalog(files=None):
+    trees = {}
+    for filename in files or source_files():
+        with open(filename, encoding="utf-8") as f:
+            trees[filename] = ast.parse(f.read(), filename)
+    modules = {_module_name(filename): module_constants(tree) for filename, tree in trees.items()}
+    catalog = []
+    for filename, tree in trees.items():
+        catalog.extend(_Extractor(filename, tree, modules).run())
+    return catalog
+
+
+def _index_key(index):
+    return json.dumps(index, sort_keys=True)
+
+
+# Single-field indexes Firestore creates automatically at collection scope.
+# An override replaces them, so a new one lists them alongside its own.
+AUTOMATIC_FIELD_INDEXES = [
+    {'order': 'ASCENDING', 'queryScope': 'COLLECTION'},
+    {'order': 'DESCENDING', 'queryScope': 'COLLECTION'},
+    {'arrayConfig': 'CONTAINS', 'queryScope': 'COLLECTION'},
+]
+
+
+# Function to build firestore.indexes.json content from the catalog, keeping
+# the fieldOverrides already in the existing file and adding the
+# collection-group indexes queries need
+def build_indexes(catalog, existing=None):
+    unique = {}
+    for query in catalog:
+        if query['index'] and '{' not in query['index']['collectionGroup']:
+            unique.setdefault(_index_key(query['index']), query['index'])
+    indexes = sorted(unique.values(), key=_index_key)
+
+    overrides = [dict(o, indexes=list(o.get('indexes', []))) for o in (existing or {}).get('fieldOverrides', [])]
+    by_field = {(o['collectionGroup'], o['fieldPath']): o for o in overrides}
+    for query in catalog:
+        for needed in query['field_overrides']:
+            if '{' in needed['collectionGroup']:
+                continue
+            key = (needed['collectionGroup'], needed['fieldPath'])
+            if key not in by_field:
+                by_field[key] = {'collectionGroup': key[0], 'fieldPath': key[1], 'indexes': list(AUTOMATIC_FIELD_INDEXES)}
+                overrides.append(by_field[key])
+            if needed['index'] not in by_field[key]['indexes']:
+                by_field[key]['indexes'].append(needed['index'])
+    return {'indexes': indexes, 'fieldOverrides': overrides}
+
+
+def load_indexes(path=INDEXES_PATH):
+    if not os.path.exists(path):
+        return {'indexes': [], 'fieldOverrides': []}
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+# Function to list catalog queries whose composite index or collection-group
+# field override isn't declared
+def missing_indexes(catalog, declared):
+    have = {_index_key(index) for index in declared.get('indexes', [])}
+    overrides = {(o['collectionGroup'], o['fieldPath']): o.get('indexes', []) for o in declared.get('fieldOverrides', [])}
+    missing = []
+    for query in catalog:
+        if query['index'] and _index_key(query['index']) not in have:
+            missing.append(query)
+        elif any(needed['index'] not in overrides.get((needed['collectionGroup'], needed['fieldPath']), [])
+                 for needed in query['field_overrides']):
+            missing.append(query)
+    return missing
+
+
+# Function to tell whether a path still has a collection named at run time
+def _dynamic(path):
+    return any(segment.startswith('{') and segment != '{}' for segment in path.split('/'))
+
+
+def _describe(query):
+    parts = [query['path'] + (" (collection group)" if query['scope'] == 'COLLECTION_GROUP' else "")]
+    parts += [f"where {field} {op}" for field, op in query['filters']]
+    parts += [f"order_by {field} {direction[:4].lower()}" for field, direction in query['order_by']]
+    if query['limit'] is not None:
+        parts.append(f"limit {query['limit']}")
+    return f"{query['file']}:{query['line']} ({query['function']}) " + ", ".join(parts) + f" -> {query['terminal']}"
+
+
+def print_report(catalog, declared):
+    print(f"{len(catalog)} queries")
+    for query in catalog:
+        flags = []
+        if query['index']:
+            flags.append("composite index")
+        if query['field_overrides']:
+            flags.append("collection-group field index")
+        if query['unbounded']:
+            flags.append("UNBOUNDED")
+        print(f"  {_describe(query)}" + (f"  [{', '.join(flags)}]" if flags else ""))
+
+    unbounded = [q for q in catalog if q['unbounded']]
+    if unbounded:
+        print(f"\n{len(unbounded)} queries have no limit; their result size grows with the collection:")
+        for query in unbounded:
+            print(f"  {_describe(query)}")
+
+    missing = missing_indexes(catalog, declared)
+    if missing:
+        print(f"\n{len(missing)} queries need an index missing from firestore.indexes.json:")
+        for query in missing:
+            print(f"  {_describe(query)}")
+
+
+# Function to rebuild a catalog entry as a real query with placeholder values
+def _live_query(db, query):
+    from google.cloud.firestore_v1.base_query import FieldFilter
+
+    segments = query['path'].split('/')
+    if query['scope'] == 'COLLECTION_GROUP':
+        ref = db.collection_group(segments[0])
+    else:
+        ref = db.collection(segments[0])
+        for i in range(1, len(segments), 2):
+            ref = ref.document("catalog-probe").collection(segments[i + 1])
+    for field, op in query['filters']:
+        value = [""] if op in ('in', 'not-in', 'array_contains_any') else ""
+        ref = ref.where(filter=FieldFilter(field, op, value))
+    for field, direction in query['order_by']:
+        ref = ref.order_by(field, direction=direction)
+    return ref.limit(1)
+
+
+# Function to ask Firestore how it would serve each query. With the emulator
+# (FIRESTORE_EMULATOR_HOST set) there is no query planner and every query is
+# served, so only execution is checked there and index coverage comes from
+# the static check above.
+def verify(catalog):
+    from google.api_core import exceptions
+    from google.cloud.firestore_v1.query_profile import ExplainOptions
+    from firebase_config import db
+
+    emulator = bool(os.environ.get("FIRESTORE_EMULATOR_HOST"))
+    failures = 0
+    for query in catalog:
+        if _dynamic(query['path']):
+            print(f"  skipped (dynamic collection): {_describe(query)}")
+            continue
+        live = _live_query(db, query)
+        try:
+            if emulator:
+                live.get()
+                print(f"  runs: {_describe(query)}")
+            else:
+                results = live.get(explain_options=ExplainOptions(analyze=False))
+                used = results.get_explain_metrics().plan_summary.indexes_used
+                print(f"  index {', '.join(i.get('properties', '?') for i in used)}: {_describe(query)}")
+        except exceptions.FailedPrecondition as e:
+            failures += 1
+            print(f"  NO INDEX: {_describe(query)}\n    {e.message}")
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Catalog Firestore queries and the indexes they need")
+    parser.add_argument("--write", action="store_true", help="regenerate firestore.indexes.json")
+    parser.add_argument("--check", action="store_true", help="exit 1 if a required index is missing")
+    parser.add_argument("--verify", action="store_true", help="check each query against Firestore or the emulator")
+    parser.add_argument("--json", action="store_true", help="print the catalog as JSON")
+    args = parser.parse_args()
+
+    catalog = build_catalog()
+    declared = load_indexes()
+    if args.write:
+        declared = build_indexes(catalog, declared)
+        with open(INDEXES_PATH, "w", encoding="utf-8") as f:
+            json.dump(declared, f, indent=2)
+            f.write("\n")
+        print(f"Wrote {len(declared['indexes'])} indexes and {len(declared['fieldOverrides'])} field overrides "
+              f"to {os.path.relpath(INDEXES_PATH)}\n")
+
+    if args.json:
+        json.dump(catalog, sys.stdout, indent=2)
+        print()
+    else:
+        print_report(catalog, declared)
+
+    failed = False
+    if args.verify:
+        sys.path.insert(0, APP_DIR)
+        print("\nVerifying against Firestore:")
+        failed = verify(catalog) > 0
+    if args.check and missing_indexes(catalog, declared):
+        failed = True
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
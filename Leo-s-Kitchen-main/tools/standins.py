@@ -0,0 +1,429 @@
+# tools/standins.py
+# Local stand-ins for Firestore and the OpenAI chat API, used by the load
+# generator so it can run against the real page scripts with no network.
+#
+# FakeFirestore implements the slice of the google-cloud-firestore client the
+# app uses: collections, documents, subcollections, where/order_by/limit/select
+# queries, get_all, batches, transactions, collection_group, Increment /
+# SERVER_TIMESTAMP transforms and on_snapshot listeners. Each call can sleep for a
+# configurable latency to mimic a network round trip.
+import asyncio
+import random
+import threading
+import time
+import types
+import uuid
+from datetime import datetime, timezone
+
+from google.cloud.firestore_v1 import transforms
+
+_ops = {
+    '==': lambda a, b: a == b,
+    '!=': lambda a, b: a != b,
+    '<': lambda a, b: a is not None and a < b,
+    '<=': lambda a, b: a is not None and a <= b,
+    '>': lambda a, b: a is not None and a > b,
+    '>=': lambda a, b: a is not None and a >= b,
+    'in': lambda a, b: a in b,
+    'array_contains': lambda a, b: b in (a or []),
+}
+
+
+class _Snapshot:
+    def __init__(self, reference, data):
+        self.reference = reference
+        self.id = reference.id
+        self._data = data
+        self.exists = data is not None
+
+    def to_dict(self):
+        return dict(self._data) if self._data is not None else None
+
+    def get(self, field):
+        return (self._data or {}).get(field)
+
+
+class _Watch:
+    def __init__(self, store, key, callback):
+        self._store, self._key, self.callback = store, key, callback
+
+    def unsubscribe(self):
+        self._store._unwatch(self)
+
+
+class FakeFirestore:
+    def __init__(self, latency=0.0, jitter=0.0):
+        self.latency = latency
+        self.jitter = jitter
+        self._docs = {}  # path tuple -> dict
+        self._lock = threading.RLock()
+        self._watches = []
+        self.reads = 0
+        self.writes = 0
+
+    def _sleep(self):
+        if self.latency or self.jitter:
+            time.sleep(max(0.0, self.latency + random.uniform(-self.jitter, self.jitter)))
+
+    # --- client API ---
+    def collection(self, name):
+        return FakeCollection(self, (name,))
+
+    def document(self, path):
+        parts = tuple(path.strip('/').split('/'))
+        return FakeDocument(self, parts)
+
+    def collection_group(self, name):
+        return FakeQuery(self, None, group=name)
+
+    def get_all(self, refs):
+        self._sleep()
+        with self._lock:
+            self.reads += len(refs)
+            return [_Snapshot(ref, self._docs.get(ref._path)) for ref in refs]
+
+    def batch(self):
+        return FakeBatch(self)
+
+    def transaction(self, max_attempts=5):
+        return FakeTransaction(self, max_attempts)
+
+    # --- storage helpers ---
+    def _apply(self, path, data, merge=False, update=False):
+        with self._lock:
+            current = self._docs.get(path)
+            if update and current is None:
+                raise KeyError(f"No document to update: {'/'.join(path)}")
+            base = dict(current) if (current is not None and (merge or update)) else {}
+            for field, value in data.items():
+                if isinstance(value, transforms.Increment):
+                    base[field] = (base.get(field) or 0) + value.value
+                elif value is transforms.SERVER_TIMESTAMP:
+                    base[field] = datetime.now(timezone.utc)
+                elif value is transforms.DELETE_FIELD:
+                    base.pop(field, None)
+                else:
+                    base[field] = value
+            self._docs[path] = base
+            self.writes += 1
+        self._notify(path)
+
+    def _delete(self, path):
+        with self._lock:
+            self._docs.pop(path, None)
+            self.writes += 1
+        self._notify(path)
+
+    def _children(self, collection_path):
+        n = len(collection_path)
+        with self._lock:
+            return [(path, data) for path, data in self._docs.items()
+                    if len(path) == n + 1 and path[:n] == collection_path]
+
+    def _group(self, name):
+        with self._lock:
+            return [(path, data) for path, data in self._docs.items()
+                    if len(path) >= 2 and len(path) % 2 == 0 and path[-2] == name]
+
+    # --- listeners ---
+    def _watch(self, key, callback, run):
+        watch = _Watch(self, key, callback)
+        watch.run = run
+        with self._lock:
+            self._watches.append(watch)
+        threading.Thread(target=run, args=(watch,), daemon=True).start()
+        return watch
+
+    def _unwatch(self, watch):
+        with self._lock:
+            if watch in self._watches:
+                self._watches.remove(watch)
+
+    def _notify(self, path):
+        with self._lock:
+            watches = list(self._watches)
+        for watch in watches:
+            if watch._key(path):
+                watch.run(watch)
+
+
+class FakeDocument:
+    def __init__(self, store, path):
+        self._store = store
+        self._path = path
+        self.id = path[-1]
+
+    @property
+    def parent(self):
+        return FakeCollection(self._store, self._path[:-1])
+
+    @property
+    def path(self):
+        return '/'.join(self._path)
+
+    def collection(self, name):
+        return FakeCollection(self._store, self._path + (name,))
+
+    def get(self, transaction=None):
+        self._store._sleep()
+        with self._store._lock:
+            self._store.reads += 1
+            return _Snapshot(self, self._store._docs.get(self._path))
+
+    def set(self, data, merge=False):
+        self._store._sleep()
+        self._store._apply(self._path, data, merge=merge)
+
+    def update(self, data):
+        self._store._sleep()
+        self._store._apply(self._path, data, update=True)
+
+    def delete(self):
+        self._store._sleep()
+        self._store._delete(self._path)
+
+    def on_snapshot(self, callback):
+        def run(watch):
+            with self._store._lock:
+                snap = _Snapshot(self, self._store._docs.get(self._path))
+            watch.callback([snap], [], datetime.now(timezone.utc))
+        return self._store._watch(lambda path: path == self._path, callback, run)
+
+
+class FakeQuery:
+    def __init__(self, store, collection_path, group=None, filters=(), orders=(), limit_to=None, fields=None):
+        self._store = store
+        self._collection_path = collection_path
+        self._group = group
+        self._filters = list(filters)
+        self._orders = list(orders)
+        self._limit = limit_to
+        self._fields = fields
+
+    def _copy(self, **changes):
+        args = dict(filters=self._filters, orders=self._orders, limit_to=self._limit, fields=self._fields, group=self._group)
+        args.update(changes)
+        return FakeQuery(self._store, self._collection_path, **args)
+
+    def where(self, field=None, op=None, value=None, filter=None):
+        if filter is not None:
+            field, op, value = filter.field_path, filter.op_string, filter.value
+        return self._copy(filters=self._filters + [(field, op, value)])
+
+    def order_by(self, field, direction='ASCENDING'):
+        return self._copy(orders=self._orders + [(field, direction)])
+
+    def limit(self, count):
+        return self._copy(limit_to=count)
+
+    def select(self, fields):
+        return self._copy(fields=list(fields))
+
+    def _matches(self, path):
+        if self._group is not None:
+            return len(path) % 2 == 0 and path[-2] == self._group
+        return path[:-1] == self._collection_path
+
+    def _run(self):
+        rows = self._store._group(self._group) if self._group is not None else self._store._children(self._collection_path)
+        rows = [(path, data) for path, data in rows
+                if all(_ops[op](data.get(field), value) for field, op, value in self._filters)]
+        for field, direction in reversed(self._orders):
+            present = [r for r in rows if r[1].get(field) is not None]
+            missing = [r for r in rows if r[1].get(field) is None]
+            present.sort(key=lambda r: r[1][field], reverse=(direction == 'DESCENDING'))
+            rows = present + missing
+        if self._limit is not None:
+            rows = rows[:self._limit]
+        snaps = []
+        for path, data in rows:
+            if self._fields is not None:
+                data = {f: data[f] for f in self._fields if f in data}
+            snaps.append(_Snapshot(FakeDocument(self._store, path), data))
+        return snaps
+
+    def stream(self, transaction=None):
+        self._store._sleep()
+        snaps = self._run()
+        with self._store._lock:
+            self._store.reads += max(1, len(snaps))
+        return iter(snaps)
+
+    def get(self, transaction=None):
+        return list(self.stream())
+
+    def on_snapshot(self, callback):
+        def run(watch):
+            watch.callback(self._run(), [], datetime.now(timezone.utc))
+        return self._store._watch(self._matches, callback, run)
+
+
+class FakeCollection(FakeQuery):
+    def __init__(self, store, path):
+        super().__init__(store, path)
+        self.id = path[-1]
+
+    @property
+    def parent(self):
+        return FakeDocument(self._store, self._collection_path[:-1]) if len(self._collection_path) > 1 else None
+
+    def document(self, doc_id=None):
+        return FakeDocument(self._store, self._collection_path + (doc_id or uuid.uuid4().hex[:20],))
+
+    def add(self, data):
+        ref = self.document()
+        ref.set(data)
+        return datetime.now(timezone.utc), ref
+
+
+class FakeBatch:
+    def __init__(self, store):
+        self._store = store
+        self._ops = []
+
+    def set(self, ref, data, merge=False):
+        self._ops.append(lambda: self._store._apply(ref._path, data, merge=merge))
+
+    def update(self, ref, data):
+        self._ops.append(lambda: self._store._apply(ref._path, data, update=True))
+
+    def delete(self, ref):
+        self._ops.append(lambda: self._store._delete(ref._path))
+
+    def commit(self):
+        self._store._sleep()
+        with self._store._lock:
+            for op in self._ops:
+                op()
+        self._ops = []
+
+
+# Runs under firestore.transactional. Rather than detecting conflicts it holds
+# the store's lock from begin to commit, so transactions never interleave.
+class FakeTransaction(FakeBatch):
+    def __init__(self, store, max_attempts=5):
+        super().__init__(store)
+        self._max_attempts = max_attempts
+        self._read_only = False
+        self._id = None
+
+    def _clean_up(self):
+        self._ops = []
+        self._id = None
+
+    def _begin(self, retry_id=None):
+        self._store._lock.acquire()
+        self._id = uuid.uuid4().bytes
+
+    def _commit(self):
+        try:
+            self.commit()
+        finally:
+            self._clean_up()
+            self._store._lock.release()
+
+    def _rollback(self):
+        if self._id is not None:
+            self._clean_up()
+            self._store._lock.release()
+
+
+# --- OpenAI chat stand-in ---
+
+class _Delta:
+    def __init__(self, content):
+        self.content = content
+
+
+class _Choice:
+    def __init__(self, content):
+        self.delta = _Delta(content)
+        self.finish_reason = None
+
+
+class _Chunk:
+    def __init__(self, content):
+        self.choices = [_Choice(content)]
+
+
+# st.write_stream recognises chat chunks by their fully qualified type name
+_Chunk.__module__ = "openai.types.chat.chat_completion_chunk"
+_Chunk.__qualname__ = _Chunk.__name__ = "ChatCompletionChunk"
+
+
+class FakeOpenAI:
+    # Streams a canned reply word by word with a per-token delay
+    latency = 0.2
+    token_delay = 0.01
+
+    def __init__(self, api_key=None, **kwargs):
+        self.chat = types.SimpleNamespace(completions=types.SimpleNamespace(create=self._create))
+
+    def _create(self, model, messages, stream=False, **kwargs):
+        time.sleep(self.latency)
+        words = f"Here is a quick idea for '{messages[-1]['content'][:40]}': try a high-protein bowl.".split()
+        if not stream:
+            message = types.SimpleNamespace(content=" ".join(words), role="assistant")
+            return types.SimpleNamespace(choices=[types.SimpleNamespace(message=message)])
+
+        def chunks():
+            for word in words:
+                time.sleep(self.token_delay)
+                yield _Chunk(word + " ")
+        return chunks()
+
+
+class FakeAsyncOpenAI:
+    # Async twin of FakeOpenAI for the shared chat client
+    latency = 0.2
+    token_delay = 0.01
+
+    def __init__(self, api_key=None, **kwargs):
+        self.chat = types.SimpleNamespace(completions=types.SimpleNamespace(create=self._create))
+
+    async def _create(self, model, messages, stream=False, **kwargs):
+        await asyncio.sleep(self.latency)
+        words = f"Here is a quick idea for '{messages[-1]['content'][:40]}': try a high-protein bowl.".split()
+
+        async def chunks():
+            for word in words:
+                await asyncio.sleep(self.token_delay)
+                yield _Chunk(word + " ")
+        return chunks()
+
+
+# Function to fill the fake store with users and recipes for a load test
+def seed(store, recipes=500, users=50, comments_per_recipe=3):
+    categories = ["Breakfast", "Lunch", "Dinner", "Snacks", "Desserts"]
+    names = ["Protein Oats", "Chicken Bowl", "Salmon Plate", "Tofu Stir Fry", "Greek Yogurt", "Turkey Wrap"]
+    tags = ["high-protein", "keto", "vegan", "quick", "meal-prep"]
+    rng = random.Random(42)
+    user_ids = []
+    for i in range(users):
+        user_id = f"user{i}"
+        user_ids.append(user_id)
+        store._docs[('users', user_id)] = {
+            'username': f"user{i}", 'email': f"user{i}@example.com", 'password_hash': '',
+            'full_name': '', 'bio': '', 'profile_pic': '', 'date_joined': '2025-01-01', 'is_premium': False,
+        }
+    for i in range(recipes):
+        protein, carbs, fat = rng.randint(5, 60), rng.randint(5, 90), rng.randint(2, 40)
+        recipe_id = f"recipe{i}"
+        store._docs[('recipes', recipe_id)] = {
+            'name': f"{rng.choice(names)} #{i}", 'category': rng.choice(categories),
+            'tags': rng.sample(tags, 2), 'description': 'A tasty test recipe.', 'recipe_url': '',
+            'image': 'https://api.placeholder.com/640/480',
+            'protein': protein, 'carbs': carbs, 'fat': fat, 'calories': protein * 4 + carbs * 4 + fat * 9,
+            'fiber': 0, 'sugar': 0, 'sodium': 0, 'cholesterol': 0, 'saturated_fat': 0, 'trans_fat': 0,
+            'ingredients': ['1 cup oats', '1 scoop protein'], 'instructions': ['Mix.', 'Eat.'],
+            'user_id': rng.choice(user_ids), 'username': 'tester', 'user': '@tester',
+            'date_posted': f"2025-02-{rng.randint(1, 28):02d}T12:00:00", 'updated_at': '2025-03-01T00:00:00',
+            'likes': 0, 'comments': 0, 'rating': 0, 'reviews': 0, 'saved_count': 0,
+            'prep_time': '5 min', 'cook_time': '10 min', 'servings': 1,
+        }
+        for c in range(comments_per_recipe):
+            store._docs[('comments', f"{recipe_id}-c{c}")] = {
+                'recipe_id': recipe_id, 'user_id': rng.choice(user_ids), 'username': 'tester',
+                'text': 'Looks great!', 'created_at': datetime(2025, 3, 1, 12, c, tzinfo=timezone.utc),
+            }
+    return user_ids
@@ -0,0 +1,225 @@
+# typeahead.py
+# Search-box suggestions: top-k completions for a prefix over recipe names,
+# ingredient names and tags, weighted by popularity.
+#
+# Terms live in a prefix trie. Every node caches the k heaviest terms below
+# it, so a lookup is one walk down the prefix plus returning that list; no
+# subtree is searched at query time. Recipe names are also reachable from each
+# later word ("bowl" suggests "Chicken Bowl").
+#
+# A term's weight is the summed popularity of the recipes that use it. When a
+# recipe is posted or edited its old contributions are taken out and the new
+# ones added, and only the cached lists along the affected paths are redone.
+import re
+import threading
+from collections import defaultdict
+
+import recipe_events
+from recipe_replica import recipe_rows
+
+TOP_K = 10
+LOAD_FIELDS = ['name', 'ingredients', 'tags', 'likes', 'saved_count', 'reviews']
+
+_QUANTITY = re.compile(
+    r"^[\d\s/.,½¼¾⅓⅔-]*"
+    r"(?:(?:cups?|tbsp|tablespoons?|tsp|teaspoons?|g|grams?|kg|oz|ounces?|ml|l|lbs?|pounds?|"
+    r"scoops?|pinch(?:es)?|cloves?|slices?|cans?|handfuls?|pieces?)\b\.?\s*)?(?:of\s+)?",
+    re.IGNORECASE)
+
+
+# Function to turn an ingredient line into the ingredient's name,
+# e.g. "1/2 cup rolled oats, soaked" -> "rolled oats"
+def ingredient_name(line):
+    name = re.split(r"[,(]", line, 1)[0]
+    name = _QUANTITY.sub("", name.strip())
+    return " ".join(name.split()).lower()
+
+
+# Function to score a recipe's popularity; every recipe counts at least 1
+def popularity(recipe):
+    def number(field):
+        try:
+            return float(recipe.get(field) or 0)
+        except (TypeError, ValueError):
+            return 0.0
+    return 1.0 + number('likes') + 2.0 * number('saved_count') + number('reviews')
+
+
+# Function to list the (term, kind) pairs a recipe contributes
+def recipe_terms(recipe):
+    terms = {}
+    name = (recipe.get('name') or '').strip()
+    if name:
+        terms[name.lower()] = (name, 'recipe')
+    for tag in recipe.get('tags') or ():
+        tag = str(tag).strip()
+        if tag:
+            terms.setdefault(tag.lower(), (tag, 'tag'))
+    for line in recipe.get('ingredients') or ():
+        ingredient = ingredient_name(str(line))
+        if len(ingredient) > 1:
+            terms.setdefault(ingredient, (ingredient, 'ingredient'))
+    return terms
+
+
+class _Node:
+    __slots__ = ('children', 'terms', 'top')
+
+    def __init__(self):
+        self.children = {}
+        self.terms = None  # {term_key: weight} for keys that end here
+        self.top = ()  # cached [(weight, term_key)] heaviest first
+
+
+class Typeahead:
+    def __init__(self, recipes=(), k=TOP_K):
+        self._lock = threading.Lock()
+        self._k = k
+        self._root = _Node()
+        self._weights = defaultdict(float)  # term_key -> weight
+        self._display = {}  # term_key -> (display text, kind)
+        self._contributions = {}  # recipe_id -> (weight, {term_key: (display, kind)})
+        self._source = {}  # recipe_id -> the indexed fields, to merge partial edits
+        for recipe_id, recipe in recipes:
+            self._source[recipe_id] = {f: recipe.get(f) for f in LOAD_FIELDS}
+            self._add_recipe(recipe_id, recipe)
+        self._rebuild()
+
+    def __len__(self):
+        return len(self._weights)
+
+    # --- building ---
+
+    @staticmethod
+    def _keys(term_key, kind):
+        # A recipe name is reachable from the start of each of its words
+        if kind != 'recipe':
+            return [term_key]
+        words = term_key.split()
+        return [" ".join(words[i:]) for i in range(len(words))]
+
+    def _add_recipe(self, recipe_id, recipe):
+        weight, terms = popularity(recipe), recipe_terms(recipe)
+        self._contributions[recipe_id] = (weight, terms)
+        for term_key, (display, kind) in terms.items():
+            self._weights[term_key] += weight
+            self._display.setdefault(term_key, (display, kind))
+        return terms
+
+    def _remove_recipe(self, recipe_id):
+        weight, terms = self._contributions.pop(recipe_id, (0.0, {}))
+        for term_key in terms:
+            self._weights[term_key] -= weight
+            if self._weights[term_key] <= 1e-9:
+                del self._weights[term_key]
+                self._display.pop(term_key, None)
+        return terms
+
+    # Function to build the whole trie from the current weights
+    def _rebuild(self):
+        self._root = _Node()
+        for term_key, weight in self._weights.items():
+            for key in self._keys(term_key, self._display[term_key][1]):
+                end = self._path(key, create=True)[-1]
+                end.terms = end.terms or {}
+                end.terms[term_key] = weight
+        self._refresh(self._root)
+
+    def _path(self, key, create=False):
+        node, path = self._root, [self._root]
+        for ch in key:
+            child = node.children.get(ch)
+            if child is None:
+                if not create:
+                    return path
+                child = node.children[ch] = _Node()
+            node = child
+            path.append(node)
+        return path
+
+    # Function to recompute the cached top list of every node below (and including) node
+    def _refresh(self, node):
+        for child in node.children.values():
+            self._refresh(child)
+        self._recompute(node)
+
+    def _recompute(self, node):
+        best = {}
+        for term_key, weight in (node.terms or {}).items():
+            best[term_key] = weight
+        for child in node.children.values():
+            for weight, term_key in child.top:
+                best[term_key] = weight
+        node.top = sorted(((w, t) for t, w in best.items()), reverse=True)[:self._k]
+
+    # Function to set one term's weight along the given paths and fix the cached lists
+    def _patch_term(self, term_key, keys):
+        weight = self._weights.get(term_key)
+        for key in keys:
+            path = self._path(key, create=weight is not None)
+            end = path[-1]
+            if len(path) == len(key) + 1:
+                if weight is None:
+                    if end.terms:
+                        end.terms.pop(term_key, None)
+                else:
+                    end.terms = end.terms or {}
+                    end.terms[term_key] = weight
+            for node in reversed(path):
+                self._recompute(node)
+
+    # Function to apply a recipe change; pass recipe=None for a delete.
+    # Signature matches recipe_events.subscribe callbacks.
+    def update(self, recipe_id, recipe, changed_fields=None):
+        with self._lock:
+            if recipe is not None:
+                # Edits may carry only some fields; unchanged fields keep their terms
+                recipe = {**self._source.get(recipe_id, {}), **recipe}
+            before = self._remove_recipe(recipe_id)
+            after = {}
+            if recipe is not None:
+                self._source[recipe_id] = {f: recipe.get(f) for f in LOAD_FIELDS}
+                after = self._add_recipe(recipe_id, recipe)
+            else:
+                self._source.pop(recipe_id, None)
+            for term_key in set(before) | set(after):
+                kinds = {entry[1] for entry in (before.get(term_key), after.get(term_key)) if entry}
+                keys = {key for kind in kinds for key in self._keys(term_key, kind)}
+                self._patch_term(term_key, keys)
+
+    # --- lookups ---
+
+    # Function to return up to k completions for a prefix as
+    # [{'text', 'kind', 'weight'}], heaviest first
+    def complete(self, prefix, k=8):
+        key = " ".join(prefix.lower().split())
+        if not key:
+            return []
+        node = self._root
+        for ch in key:
+            node = node.children.get(ch)
+            if node is None:
+                return []
+        return [{'text': self._display[t][0], 'kind': self._display[t][1], 'weight': w}
+                for w, t in node.top[:k] if t in self._display]
+
+
+# Function to load names, ingredients and tags for every recipe
+def load_typeahead(db):
+    return Typeahead(recipe_rows(db, LOAD_FIELDS))
+
+
+_shared_index = None
+_shared_lock = threading.Lock()
+
+
+# Function to return the process-wide suggestion index shared by every
+# session. It is loaded once and then patched by recipe change events.
+def get_shared_typeahead():
+    global _shared_index
+    with _shared_lock:
+        if _shared_index is None:
+            from firebase_config import db
+            _shared_index = load_typeahead(db)
+            recipe_events.subscribe(_shared_index.update, fields=LOAD_FIELDS)
+    return _shared_index